@@ -4,7 +4,8 @@ from fastapi.responses import HTMLResponse, JSONResponse
 from pydantic import BaseModel, Field
 from typing import List, Optional
 import uvicorn
-from src.core.data_access.dgraph_client import DgraphClient
+from src.core.data_access.async_dgraph_client import AsyncDgraphClient
+from src.core.data_access.filters import SearchFilters
 import yaml
 import os
 
@@ -45,10 +46,45 @@ class SearchRequest(BaseModel):
     data: bool = False
 
 
+class SearchFiltersRequest(BaseModel):
+    standards: Optional[List[str]] = Field(
+        None, description="Any of these standards, e.g. erc-4626"
+    )
+    patterns: Optional[List[str]] = Field(None, description="Any of these patterns")
+    functionalities: Optional[List[str]] = Field(
+        None, description="Any of these functionalities"
+    )
+    application_domain: Optional[List[str]] = Field(
+        None, description="Any of these application domains"
+    )
+    solc_version: Optional[List[str]] = Field(
+        None, description="Any of these compiler versions"
+    )
+    block_from: Optional[int] = Field(None, ge=0, description="First deployment block")
+    block_to: Optional[int] = Field(None, ge=0, description="Last deployment block")
+    experimental: Optional[bool] = Field(
+        None, description="Whether the contract uses experimental features"
+    )
+
+
 class VectorSearchRequest(BaseModel):
     query: str = Field(..., min_length=1, description="Natural language search query")
     limit: int = Field(5, ge=1, le=20, description="Maximum number of results")
     threshold: float = Field(0.7, ge=0.0, le=1.0, description="Similarity threshold")
+    filters: Optional[SearchFiltersRequest] = Field(
+        None, description="Structured filters applied inside the vector search"
+    )
+
+
+class HybridSearchRequest(BaseModel):
+    query: str = Field(..., min_length=1, description="Natural language search query")
+    limit: int = Field(5, ge=1, le=20, description="Maximum number of results")
+    vector_weight: float = Field(
+        1.0, ge=0.0, description="Weight of the vector search ranking"
+    )
+    text_weight: float = Field(
+        1.0, ge=0.0, description="Weight of the text search ranking"
+    )
 
 
 class ContractResult(BaseModel):
@@ -74,6 +110,7 @@ class ContractResult(BaseModel):
     domain: Optional[str] = None
     security_risks: Optional[List[str]] = None
     similarity_score: Optional[float] = None  # For vector search results
+    fused_score: Optional[float] = None  # For hybrid search results
 
 
 # @app.post("/search")
@@ -210,7 +247,47 @@ class ContractResult(BaseModel):
 #         return JSONResponse(content=formatted_results)
 #     except Exception as e:
 #         raise HTTPException(status_code=500, detail=str(e))
-client = DgraphClient()
+client = AsyncDgraphClient()
+
+
+def to_contract_result(result: dict) -> ContractResult:
+    """Maps a Dgraph contract (detail projection) to the API result model."""
+    return ContractResult(
+        id=result.get("uid", ""),
+        name=result.get("ContractDeployment.name", ""),
+        description=result.get("ContractDeployment.description", ""),
+        created=result.get("ContractDeployment.created", ""),
+        verified=result.get("ContractDeployment.verified_source", False),
+        tags=[result.get("ContractDeployment.application_domain", "")],
+        storage_protocol=result.get("ContractDeployment.storage_protocol"),
+        storage_address=result.get("ContractDeployment.storage_address"),
+        experimental=result.get("ContractDeployment.experimental"),
+        solc_version=result.get("ContractDeployment.solc_version"),
+        verified_source=result.get("ContractDeployment.verified_source"),
+        verified_source_code=result.get("ContractDeployment.verified_source_code"),
+        functionalities=result.get("ContractDeployment.functionalities"),
+        standards=result.get("ContractDeployment.standards"),
+        patterns=result.get("ContractDeployment.patterns"),
+        domain=result.get("ContractDeployment.application_domain"),
+        security_risks=result.get(
+            "ContractDeployment.security_risks_description", ""
+        ).split(", ")
+        if result.get("ContractDeployment.security_risks_description")
+        else [],
+        similarity_score=result.get("cosine_similarity"),
+        fused_score=result.get("fused_score"),
+    )
+
+
+@app.on_event("startup")
+async def start_indexes():
+    client.start_text_index()
+    client.start_vector_index()
+
+
+@app.on_event("shutdown")
+async def close_client():
+    await client.close()
 
 
 @app.post("/search")
@@ -220,37 +297,27 @@ async def vector_search_contracts(request: VectorSearchRequest):
     Converts natural language queries to embeddings and finds similar contracts.
     """
     try:
-        results = client.vector_search(request.query, request.limit)
+        filters = (
+            SearchFilters.from_dict(request.filters.model_dump())
+            if request.filters
+            else None
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    try:
+        results = await client.vector_search(
+            request.query,
+            request.limit,
+            projection="detail",
+            threshold=request.threshold,
+            filters=filters,
+        )
         formatted_results = []
 
         for result in results:
             try:
-                formatted_result = ContractResult(
-                    id=result.get("uid", ""),
-                    name=result.get("ContractDeployment.name", ""),
-                    description=result.get("ContractDeployment.description", ""),
-                    created=result.get("ContractDeployment.created", ""),
-                    verified=result.get("ContractDeployment.verified_source", False),
-                    tags=[result.get("ContractDeployment.application_domain", "")],
-                    storage_protocol=result.get("ContractDeployment.storage_protocol"),
-                    storage_address=result.get("ContractDeployment.storage_address"),
-                    experimental=result.get("ContractDeployment.experimental"),
-                    solc_version=result.get("ContractDeployment.solc_version"),
-                    verified_source=result.get("ContractDeployment.verified_source"),
-                    verified_source_code=result.get(
-                        "ContractDeployment.verified_source_code"
-                    ),
-                    functionalities=result.get("ContractDeployment.functionalities"),
-                    standards=result.get("ContractDeployment.standards"),
-                    patterns=result.get("ContractDeployment.patterns"),
-                    domain=result.get("ContractDeployment.application_domain"),
-                    security_risks=result.get(
-                        "ContractDeployment.security_risks_description", ""
-                    ).split(", ")
-                    if result.get("ContractDeployment.security_risks_description")
-                    else [],
-                    similarity_score=result.get("cosine_similarity"),
-                )
+                formatted_result = to_contract_result(result)
                 print(
                     f"Vector search result: {formatted_result.id}, {formatted_result.name}"
                 )
@@ -276,36 +343,14 @@ async def search_text_source_code_contracts(request: SearchRequest):
     Uses literal string matching for more precise results.
     """
     try:
-        results = client.search_by_text_source_code(request.query, request.limit)
+        results = await client.search_by_text_source_code(
+            request.query, request.limit, projection="detail"
+        )
         formatted_results = []
 
         for result in results:
             try:
-                formatted_result = ContractResult(
-                    id=result.get("uid", ""),
-                    name=result.get("ContractDeployment.name", ""),
-                    description=result.get("ContractDeployment.description", ""),
-                    created=result.get("ContractDeployment.created", ""),
-                    verified=result.get("ContractDeployment.verified_source", False),
-                    tags=[result.get("ContractDeployment.application_domain", "")],
-                    storage_protocol=result.get("ContractDeployment.storage_protocol"),
-                    storage_address=result.get("ContractDeployment.storage_address"),
-                    experimental=result.get("ContractDeployment.experimental"),
-                    solc_version=result.get("ContractDeployment.solc_version"),
-                    verified_source=result.get("ContractDeployment.verified_source"),
-                    verified_source_code=result.get(
-                        "ContractDeployment.verified_source_code"
-                    ),
-                    functionalities=result.get("ContractDeployment.functionalities"),
-                    standards=result.get("ContractDeployment.standards"),
-                    patterns=result.get("ContractDeployment.patterns"),
-                    domain=result.get("ContractDeployment.application_domain"),
-                    security_risks=result.get(
-                        "ContractDeployment.security_risks_description", ""
-                    ).split(", ")
-                    if result.get("ContractDeployment.security_risks_description")
-                    else [],
-                )
+                formatted_result = to_contract_result(result)
                 print(
                     f"Text source code search result: {formatted_result.id}, {formatted_result.name}"
                 )
@@ -330,36 +375,14 @@ async def search_text_contracts(request: SearchRequest):
     Uses literal string matching for finding contracts by various criteria.
     """
     try:
-        results = client.search_by_text(request.query, request.limit)
+        results = await client.search_by_text(
+            request.query, request.limit, projection="detail"
+        )
         formatted_results = []
 
         for result in results:
             try:
-                formatted_result = ContractResult(
-                    id=result.get("uid", ""),
-                    name=result.get("ContractDeployment.name", ""),
-                    description=result.get("ContractDeployment.description", ""),
-                    created=result.get("ContractDeployment.created", ""),
-                    verified=result.get("ContractDeployment.verified_source", False),
-                    tags=[result.get("ContractDeployment.application_domain", "")],
-                    storage_protocol=result.get("ContractDeployment.storage_protocol"),
-                    storage_address=result.get("ContractDeployment.storage_address"),
-                    experimental=result.get("ContractDeployment.experimental"),
-                    solc_version=result.get("ContractDeployment.solc_version"),
-                    verified_source=result.get("ContractDeployment.verified_source"),
-                    verified_source_code=result.get(
-                        "ContractDeployment.verified_source_code"
-                    ),
-                    functionalities=result.get("ContractDeployment.functionalities"),
-                    standards=result.get("ContractDeployment.standards"),
-                    patterns=result.get("ContractDeployment.patterns"),
-                    domain=result.get("ContractDeployment.application_domain"),
-                    security_risks=result.get(
-                        "ContractDeployment.security_risks_description", ""
-                    ).split(", ")
-                    if result.get("ContractDeployment.security_risks_description")
-                    else [],
-                )
+                formatted_result = to_contract_result(result)
                 print(
                     f"Text search result: {formatted_result.id}, {formatted_result.name}"
                 )
@@ -377,6 +400,54 @@ async def search_text_contracts(request: SearchRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/search_hybrid")
+async def hybrid_search_contracts(request: HybridSearchRequest):
+    """
+    Perform vector and text search concurrently and merge both rankings with
+    reciprocal rank fusion, deduplicating contracts found by both.
+    """
+    try:
+        results = await client.hybrid_search(
+            request.query,
+            request.limit,
+            projection="detail",
+            weights={"vector": request.vector_weight, "text": request.text_weight},
+        )
+        formatted_results = []
+
+        for result in results:
+            try:
+                formatted_result = to_contract_result(result)
+                print(
+                    f"Hybrid search result: {formatted_result.id}, {formatted_result.name}"
+                )
+                formatted_results.append(formatted_result.model_dump())
+            except Exception as e:
+                print(f"Error processing hybrid search result: {str(e)}")
+                continue
+
+        return JSONResponse(content=formatted_results)
+    except Exception as e:
+        print(f"Hybrid search error: {str(e)}")
+        import traceback
+
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/stats")
+async def corpus_stats():
+    """
+    Count contracts by processing state (enriched, embedded, missing IDs, ...)
+    with a single server-side counting query.
+    """
+    try:
+        return JSONResponse(content=await client.get_corpus_stats())
+    except Exception as e:
+        print(f"Stats error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @app.get("/", response_class=HTMLResponse)
 async def root():
     """API Documentation Landing Page"""
@@ -6,7 +6,8 @@ from enum import Enum
 
 from fastapi import FastAPI, Request
 
-from src.core.data_access.dgraph_client import DgraphClient
+from src.core.data_access.async_dgraph_client import AsyncDgraphClient
+from src.core.data_access.filters import SearchFilters
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -78,7 +79,7 @@ class Prompt:
 
 class MCPServer:
     def __init__(self):
-        self.vector_db = DgraphClient()
+        self.vector_db = AsyncDgraphClient()
         self.initialized = False
         self.client_info = None
 
@@ -129,22 +130,71 @@ class MCPServer:
                             "minimum": 0.0,
                             "maximum": 1.0,
                         },
+                        "filters": {
+                            "type": "object",
+                            "description": "Only return contracts matching every given filter; list filters match any of their values",
+                            "properties": {
+                                "standards": {
+                                    "type": "array",
+                                    "items": {"type": "string"},
+                                    "description": "Standards, e.g. erc-20, erc-4626",
+                                },
+                                "patterns": {
+                                    "type": "array",
+                                    "items": {"type": "string"},
+                                    "description": "Design patterns",
+                                },
+                                "functionalities": {
+                                    "type": "array",
+                                    "items": {"type": "string"},
+                                    "description": "Functionalities",
+                                },
+                                "application_domain": {
+                                    "type": "array",
+                                    "items": {"type": "string"},
+                                    "description": "Application domains",
+                                },
+                                "solc_version": {
+                                    "type": "array",
+                                    "items": {"type": "string"},
+                                    "description": "Solidity compiler versions",
+                                },
+                                "block_from": {
+                                    "type": "integer",
+                                    "description": "First deployment block",
+                                    "minimum": 0,
+                                },
+                                "block_to": {
+                                    "type": "integer",
+                                    "description": "Last deployment block",
+                                    "minimum": 0,
+                                },
+                                "experimental": {
+                                    "type": "boolean",
+                                    "description": "Whether the contract uses experimental features",
+                                },
+                            },
+                        },
                     },
                     "required": ["query"],
                 },
             ),
             Tool(
                 name="get_contract_details",
-                description="Get detailed information about a specific contract by UID",
+                description="Get detailed information about one or more contracts by UID",
                 inputSchema={
                     "type": "object",
                     "properties": {
                         "uid": {
                             "type": "string",
                             "description": "Unique identifier of the contract",
-                        }
+                        },
+                        "uids": {
+                            "type": "array",
+                            "items": {"type": "string"},
+                            "description": "Unique identifiers of several contracts, fetched together",
+                        },
                     },
-                    "required": ["uid"],
                 },
             ),
         ]
@@ -236,18 +286,18 @@ class MCPServer:
         """Handle tools/list request"""
         return {"tools": [asdict(tool) for tool in self.tools]}
 
-    def handle_tools_call(self, params: Dict[str, Any]) -> Dict[str, Any]:
+    async def handle_tools_call(self, params: Dict[str, Any]) -> Dict[str, Any]:
         """Handle tools/call request"""
         tool_name = params.get("name")
         arguments = params.get("arguments", {})
 
         try:
             if tool_name == "search_contracts":
-                return self._search_contracts(arguments)
+                return await self._search_contracts(arguments)
             elif tool_name == "vector_search_contracts":
-                return self._vector_search_contracts(arguments)
+                return await self._vector_search_contracts(arguments)
             elif tool_name == "get_contract_details":
-                return self._get_contract_details(arguments)
+                return await self._get_contract_details(arguments)
             else:
                 raise MCPError(
                     ErrorCode.METHOD_NOT_FOUND.value, f"Unknown tool: {tool_name}"
@@ -297,7 +347,7 @@ class MCPServer:
                 ErrorCode.METHOD_NOT_FOUND.value, f"Unknown prompt: {prompt_name}"
             )
 
-    def _search_contracts(self, arguments: Dict[str, Any]) -> Dict[str, Any]:
+    async def _search_contracts(self, arguments: Dict[str, Any]) -> Dict[str, Any]:
         """Execute contract search tool"""
         query = arguments.get("query")
         k = arguments.get("k", 5)
@@ -305,7 +355,9 @@ class MCPServer:
         if not query:
             raise ValueError("Query parameter is required")
 
-        results = self.vector_db.vector_search(query, limit=k)
+        results = await self.vector_db.vector_search(
+            query, limit=k, projection="summary"
+        )
 
         return {
             "content": [
@@ -324,56 +376,64 @@ class MCPServer:
             ]
         }
 
-    def _vector_search_contracts(self, arguments: Dict[str, Any]) -> Dict[str, Any]:
+    async def _vector_search_contracts(
+        self, arguments: Dict[str, Any]
+    ) -> Dict[str, Any]:
         """Execute vector similarity search tool"""
         query = arguments.get("query")
         limit = arguments.get("limit", 5)
+        threshold = arguments.get("threshold", 0.7)
+        filters = SearchFilters.from_dict(arguments.get("filters"))
 
         if not query:
             raise ValueError("Query parameter is required")
 
-        client = DgraphClient()
-        try:
-            results = client.vector_search(query, limit=limit)
-
-            formatted_results = []
-            for i, result in enumerate(results):
-                formatted_results.append(
-                    f"Contract {i + 1}:\n"
-                    f"UID: {result.get('uid', 'N/A')}\n"
-                    f"Name: {result.get('ContractDeployment.name', 'N/A')}\n"
-                    f"Description: {result.get('ContractDeployment.description', 'N/A')[:200]}...\n"
-                    f"Domain: {result.get('ContractDeployment.application_domain', 'N/A')}\n"
-                    f"Functionality: {result.get('ContractDeployment.functionalities', 'N/A')}\n"
-                    f"Standards: {result.get('ContractDeployment.standards', 'N/A')}\n"
-                    f"Patterns: {result.get('ContractDeployment.patterns', 'N/A')}\n"
-                    f"Verified: {result.get('ContractDeployment.verified_source', False)}\n"
-                )
+        results = await self.vector_db.vector_search(
+            query,
+            limit=limit,
+            projection="summary",
+            threshold=threshold,
+            filters=filters,
+        )
 
-            return {
-                "content": [
-                    {
-                        "type": "text",
-                        "text": f"Found {len(results)} contracts similar to '{query}'):\n\n"
-                        + "\n".join(formatted_results)
-                        if formatted_results
-                        else "No similar contracts found.",
-                    }
-                ]
-            }
-        finally:
-            client.close()
+        formatted_results = []
+        for i, result in enumerate(results):
+            formatted_results.append(
+                f"Contract {i + 1}:\n"
+                f"UID: {result.get('uid', 'N/A')}\n"
+                f"Name: {result.get('ContractDeployment.name', 'N/A')}\n"
+                f"Description: {result.get('ContractDeployment.description', 'N/A')[:200]}...\n"
+                f"Domain: {result.get('ContractDeployment.application_domain', 'N/A')}\n"
+                f"Functionality: {result.get('ContractDeployment.functionalities', 'N/A')}\n"
+                f"Standards: {result.get('ContractDeployment.standards', 'N/A')}\n"
+                f"Patterns: {result.get('ContractDeployment.patterns', 'N/A')}\n"
+                f"Verified: {result.get('ContractDeployment.verified_source', False)}\n"
+            )
+
+        return {
+            "content": [
+                {
+                    "type": "text",
+                    "text": f"Found {len(results)} contracts similar to '{query}'):\n\n"
+                    + "\n".join(formatted_results)
+                    if formatted_results
+                    else "No similar contracts found.",
+                }
+            ]
+        }
 
-    def _get_contract_details(self, arguments: Dict[str, Any]) -> Dict[str, Any]:
-        """Get contract details by UID"""
+    async def _get_contract_details(
+        self, arguments: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Get contract details by UID, or by a list of UIDs in one lookup"""
+        uids = arguments.get("uids") or []
         uid = arguments.get("uid")
 
-        if not uid:
+        if not uid and not uids:
             raise ValueError("UID parameter is required")
 
-        client = DgraphClient()
-        try:
-            result = client.get_contract_by_uid(uid)
+        if uid and not uids:
+            result = await self.vector_db.get_contract_by_uid(uid, projection="detail")
             return {
                 "content": [
                     {
@@ -382,8 +442,15 @@ class MCPServer:
                     }
                 ]
             }
-        finally:
-            client.close()
+
+        if uid:
+            uids = [uid] + list(uids)
+        result = await self.vector_db.get_contracts_by_uids(uids, projection="detail")
+        missing = [u for u in uids if u not in result]
+        text = f"Contract Details for {len(result)} of {len(uids)} UIDs:\n\n{json.dumps(result, indent=2)}"
+        if missing:
+            text += f"\n\nNot found: {', '.join(missing)}"
+        return {"content": [{"type": "text", "text": text}]}
 
     def _get_all_contracts(self) -> Dict[str, Any]:
         """Get all contracts resource"""
@@ -545,7 +612,7 @@ async def process_request(req_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         elif method == "tools/list":
             result = mcp_server.handle_tools_list(params)
         elif method == "tools/call":
-            result = mcp_server.handle_tools_call(params or {})
+            result = await mcp_server.handle_tools_call(params or {})
         elif method == "resources/list":
             result = mcp_server.handle_resources_list(params)
         elif method == "resources/read":
@@ -583,6 +650,16 @@ def create_error_response(
     return {"jsonrpc": "2.0", "id": request_id, "error": error}
 
 
+@app.on_event("startup")
+async def start_vector_index():
+    mcp_server.vector_db.start_vector_index()
+
+
+@app.on_event("shutdown")
+async def close_vector_db():
+    await mcp_server.vector_db.close()
+
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
@@ -590,6 +667,14 @@ async def health_check():
         "status": "healthy",
         "mcp_version": MCP_VERSION,
         "initialized": mcp_server.initialized,
+        "query_embedding_cache": mcp_server.vector_db.embedding_model.stats(),
+        "search_result_cache": mcp_server.vector_db.result_cache.stats(),
+        "query_planner": mcp_server.vector_db.planner.stats(),
+        "vector_index": (
+            mcp_server.vector_db.vector_index.stats()
+            if mcp_server.vector_db.vector_index is not None
+            else None
+        ),
     }
 
 
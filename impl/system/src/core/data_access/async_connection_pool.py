@@ -0,0 +1,147 @@
+"""
+Connection pool of gRPC aio stubs over one or more Dgraph alpha endpoints.
+
+Shares the routing, ejection and reconnection of ConnectionPool, with an
+async acquire and health checks that run as a task of the event loop. The
+channels are bound to the loop they are opened in, so the pool must be built
+from inside the running loop.
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+import grpc
+from grpc import aio
+from pydgraph.proto import api_pb2 as api
+from pydgraph.proto import api_pb2_grpc as api_grpc
+
+from src.core.data_access.connection_pool import ConnectionPool, PooledStub
+
+
+class AsyncAlphaStub(api_grpc.DgraphStub):
+    """Dgraph stub on its own aio channel to an alpha."""
+
+    def __init__(
+        self, address: str, credentials: Optional[grpc.ChannelCredentials] = None
+    ) -> None:
+        if credentials is None:
+            self.channel = aio.insecure_channel(address)
+        else:
+            self.channel = aio.secure_channel(address, credentials)
+        super().__init__(self.channel)
+
+    async def close(self) -> None:
+        await self.channel.close()
+
+
+class AsyncConnectionPool(ConnectionPool):
+    """
+    Pool of aio stubs spread across the alphas of a Dgraph cluster
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        # Keeps the close tasks of replaced stubs alive until they finish
+        self._closing: set[asyncio.Task] = set()
+        super().__init__(*args, **kwargs)
+
+    def _default_stub_factory(self, address: str) -> AsyncAlphaStub:
+        credentials = grpc.ssl_channel_credentials() if self.secure else None
+        return AsyncAlphaStub(address, credentials)
+
+    def _close_stub(self, pooled: PooledStub) -> None:
+        try:
+            task = asyncio.get_running_loop().create_task(pooled.stub.close())
+        except Exception as e:
+            self.logger.debug(
+                f"Failed to close stub for {pooled.endpoint.address}: {e}"
+            )
+            return
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[PooledStub]:
+        """
+        Borrows a stub for the duration of a request, like
+        ConnectionPool.acquire
+
+        Returns:
+            The pooled stub
+        """
+        pooled = self._select()
+        try:
+            yield pooled
+        except Exception as e:
+            self._record_outcome(pooled, e)
+            raise
+        else:
+            self._record_outcome(pooled)
+        finally:
+            self._release(pooled)
+
+    def client(self):
+        raise NotImplementedError(
+            "AsyncConnectionPool has no pydgraph client, use acquire() instead"
+        )
+
+    async def check_health(self, timeout: float = 2.0) -> dict[str, bool]:
+        """
+        Probes every alpha with a version check, like
+        ConnectionPool.check_health
+
+        Args:
+            timeout: Deadline of each probe, in seconds
+
+        Returns:
+            Whether each alpha answered, keyed by address
+        """
+        health = {}
+        for endpoint in self.endpoints:
+            pooled = self._borrow_probe_stub(endpoint)
+            try:
+                await pooled.stub.CheckVersion(api.Check(), timeout=timeout)
+                self._record_success(endpoint)
+                health[endpoint.address] = True
+            except Exception as e:
+                self.logger.warning(
+                    f"Health check failed for Dgraph alpha {endpoint.address}: {e}"
+                )
+                self._record_failure(pooled, e)
+                health[endpoint.address] = False
+            finally:
+                self._release(pooled)
+        return health
+
+    def start_health_checks(self, interval: float) -> None:
+        """
+        Runs check_health every interval seconds as a task of the running loop
+
+        Args:
+            interval: Seconds between two rounds of probes
+        """
+        if self._health_checker is not None:
+            return
+        self._health_checker = asyncio.get_running_loop().create_task(
+            self._health_check_loop(interval)
+        )
+
+    async def _health_check_loop(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.check_health()
+            except Exception as e:
+                self.logger.error(f"Dgraph health check failed: {e}")
+
+    async def close(self) -> None:
+        """
+        Stops the health checks and closes every channel of the pool
+        """
+        if self._health_checker is not None:
+            self._health_checker.cancel()
+        for endpoint in self.endpoints:
+            for pooled in endpoint.stubs:
+                self._close_stub(pooled)
+        await asyncio.gather(*self._closing, return_exceptions=True)
+        self.logger.info("Connection pool closed")
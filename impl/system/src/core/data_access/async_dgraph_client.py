@@ -0,0 +1,1119 @@
+import asyncio
+import json
+import time
+from typing import Any, AsyncIterator, Iterable, Optional
+
+import numpy as np
+
+from pydgraph.proto import api_pb2 as api
+
+from src.core.data_access.async_connection_pool import AsyncConnectionPool
+from src.core.data_access.connection_pool import (
+    endpoints_from_config,
+    load_dgraph_config,
+)
+from src.core.data_access.dgraph_client import BulkMutationResult
+from src.core.data_access.filters import SearchFilters
+from src.core.data_access.projections import (
+    DEFAULT_PROJECTION,
+    EMBEDDINGS_FIELD,
+    includes_field,
+)
+from src.core.data_access.queries import (
+    contract_by_id_query,
+    contract_by_uid_query,
+    contracts_by_ids_query,
+    contracts_by_uids_query,
+    contracts_page_query,
+    CORPUS_STATS_QUERY,
+    parse_corpus_stats,
+    facet_counts_query,
+    hydrate_results,
+    embedding_rows,
+    enriched_contracts_page_query,
+    initial_top_k,
+    parse_facet_counts,
+    prefiltered_search_query,
+    score_results,
+    searchable_embeddings_page_query,
+    select_vector_results,
+    source_code_search_query,
+    text_search_query,
+    vector_search_query,
+)
+from src.core.data_processing.embeddings import CachedEmbeddings, get_query_embedder
+from src.core.data_retrieval.bm25 import BM25Index
+from src.core.data_retrieval.embedding_snapshot import (
+    DEFAULT_SNAPSHOT_DIR,
+    load_snapshot,
+)
+from src.core.data_retrieval.fusion import DEFAULT_RRF_K, reciprocal_rank_fusion
+from src.core.data_retrieval.planner import PREFILTER, QueryPlanner, SearchPlan
+from src.core.data_retrieval.result_cache import (
+    SearchResultCache,
+    changed_since,
+    invalidation_scope,
+    written_uids,
+)
+from src.core.data_retrieval.vector_index import (
+    BruteForceVectorIndex,
+    create_vector_index,
+)
+from src.utils.logger import logger
+
+
+class AsyncDgraphClient:
+    """
+    Asyncio interface for interacting with Dgraph database, built on gRPC aio.
+
+    Mirrors the read and write interface of DgraphClient with awaitable
+    methods, so the FastAPI and MCP servers never block their event loop on
+    a Dgraph round-trip or on computing a query embedding.
+    """
+
+    def __init__(
+        self,
+        host: Optional[str] = None,
+        port: Optional[int] = None,
+        config_path: str = "config/dgraph.yaml",
+        pool: Optional[AsyncConnectionPool] = None,
+        embedding_model: Optional[Any] = None,
+        result_cache: Optional[SearchResultCache] = None,
+        planner: Optional[QueryPlanner] = None,
+        text_index: Optional[BM25Index] = None,
+        vector_index_backend: str = "auto",
+        vector_snapshot_dir: Optional[str] = DEFAULT_SNAPSHOT_DIR,
+    ) -> None:
+        self.logger = logger.getChild("AsyncDgraphClient")
+        # Spread across the alphas of the config like DgraphClient; the
+        # channels are bound to the event loop they are created in, so the
+        # pool is built lazily from inside the server's running loop.
+        self.dgraph_config = load_dgraph_config(config_path)
+        self.endpoints = endpoints_from_config(self.dgraph_config, host, port)
+        self.pool = pool
+
+        self.result_cache = result_cache or SearchResultCache()
+        self.planner = planner or QueryPlanner()
+
+        # search_by_text is served from the BM25 index once it is built;
+        # writes seen through the result cache mark contracts for re-indexing
+        self.text_index = text_index or BM25Index()
+        self._text_index_dirty: set[str] = set()
+        self._text_index_stale = False
+        # Contracts re-indexed while a rebuild runs, replayed on the new index
+        self._text_index_replay: Optional[set[str]] = None
+        self._text_index_task: Optional[asyncio.Task] = None
+
+        # Unfiltered vector searches are served from an in-memory mirror of
+        # the embeddings once it is built, kept in sync the same way
+        self.vector_index_backend = vector_index_backend
+        # Memory-mapped at startup when present, instead of a build
+        self.vector_snapshot_dir = vector_snapshot_dir
+        self.vector_index: Optional[BruteForceVectorIndex] = None
+        self._vector_index_dirty: set[str] = set()
+        self._vector_index_stale = False
+        self._vector_index_replay: Optional[set[str]] = None
+        self._vector_index_task: Optional[asyncio.Task] = None
+        self.result_cache.add_listener(self._on_contracts_changed)
+
+        # Initialize embedding model for vector search
+        if embedding_model is None:
+            embedding_model = get_query_embedder()
+        elif not isinstance(embedding_model, CachedEmbeddings):
+            embedding_model = CachedEmbeddings(embedding_model)
+        self.embedding_model = embedding_model
+
+    def _get_pool(self) -> AsyncConnectionPool:
+        """Returns the connection pool, opening its channels on first use."""
+        if self.pool is None:
+            self.pool = AsyncConnectionPool.from_config(
+                self.dgraph_config, endpoints=self.endpoints
+            )
+        return self.pool
+
+    async def _send(
+        self, request: api.Request, timeout: Optional[float] = None
+    ) -> api.Response:
+        """Sends a request to the alpha the pool routes it to."""
+        async with self._get_pool().acquire() as pooled:
+            return await pooled.stub.Query(request, timeout=timeout)
+
+    async def query(
+        self,
+        query: str,
+        variables: Optional[dict[str, str]] = None,
+        timeout: Optional[float] = None,
+    ) -> dict:
+        """
+        Runs a read-only query
+
+        Args:
+          query: The DQL query
+          variables: Optional DQL query variables
+          timeout: Optional deadline for the RPC, in seconds
+
+        Returns:
+          The decoded JSON response
+        """
+        request = api.Request(query=query, vars=variables or {}, read_only=True)
+        try:
+            response = await self._send(request, timeout)
+            return json.loads(response.json)
+        except Exception as e:
+            self.logger.exception(f"Dgraph query failed: {e}")
+            raise
+
+    async def mutate(self, mutation_data: Any) -> api.Response:
+        """
+        Performs a mutation (insert/update) committed in a single round-trip
+
+        Args:
+          mutation_data: A dictionary (or list of them) to be converted to JSON for the mutation.
+
+        Returns:
+          The mutation response
+        """
+        mutation = api.Mutation(set_json=json.dumps(mutation_data).encode("utf8"))
+        request = api.Request(mutations=[mutation], commit_now=True)
+        try:
+            response = await self._send(request)
+            self.logger.info("Mutation successful")
+        except Exception as e:
+            self.logger.exception("Mutation failed")
+            raise
+        records = mutation_data if isinstance(mutation_data, list) else [mutation_data]
+        self.result_cache.invalidate(
+            invalidation_scope(records), changed=written_uids(records)
+        )
+        return response
+
+    async def mutate_many(
+        self, records: list[dict], chunk_size: int = 500
+    ) -> BulkMutationResult:
+        """
+        Performs many set mutations, one request per chunk of records, like
+        DgraphClient.mutate_many
+
+        If a chunk fails, its records are retried one by one so that a single
+        bad record only fails itself and the failure is reported per record.
+
+        Args:
+          records: Dictionaries to be converted to JSON for the mutation, usually keyed by uid
+          chunk_size: Maximum number of records per request
+
+        Returns:
+          The per-record outcome, keyed by uid (or "#<index>" for records without one)
+        """
+        result = BulkMutationResult()
+        keyed_records = []
+        for index, record in enumerate(records):
+            key = record.get("uid") if record else None
+            key = key or f"#{index}"
+            if not record:
+                result.failed[key] = "Empty record"
+                continue
+            keyed_records.append((key, record))
+
+        for start in range(0, len(keyed_records), chunk_size):
+            chunk = keyed_records[start : start + chunk_size]
+            try:
+                await self._set_objects([record for _, record in chunk])
+                result.succeeded.extend(key for key, _ in chunk)
+                continue
+            except Exception as e:
+                if len(chunk) == 1:
+                    result.failed[chunk[0][0]] = str(e)
+                    continue
+                self.logger.warning(
+                    f"Bulk mutation of {len(chunk)} records failed, retrying one by one: {e}"
+                )
+
+            for key, record in chunk:
+                try:
+                    await self._set_objects([record])
+                    result.succeeded.append(key)
+                except Exception as e:
+                    result.failed[key] = str(e)
+
+        self.logger.info(
+            f"Bulk mutation finished: {result.success_count} succeeded, {result.failure_count} failed"
+        )
+        return result
+
+    async def _set_objects(self, objects: list[dict]) -> api.Response:
+        """
+        Sets a list of objects in a single mutation committed in one request
+
+        Args:
+          objects: Dictionaries to be converted to JSON for the mutation
+        """
+        mutation = api.Mutation(set_json=json.dumps(objects).encode("utf8"))
+        request = api.Request(mutations=[mutation], commit_now=True)
+        response = await self._send(request)
+        self.result_cache.invalidate(
+            invalidation_scope(objects), changed=written_uids(objects)
+        )
+        return response
+
+    async def insert_embeddings_bulk(
+        self, pairs: Iterable[tuple[str, list[float]]], chunk_size: int = 500
+    ) -> BulkMutationResult:
+        """
+        Inserts embeddings for many contracts, one request per chunk
+
+        Args:
+            pairs: (uid, embeddings) tuples
+            chunk_size: Maximum number of contracts per request
+
+        Returns:
+            The per-contract outcome, keyed by uid
+        """
+        records = [
+            {
+                "uid": uid,
+                "ContractDeployment.embeddings": json.dumps(
+                    [float(e) for e in embeddings]
+                ),
+            }
+            for uid, embeddings in pairs
+        ]
+        return await self.mutate_many(records, chunk_size=chunk_size)
+
+    async def insert_embeddings(self, uid: str, embeddings: list[float]) -> None:
+        """
+        Inserts embeddings for a contract into Dgraph
+
+        Args:
+            uid: The UID of the contract to update
+            embeddings: List of embedding values to store
+        """
+        try:
+            await self._set_objects(
+                [
+                    {
+                        "uid": uid,
+                        "ContractDeployment.embeddings": json.dumps(
+                            [float(e) for e in embeddings]
+                        ),
+                    }
+                ]
+            )
+            self.logger.info(f"Successfully inserted embeddings for contract {uid}")
+        except Exception as e:
+            self.logger.exception(
+                f"Failed to insert embeddings for contract {uid}: {str(e)}"
+            )
+            raise
+
+    async def get_contracts(
+        self,
+        batch_size: int = 5,
+        offset: int = 0,
+        enriched: Optional[bool] = False,
+        projection: str = DEFAULT_PROJECTION,
+        after: Optional[str] = None,
+    ) -> list[dict]:
+        """
+        Retrieves a page of contracts, like DgraphClient.get_contracts
+
+        Args:
+          batch_size: Maximum number of results to return
+          offset: Number of results to skip (prefer after for full scans)
+          enriched: If True, only enriched contracts. If False, only non-enriched. If None, all.
+          projection: Name of the field-projection profile to select
+          after: Only return contracts with a UID greater than this one
+
+        Returns:
+          The contracts, in ascending UID order
+        """
+        response = await self.query(
+            *contracts_page_query(batch_size, enriched, projection, after, offset)
+        )
+        contracts = response.get("allContractDeployments", [])
+        self.logger.info(
+            f"Retrieved {'' if enriched else 'un' if enriched is False else 'all '}enriched contracts ({len(contracts)})"
+        )
+        return contracts
+
+    async def iter_contracts(
+        self,
+        enriched: Optional[bool] = None,
+        page_size: int = 100,
+        projection: str = DEFAULT_PROJECTION,
+        after: Optional[str] = None,
+    ) -> AsyncIterator[list[dict]]:
+        """
+        Lazily streams contracts in pages using a UID cursor, like
+        DgraphClient.iter_contracts
+
+        Args:
+          enriched: If True, only enriched contracts. If False, only non-enriched. If None, all.
+          page_size: Number of contracts per page
+          projection: Name of the field-projection profile to select
+          after: Start after this UID, to resume an interrupted scan
+
+        Yields:
+          Lists of at most page_size contracts, in ascending UID order
+        """
+        while True:
+            page = await self.get_contracts(
+                batch_size=page_size,
+                enriched=enriched,
+                projection=projection,
+                after=after,
+            )
+            if not page:
+                return
+
+            yield page
+
+            if len(page) < page_size:
+                return
+            after = page[-1]["uid"]
+
+    async def get_contract_by_id(
+        self, contract_id: str, projection: str = DEFAULT_PROJECTION
+    ) -> dict:
+        """
+        Retrieves a contract by its reproducible ID.
+
+        Args:
+            contract_id: The reproducible ID of the contract to retrieve.
+            projection: Name of the field-projection profile to select.
+
+        Returns:
+            The first matching contract, or an empty dict.
+        """
+        response = await self.query(*contract_by_id_query(contract_id, projection))
+        contracts = response.get("contract", [])
+        if not contracts:
+            self.logger.warning(f"No contract found with ID {contract_id}")
+            return {}
+        return contracts[0]
+
+    async def get_contract_by_uid(
+        self, uid: str, projection: str = DEFAULT_PROJECTION
+    ) -> list[dict]:
+        """
+        Retrieves a contract by its UID.
+
+        Args:
+          uid: The UID of the contract to retrieve.
+          projection: Name of the field-projection profile to select.
+
+        Returns:
+          The matching contracts, as returned by DgraphClient.get_contract_by_uid.
+        """
+        response = await self.query(*contract_by_uid_query(uid, projection))
+        self.logger.info(f"Retrieved contract with UID {uid}")
+        return response.get("contract", [])
+
+    async def get_contracts_by_ids(
+        self,
+        contract_ids: Iterable[str],
+        projection: str = DEFAULT_PROJECTION,
+        chunk_size: int = 200,
+    ) -> dict[str, dict]:
+        """
+        Retrieves many contracts by their reproducible IDs, one query per chunk
+
+        Args:
+            contract_ids: The reproducible IDs of the contracts to retrieve
+            projection: Name of the field-projection profile to select
+            chunk_size: Maximum number of IDs per query
+
+        Returns:
+            The contracts keyed by ID; IDs that were not found are absent
+        """
+        return await self._get_contracts_in_chunks(
+            contract_ids,
+            contracts_by_ids_query,
+            "ContractDeployment.id",
+            projection,
+            chunk_size,
+        )
+
+    async def get_contracts_by_uids(
+        self,
+        uids: Iterable[str],
+        projection: str = DEFAULT_PROJECTION,
+        chunk_size: int = 200,
+    ) -> dict[str, dict]:
+        """
+        Retrieves many contracts by their UIDs, one query per chunk
+
+        Args:
+            uids: The UIDs of the contracts to retrieve
+            projection: Name of the field-projection profile to select
+            chunk_size: Maximum number of UIDs per query
+
+        Returns:
+            The contracts keyed by UID; UIDs that were not found are absent
+        """
+        return await self._get_contracts_in_chunks(
+            uids, contracts_by_uids_query, "uid", projection, chunk_size
+        )
+
+    async def _get_contracts_in_chunks(
+        self,
+        keys: Iterable[str],
+        build_query,
+        key_field: str,
+        projection: str,
+        chunk_size: int,
+    ) -> dict[str, dict]:
+        """
+        Runs a multi-contract lookup query per chunk of keys, like
+        DgraphClient._get_contracts_in_chunks
+        """
+        # Deduplicate while keeping the caller's order
+        keys = list(dict.fromkeys(key for key in keys if key))
+        contracts = {}
+        for start in range(0, len(keys), chunk_size):
+            response = await self.query(
+                *build_query(keys[start : start + chunk_size], projection)
+            )
+            for contract in response.get("contracts", []):
+                contracts.setdefault(contract.get(key_field), contract)
+        self.logger.info(
+            f"Retrieved {len(contracts)} of {len(keys)} contracts by {key_field}"
+        )
+        return contracts
+
+    async def get_corpus_stats(self) -> dict[str, int]:
+        """
+        Counts verified contracts by processing state in a single query
+
+        Returns:
+            The counts, as returned by DgraphClient.get_corpus_stats
+        """
+        start_time = time.time()
+        stats = parse_corpus_stats(await self.query(CORPUS_STATS_QUERY))
+        latency_ms = (time.time() - start_time) * 1000
+        self.logger.info(f"Corpus stats retrieved - Latency: {latency_ms:.2f}ms")
+        return stats
+
+    async def embed_query(self, query: str) -> list[float]:
+        """Computes a query embedding in a worker thread, unless it is cached."""
+        embedding_start_time = time.time()
+        query_embedding = self.embedding_model.cached_query(query)
+        if query_embedding is None:
+            query_embedding = await asyncio.to_thread(
+                self.embedding_model.compute_query, query
+            )
+        embedding_latency_ms = (time.time() - embedding_start_time) * 1000
+        self.logger.info(
+            f"Query embedding length: {len(query_embedding)} - Processing time: {embedding_latency_ms:.2f}ms"
+        )
+        return query_embedding
+
+    async def vector_search(
+        self,
+        query: str,
+        limit: int = 5,
+        projection: str = DEFAULT_PROJECTION,
+        include_embeddings: Optional[bool] = None,
+        threshold: Optional[float] = None,
+        filters: Optional[SearchFilters] = None,
+    ) -> list[dict]:
+        """
+        Performs vector similarity search on contracts using natural language query
+
+        Unfiltered searches are answered from the in-memory vector index
+        when it is built, hydrating only the nearest contracts; otherwise
+        over-fetches adaptively like DgraphClient.vector_search.
+
+        Args:
+            query: Natural language search query
+            limit: Maximum number of results to return
+            projection: Name of the field-projection profile to return
+            include_embeddings: Whether to return the embeddings; defaults to
+                whether the projection selects them
+            threshold: Minimum cosine similarity of the results, or None to
+                keep every candidate
+            filters: Structured filters, applied inside the similar_to query
+
+        Returns:
+            List of similar contracts with metadata, each including cosine
+            similarity, highest similarity first
+        """
+        try:
+            cache_key = self.result_cache.make_key(
+                "vector_search",
+                query,
+                limit=limit,
+                projection=projection,
+                include_embeddings=include_embeddings,
+                threshold=threshold,
+                filters=filters.active() if filters else None,
+            )
+            cached = self.result_cache.get(cache_key)
+            if cached is not None:
+                self.logger.info(f"Vector search served from cache: '{query[:50]}...'")
+                return cached
+            cache_epoch = self.result_cache.epoch()
+
+            query_embedding = await self.embed_query(query)
+
+            plan = await self._plan_search(filters)
+            results = None
+            if filters is None or filters.is_empty():
+                results = await self._indexed_vector_search(
+                    query_embedding, limit, projection, include_embeddings, threshold
+                )
+            elif plan.strategy == PREFILTER:
+                results = await self._prefiltered_search(
+                    query_embedding,
+                    limit,
+                    projection,
+                    include_embeddings,
+                    threshold,
+                    filters,
+                    plan.root,
+                )
+
+            if results is None:
+                start_time = time.time()
+                top_k = initial_top_k(limit, threshold)
+                previous_count = None
+                rounds = 0
+                while top_k is not None:
+                    rounds += 1
+                    response = await self.query(
+                        *vector_search_query(
+                            query_embedding, top_k, projection, filters
+                        )
+                    )
+                    candidates = response.get("similar_contracts", [])
+                    score_results(
+                        candidates, query_embedding, projection, include_embeddings
+                    )
+                    results, top_k = select_vector_results(
+                        candidates,
+                        limit,
+                        threshold,
+                        top_k,
+                        filtered=filters is not None and not filters.is_empty(),
+                        previous_count=previous_count,
+                        searchable=self.planner.searchable_count(),
+                    )
+                    previous_count = len(candidates)
+                latency_ms = (time.time() - start_time) * 1000
+                self.logger.info(
+                    f"Vector search query completed - Latency: {latency_ms:.2f}ms - Rounds: {rounds} - Query: '{query[:50]}...'"
+                )
+
+            self.result_cache.put(cache_key, results, cache_epoch)
+            return results
+
+        except Exception as e:
+            self.logger.error(f"Vector search failed for query '{query}': {e}")
+            raise
+
+    async def _plan_search(self, filters: Optional[SearchFilters]) -> SearchPlan:
+        """Plans a vector search like DgraphClient._plan_search."""
+        if filters is None or filters.is_empty():
+            return self.planner.plan(filters)
+
+        facets, count_searchable = self.planner.missing_facets(filters)
+        if facets or count_searchable:
+            try:
+                response = await self.query(
+                    *facet_counts_query(facets, count_searchable)
+                )
+                self.planner.record_counts(*parse_facet_counts(response, facets))
+            except Exception as e:
+                # Without counts the planner falls back to the ANN search
+                self.logger.warning(f"Failed to count filter facets: {e}")
+        return self.planner.plan(filters)
+
+    async def _prefiltered_search(
+        self,
+        query_embedding: list[float],
+        limit: int,
+        projection: str,
+        include_embeddings: Optional[bool],
+        threshold: Optional[float],
+        filters: SearchFilters,
+        root: str,
+    ) -> Optional[list[dict]]:
+        """
+        Scores every contract matching the filters exactly, like
+        DgraphClient._prefiltered_search
+
+        Returns:
+            The results, or None when the ANN search should be used instead
+        """
+        start_time = time.time()
+        max_candidates = self.planner.max_root_candidates
+        response = await self.query(
+            *prefiltered_search_query(filters, root, max_candidates)
+        )
+        candidates = response.get("candidates", [])
+        if len(candidates) >= max_candidates:
+            self.logger.warning(
+                f"Prefiltered search hit the {max_candidates} candidate cap, falling back to ANN search"
+            )
+            return None
+
+        # Scoring a thousand candidates is CPU work, kept off the event loop
+        await asyncio.to_thread(
+            score_results, candidates, query_embedding, "id_only", include_embeddings
+        )
+        selected, _ = select_vector_results(
+            candidates, limit, threshold, max_candidates, searchable=len(candidates)
+        )
+        results = hydrate_results(
+            selected,
+            await self.get_contracts_by_uids(
+                [candidate["uid"] for candidate in selected], projection
+            ),
+        )
+
+        latency_ms = (time.time() - start_time) * 1000
+        self.logger.info(
+            f"Prefiltered search scored {len(candidates)} candidates - Latency: {latency_ms:.2f}ms"
+        )
+        return results
+
+    async def _indexed_vector_search(
+        self,
+        query_embedding: list[float],
+        limit: int,
+        projection: str,
+        include_embeddings: Optional[bool],
+        threshold: Optional[float],
+    ) -> Optional[list[dict]]:
+        """
+        Finds the nearest contracts in the in-memory vector index and fetches
+        only those from Dgraph
+
+        Returns:
+            The results, or None when the index cannot serve the search
+        """
+        if self.vector_index is None or not self.vector_index.ready:
+            return None
+        if include_embeddings and not includes_field(projection, EMBEDDINGS_FIELD):
+            # The index does not keep the original vectors to return
+            return None
+
+        start_time = time.time()
+        await self._refresh_vector_index()
+        if self.vector_index.backend == "hnsw":
+            ranked = self.vector_index.search(query_embedding, limit)
+        else:
+            # An exact scan of a large corpus is kept off the event loop
+            ranked = await asyncio.to_thread(
+                self.vector_index.search, query_embedding, limit
+            )
+        search_ms = (time.time() - start_time) * 1000
+
+        selected = [
+            {"uid": uid, "cosine_similarity": score}
+            for uid, score in ranked
+            if threshold is None or score >= threshold
+        ]
+        results = hydrate_results(
+            selected,
+            await self.get_contracts_by_uids(
+                [candidate["uid"] for candidate in selected], projection
+            ),
+        )
+        if include_embeddings is False:
+            for result in results:
+                result.pop(EMBEDDINGS_FIELD, None)
+
+        latency_ms = (time.time() - start_time) * 1000
+        self.logger.info(
+            f"Vector search served from the {self.vector_index.backend} index - kNN: {search_ms:.2f}ms - Latency: {latency_ms:.2f}ms"
+        )
+        return results
+
+    async def search_by_text(
+        self, query: str, limit: int = 5, projection: str = DEFAULT_PROJECTION
+    ) -> list[dict]:
+        """
+        Performs text search on contracts across the enriched metadata fields
+
+        Args:
+            query: Text string to search for in contract fields
+            limit: Maximum number of results to return
+            projection: Name of the field-projection profile to return
+
+        Returns:
+            List of contracts that match the text query
+        """
+        try:
+            cache_key = self.result_cache.make_key(
+                "search_by_text", query, limit=limit, projection=projection
+            )
+            cached = self.result_cache.get(cache_key)
+            if cached is not None:
+                self.logger.info(f"Text search served from cache: '{query[:50]}...'")
+                return cached
+            cache_epoch = self.result_cache.epoch()
+
+            start_time = time.time()
+            if self.text_index.ready:
+                await self._refresh_text_index()
+                # Scoring the posting lists is CPU work, kept off the event loop
+                ranked = await asyncio.to_thread(self.text_index.search, query, limit)
+                contracts = await self.get_contracts_by_uids(
+                    [uid for uid, _ in ranked], projection
+                )
+                results = [
+                    {**contracts[uid], "bm25_score": score}
+                    for uid, score in ranked
+                    if uid in contracts
+                ]
+                source = "BM25 index"
+            else:
+                response = await self.query(
+                    *text_search_query(query, limit, projection)
+                )
+                results = response.get("text_search", [])
+                source = "Dgraph"
+            latency_ms = (time.time() - start_time) * 1000
+            self.logger.info(
+                f"Text search completed from {source} - Latency: {latency_ms:.2f}ms - Query: '{query[:50]}...'"
+            )
+            self.result_cache.put(cache_key, results, cache_epoch)
+            return results
+
+        except Exception as e:
+            self.logger.error(f"Text search failed for query '{query}': {e}")
+            raise
+
+    def start_text_index(self) -> None:
+        """
+        Builds the BM25 index in the background; text searches use Dgraph
+        until it is ready. Must be called from the running event loop.
+        """
+        if self._text_index_task is None or self._text_index_task.done():
+            self._text_index_task = asyncio.create_task(self.build_text_index())
+
+    async def build_text_index(self, page_size: int = 500) -> int:
+        """
+        Builds a new BM25 index from a streaming scan of the enriched
+        contracts and swaps it in
+
+        Args:
+            page_size: Number of contracts per page of the scan
+
+        Returns:
+            The number of indexed contracts
+        """
+        start_time = time.time()
+        self._text_index_stale = False
+        self._text_index_replay = set()
+        index = BM25Index(
+            self.text_index.field_boosts, k1=self.text_index.k1, b=self.text_index.b
+        )
+        after = None
+        try:
+            while True:
+                response = await self.query(
+                    *enriched_contracts_page_query(page_size, after, "text_index")
+                )
+                page = response.get("contracts", [])
+                index.upsert_many(page)
+                if len(page) < page_size:
+                    break
+                after = page[-1]["uid"]
+        except Exception as e:
+            self.logger.error(f"Failed to build the text index: {e}")
+            raise
+        finally:
+            replay, self._text_index_replay = self._text_index_replay, None
+
+        index.ready = True
+        index.built_at = time.time()
+        self.text_index = index
+        self._text_index_dirty.update(replay)
+        self.logger.info(
+            f"Text index built: {len(index)} contracts in {time.time() - start_time:.2f}s"
+        )
+        return len(index)
+
+    def start_vector_index(self) -> None:
+        """
+        Loads the embedding snapshot if there is one, otherwise builds the
+        vector index in the background; vector searches use Dgraph until it
+        is ready. Must be called from the running event loop.
+        """
+        if self.vector_index is None and self.load_vector_snapshot():
+            if not self._vector_index_stale:
+                return
+        if self._vector_index_task is None or self._vector_index_task.done():
+            self._vector_index_task = asyncio.create_task(self.build_vector_index())
+
+    def load_vector_snapshot(self) -> bool:
+        """
+        Memory-maps the embedding snapshot as the vector index and marks the
+        contracts written since it was taken for re-reading
+
+        Returns:
+            Whether a snapshot was loaded
+        """
+        if self.vector_snapshot_dir is None:
+            return False
+        loaded = load_snapshot(self.vector_snapshot_dir)
+        if loaded is None:
+            return False
+
+        index, manifest = loaded
+        changed = changed_since(
+            manifest["invalidation_log_offset"], self.result_cache.log_path
+        )
+        if changed is None:
+            # Serve the snapshot while a fresh index is built
+            self._vector_index_stale = True
+        else:
+            self._vector_index_dirty.update(changed)
+        self.vector_index = index
+        self.logger.info(
+            f"Vector index loaded from snapshot: {len(index)} contracts, {time.time() - manifest['created_at']:.0f}s old, {len(changed) if changed is not None else 'unknown'} changed since"
+        )
+        return True
+
+    async def iter_searchable_embeddings(
+        self, page_size: int = 1000
+    ) -> AsyncIterator[tuple[list[str], np.ndarray]]:
+        """
+        Streams the embeddings a vector search can return, in UID order
+
+        Args:
+            page_size: Number of contracts per page of the scan
+
+        Yields:
+            The UIDs and embeddings of every page, as returned by
+            embedding_rows
+        """
+        dimension = None
+        after = None
+        while True:
+            response = await self.query(
+                *searchable_embeddings_page_query(page_size, after)
+            )
+            page = response.get("contracts", [])
+            uids, vectors = embedding_rows(page, dimension)
+            if uids:
+                dimension = vectors.shape[1]
+                yield uids, vectors
+            if len(page) < page_size:
+                break
+            after = page[-1]["uid"]
+
+    async def build_vector_index(self, page_size: int = 1000) -> int:
+        """
+        Builds a new vector index from a streaming scan of the searchable
+        embeddings and swaps it in
+
+        Args:
+            page_size: Number of contracts per page of the scan
+
+        Returns:
+            The number of indexed contracts
+        """
+        start_time = time.time()
+        self._vector_index_stale = False
+        self._vector_index_replay = set()
+        index = None
+        try:
+            async for uids, vectors in self.iter_searchable_embeddings(page_size):
+                if index is None:
+                    index = create_vector_index(
+                        vectors.shape[1], self.vector_index_backend
+                    )
+                await asyncio.to_thread(index.upsert_many, uids, vectors)
+        except Exception as e:
+            self.logger.error(f"Failed to build the vector index: {e}")
+            raise
+        finally:
+            replay, self._vector_index_replay = self._vector_index_replay, None
+
+        if index is None:
+            # The dimension is only known from the stored embeddings
+            self.logger.warning("No searchable embeddings, vector index not built")
+            return 0
+
+        index.ready = True
+        index.built_at = time.time()
+        self.vector_index = index
+        self._vector_index_dirty.update(replay)
+        self.logger.info(
+            f"Vector index built: {len(index)} contracts ({index.backend}) in {time.time() - start_time:.2f}s"
+        )
+        return len(index)
+
+    async def _refresh_vector_index(self) -> None:
+        """
+        Re-reads the embeddings of the contracts changed since the last
+        search, and rebuilds the index in the background after writes to
+        unknown contracts
+        """
+        if self._vector_index_stale:
+            self.start_vector_index()
+        if not self._vector_index_dirty:
+            return
+
+        uids = list(self._vector_index_dirty)
+        self._vector_index_dirty.clear()
+        if self._vector_index_replay is not None:
+            self._vector_index_replay.update(uids)
+        contracts = await self.get_contracts_by_uids(uids, "vector_index")
+        searchable = [
+            contract
+            for contract in contracts.values()
+            if contract.get("ContractDeployment.description")
+        ]
+        indexed, vectors = embedding_rows(searchable, self.vector_index.dimension)
+        if indexed:
+            self.vector_index.upsert_many(indexed, vectors)
+        for uid in set(uids) - set(indexed):
+            self.vector_index.remove(uid)
+        self.logger.info(f"Re-read the embeddings of {len(uids)} changed contracts")
+
+    def _on_contracts_changed(self, uids: Optional[list[str]]) -> None:
+        """Result cache listener: marks changed contracts for re-indexing."""
+        if uids is None:
+            self._text_index_stale = True
+            self._vector_index_stale = True
+        else:
+            self._text_index_dirty.update(uids)
+            self._vector_index_dirty.update(uids)
+
+    async def _refresh_text_index(self) -> None:
+        """
+        Re-indexes the contracts changed since the last search, and rebuilds
+        the index in the background after writes to unknown contracts
+        """
+        if self._text_index_stale:
+            self.start_text_index()
+        if not self._text_index_dirty:
+            return
+
+        uids = list(self._text_index_dirty)
+        self._text_index_dirty.clear()
+        if self._text_index_replay is not None:
+            self._text_index_replay.update(uids)
+        contracts = await self.get_contracts_by_uids(uids, "text_index")
+        for uid in uids:
+            contract = contracts.get(uid)
+            if (
+                contract
+                and contract.get("ContractDeployment.verified_source")
+                and contract.get("ContractDeployment.description")
+            ):
+                self.text_index.upsert(contract)
+            else:
+                self.text_index.remove(uid)
+        self.logger.info(f"Re-indexed {len(uids)} changed contracts")
+
+    async def search_by_text_source_code(
+        self, query: str, limit: int = 5, projection: str = DEFAULT_PROJECTION
+    ) -> list[dict]:
+        """
+        Performs text search on contracts over the verified source code
+
+        Args:
+            query: Text string to search for in the source code
+            limit: Maximum number of results to return
+            projection: Name of the field-projection profile to return
+
+        Returns:
+            List of contracts that match the text query
+        """
+        try:
+            cache_key = self.result_cache.make_key(
+                "search_by_text_source_code", query, limit=limit, projection=projection
+            )
+            cached = self.result_cache.get(cache_key)
+            if cached is not None:
+                self.logger.info(
+                    f"Text source code search served from cache: '{query[:50]}...'"
+                )
+                return cached
+            cache_epoch = self.result_cache.epoch()
+
+            start_time = time.time()
+            response = await self.query(
+                *source_code_search_query(query, limit, projection)
+            )
+            latency_ms = (time.time() - start_time) * 1000
+            self.logger.info(
+                f"Text source code search query completed - Latency: {latency_ms:.2f}ms - Query: '{query[:50]}...'"
+            )
+            results = response.get("text_search", [])
+            self.result_cache.put(cache_key, results, cache_epoch)
+            return results
+
+        except Exception as e:
+            self.logger.error(
+                f"Text source code search failed for query '{query}': {e}"
+            )
+            raise
+
+    async def hybrid_search(
+        self,
+        query: str,
+        limit: int = 5,
+        projection: str = DEFAULT_PROJECTION,
+        weights: Optional[dict[str, float]] = None,
+        rrf_k: int = DEFAULT_RRF_K,
+        candidates: Optional[int] = None,
+    ) -> list[dict]:
+        """
+        Runs vector and text search concurrently and fuses their rankings
+
+        Args:
+            query: Natural language search query
+            limit: Maximum number of results to return
+            projection: Name of the field-projection profile to return
+            weights: Weights of the "vector" and "text" rankings, 1.0 by default
+            rrf_k: Reciprocal rank fusion damping constant
+            candidates: Results fetched from each retriever; defaults to twice
+                the limit so that fusion has more than the top results to merge
+
+        Returns:
+            The fused results, deduplicated by uid, each with a fused_score,
+            the per-retriever ranks and the cosine similarity when the vector
+            search found it
+        """
+        candidates = max(candidates or 2 * limit, limit)
+        start_time = time.time()
+        vector_results, text_results = await asyncio.gather(
+            self.vector_search(query, candidates, projection=projection),
+            self.search_by_text(query, candidates, projection=projection),
+            return_exceptions=True,
+        )
+
+        result_lists = {}
+        for name, results in (("vector", vector_results), ("text", text_results)):
+            if isinstance(results, Exception):
+                self.logger.error(
+                    f"Hybrid search: {name} search failed for query '{query}': {results}"
+                )
+                continue
+            result_lists[name] = results
+        if not result_lists:
+            raise vector_results
+
+        fused = reciprocal_rank_fusion(result_lists, k=rrf_k, weights=weights)[:limit]
+        latency_ms = (time.time() - start_time) * 1000
+        self.logger.info(
+            f"Hybrid search completed - Latency: {latency_ms:.2f}ms - {len(fused)} results from {', '.join(f'{name}: {len(results)}' for name, results in result_lists.items())} - Query: '{query[:50]}...'"
+        )
+        return fused
+
+    async def close(self) -> None:
+        """
+        Closes the connection pool
+        """
+        for task in (self._text_index_task, self._vector_index_task):
+            if task is not None:
+                task.cancel()
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
+        self.logger.info("Client closed")
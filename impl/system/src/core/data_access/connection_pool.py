@@ -0,0 +1,438 @@
+"""
+Connection pool over one or more Dgraph alpha endpoints.
+
+The pool keeps several client stubs per alpha, routes every request to one of
+them (round-robin or least-outstanding-requests), and takes an alpha out of
+rotation after repeated connection failures. Ejected alphas are re-admitted
+once their ejection period has passed or a periodic health check succeeds.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Iterator, Optional
+
+import grpc
+import pydgraph
+import yaml
+
+from src.utils.logger import logger
+
+ROUTING_STRATEGIES = ("round_robin", "least_outstanding")
+
+# gRPC status codes that mean the alpha itself is unreachable or overloaded,
+# as opposed to a bad query or a transaction conflict
+CONNECTION_ERROR_CODES = (
+    grpc.StatusCode.UNAVAILABLE,
+    grpc.StatusCode.DEADLINE_EXCEEDED,
+)
+
+
+@dataclass(eq=False)
+class PooledStub:
+    """A client stub and the number of requests currently running on it."""
+
+    endpoint: "AlphaEndpoint"
+    stub: Any
+    outstanding: int = 0
+    # Replaced after a failure; closed once its last request finished
+    retired: bool = False
+
+
+@dataclass
+class AlphaEndpoint:
+    """Health state of a single alpha."""
+
+    address: str
+    stubs: list[PooledStub] = field(default_factory=list)
+    consecutive_failures: int = 0
+    ejected_until: float = 0.0
+    requests: int = 0
+    failures: int = 0
+
+    def is_available(self, now: float) -> bool:
+        return self.ejected_until <= now
+
+
+def load_dgraph_config(config_path: str = "config/dgraph.yaml") -> dict[str, Any]:
+    """
+    Loads the Dgraph connection settings
+
+    Args:
+        config_path: Path of the YAML config file
+
+    Returns:
+        The parsed settings, or an empty dict when the file does not exist
+    """
+    config_file = Path(config_path)
+    if not config_file.exists():
+        logger.warning(
+            f"Dgraph config not found at {config_file.absolute()}, using defaults"
+        )
+        return {}
+
+    with open(config_file, "r") as file:
+        return yaml.safe_load(file) or {}
+
+
+def endpoints_from_config(
+    config: dict[str, Any], host: Optional[str] = None, port: Optional[int] = None
+) -> list[str]:
+    """
+    Resolves the alpha addresses of a Dgraph config
+
+    Args:
+        config: Settings as returned by load_dgraph_config
+        host: Single alpha host, overriding the alphas of the config
+        port: Port of that alpha
+
+    Returns:
+        The `alphas` list when set, otherwise the single host:port endpoint
+    """
+    if host is not None or port is not None:
+        return [
+            f"{host or config.get('host', 'localhost')}:{port or config.get('port', 9081)}"
+        ]
+    alphas = config.get("alphas")
+    if alphas:
+        return [str(alpha) for alpha in alphas]
+    return [f"{config.get('host', 'localhost')}:{config.get('port', 9081)}"]
+
+
+class ConnectionPool:
+    """
+    Pool of client stubs spread across the alphas of a Dgraph cluster
+    """
+
+    def __init__(
+        self,
+        endpoints: list[str],
+        stubs_per_endpoint: int = 2,
+        routing: str = "round_robin",
+        max_failures: int = 3,
+        ejection_seconds: float = 30.0,
+        secure: bool = False,
+        stub_factory: Optional[Callable[[str], Any]] = None,
+        health_check_seconds: Optional[float] = None,
+    ) -> None:
+        """
+        Args:
+            endpoints: Alpha addresses, as host:port
+            stubs_per_endpoint: Number of stubs (gRPC channels) opened per alpha
+            routing: "round_robin" or "least_outstanding"
+            max_failures: Consecutive connection failures before an alpha is ejected
+            ejection_seconds: How long an ejected alpha stays out of rotation
+            secure: Whether to open TLS channels
+            stub_factory: Builds a stub for an address; defaults to
+                pydgraph.DgraphClientStub. Tests pass in-process fakes here.
+            health_check_seconds: Interval of the background health checks
+                that re-admit recovered alphas early, or None for no checks
+        """
+        if not endpoints:
+            raise ValueError("At least one Dgraph alpha endpoint is required")
+        if routing not in ROUTING_STRATEGIES:
+            raise ValueError(
+                f"Unknown routing strategy '{routing}'. Expected one of: {', '.join(ROUTING_STRATEGIES)}"
+            )
+        if stubs_per_endpoint < 1:
+            raise ValueError("stubs_per_endpoint must be at least 1")
+
+        self.logger = logger.getChild("ConnectionPool")
+        self.routing = routing
+        self.max_failures = max_failures
+        self.ejection_seconds = ejection_seconds
+        self.secure = secure
+        self.stub_factory = stub_factory or self._default_stub_factory
+
+        self._lock = threading.Lock()
+        self._next = 0
+        self._health_checker: Optional[Any] = None
+        self._stop_health_checks = threading.Event()
+        self.endpoints = [AlphaEndpoint(address=address) for address in endpoints]
+        for endpoint in self.endpoints:
+            for _ in range(stubs_per_endpoint):
+                endpoint.stubs.append(
+                    PooledStub(
+                        endpoint=endpoint, stub=self.stub_factory(endpoint.address)
+                    )
+                )
+
+        self.logger.info(
+            f"Connection pool ready: {len(self.endpoints)} alpha(s) x {stubs_per_endpoint} stub(s), {routing} routing"
+        )
+        if health_check_seconds:
+            self.start_health_checks(health_check_seconds)
+
+    @classmethod
+    def from_config(
+        cls,
+        config: dict[str, Any],
+        endpoints: Optional[list[str]] = None,
+        stub_factory: Optional[Callable[[str], Any]] = None,
+    ) -> "ConnectionPool":
+        """
+        Builds a pool from Dgraph settings
+
+        Args:
+            config: Settings as returned by load_dgraph_config
+            endpoints: Overrides the alphas of the config
+            stub_factory: See ConnectionPool
+
+        Returns:
+            The connection pool
+        """
+        pool_config = config.get("pool") or {}
+        return cls(
+            endpoints=endpoints or endpoints_from_config(config),
+            stubs_per_endpoint=pool_config.get("stubs_per_alpha", 2),
+            routing=pool_config.get("routing", "round_robin"),
+            max_failures=pool_config.get("max_failures", 3),
+            ejection_seconds=pool_config.get("ejection_seconds", 30.0),
+            secure=bool(config.get("secure", False)),
+            stub_factory=stub_factory,
+            health_check_seconds=pool_config.get("health_check_seconds", 10.0),
+        )
+
+    def _default_stub_factory(self, address: str) -> pydgraph.DgraphClientStub:
+        credentials = grpc.ssl_channel_credentials() if self.secure else None
+        return pydgraph.DgraphClientStub(address, credentials=credentials)
+
+    def _interleaved_stubs(self) -> list[PooledStub]:
+        """Lists the stubs alternating between alphas, so rotation spreads load."""
+        return [
+            endpoint.stubs[index]
+            for index in range(max(len(endpoint.stubs) for endpoint in self.endpoints))
+            for endpoint in self.endpoints
+            if index < len(endpoint.stubs)
+        ]
+
+    def _select(self) -> PooledStub:
+        """Picks the stub for the next request according to the routing strategy."""
+        now = time.monotonic()
+        with self._lock:
+            candidates = [
+                pooled
+                for pooled in self._interleaved_stubs()
+                if pooled.endpoint.is_available(now)
+            ]
+            if not candidates:
+                # Every alpha is ejected: keep trying all of them rather than
+                # failing requests outright
+                self.logger.warning("All Dgraph alphas are ejected, routing to all")
+                candidates = self._interleaved_stubs()
+
+            start = self._next % len(candidates)
+            self._next += 1
+            if self.routing == "least_outstanding":
+                # Rotate before taking the minimum so ties are spread evenly
+                rotated = candidates[start:] + candidates[:start]
+                pooled = min(rotated, key=lambda candidate: candidate.outstanding)
+            else:
+                pooled = candidates[start]
+
+            pooled.outstanding += 1
+            pooled.endpoint.requests += 1
+            return pooled
+
+    @staticmethod
+    def is_connection_error(error: BaseException) -> bool:
+        """Returns whether an error means the alpha could not be reached."""
+        if isinstance(error, ConnectionError):
+            return True
+        if isinstance(error, grpc.RpcError) and hasattr(error, "code"):
+            return error.code() in CONNECTION_ERROR_CODES
+        return False
+
+    def _record_success(self, endpoint: AlphaEndpoint) -> None:
+        with self._lock:
+            if endpoint.consecutive_failures or endpoint.ejected_until:
+                self.logger.info(f"Dgraph alpha {endpoint.address} re-admitted")
+            endpoint.consecutive_failures = 0
+            endpoint.ejected_until = 0.0
+
+    def _record_failure(self, pooled: PooledStub, error: BaseException) -> None:
+        endpoint = pooled.endpoint
+        with self._lock:
+            endpoint.failures += 1
+            endpoint.consecutive_failures += 1
+            if endpoint.consecutive_failures >= self.max_failures:
+                endpoint.ejected_until = time.monotonic() + self.ejection_seconds
+                self.logger.warning(
+                    f"Ejecting Dgraph alpha {endpoint.address} for {self.ejection_seconds}s after {endpoint.consecutive_failures} consecutive failures: {error}"
+                )
+        self._reconnect(pooled)
+
+    def _reconnect(self, pooled: PooledStub) -> None:
+        """
+        Replaces the stub of a failed request with a fresh channel
+
+        Other requests may still be running on the old stub, so it is only
+        closed once the last of them has finished.
+        """
+        endpoint = pooled.endpoint
+        with self._lock:
+            if pooled.retired:
+                # Another failed request already replaced it
+                return
+            try:
+                replacement = PooledStub(
+                    endpoint=endpoint, stub=self.stub_factory(endpoint.address)
+                )
+            except Exception as e:
+                self.logger.error(
+                    f"Failed to reconnect to Dgraph alpha {endpoint.address}: {e}"
+                )
+                return
+            endpoint.stubs[endpoint.stubs.index(pooled)] = replacement
+            pooled.retired = True
+            idle = pooled.outstanding == 0
+        self.logger.info(f"Reconnected stub for Dgraph alpha {endpoint.address}")
+        if idle:
+            self._close_stub(pooled)
+
+    def _close_stub(self, pooled: PooledStub) -> None:
+        try:
+            pooled.stub.close()
+        except Exception as e:
+            self.logger.debug(
+                f"Failed to close stub for {pooled.endpoint.address}: {e}"
+            )
+
+    def _release(self, pooled: PooledStub) -> None:
+        """Ends a request on a stub, closing the stub if it was replaced meanwhile."""
+        with self._lock:
+            pooled.outstanding -= 1
+            idle = pooled.retired and pooled.outstanding == 0
+        if idle:
+            self._close_stub(pooled)
+
+    def _record_outcome(
+        self, pooled: PooledStub, error: Optional[BaseException] = None
+    ) -> None:
+        if error is not None and self.is_connection_error(error):
+            self._record_failure(pooled, error)
+        else:
+            # The alpha answered, even if the request itself was rejected
+            self._record_success(pooled.endpoint)
+
+    def _borrow_probe_stub(self, endpoint: AlphaEndpoint) -> PooledStub:
+        """Borrows the first stub of an alpha, ejected or not, for a health check."""
+        with self._lock:
+            pooled = endpoint.stubs[0]
+            pooled.outstanding += 1
+            return pooled
+
+    @contextmanager
+    def acquire(self) -> Iterator[PooledStub]:
+        """
+        Borrows a stub for the duration of a request
+
+        Connection failures raised inside the block count against the stub's
+        alpha and reconnect the stub; the error is re-raised either way.
+
+        Returns:
+            The pooled stub
+        """
+        pooled = self._select()
+        try:
+            yield pooled
+        except Exception as e:
+            self._record_outcome(pooled, e)
+            raise
+        else:
+            self._record_outcome(pooled)
+        finally:
+            self._release(pooled)
+
+    @contextmanager
+    def client(self) -> Iterator[pydgraph.DgraphClient]:
+        """
+        Borrows a Dgraph client bound to a single pooled stub
+
+        Returns:
+            A pydgraph client whose transactions all go to the same alpha
+        """
+        with self.acquire() as pooled:
+            yield pydgraph.DgraphClient(pooled.stub)
+
+    def check_health(self, timeout: float = 2.0) -> dict[str, bool]:
+        """
+        Probes every alpha with a version check, ejecting or re-admitting it
+
+        Args:
+            timeout: Deadline of each probe, in seconds
+
+        Returns:
+            Whether each alpha answered, keyed by address
+        """
+        health = {}
+        for endpoint in self.endpoints:
+            pooled = self._borrow_probe_stub(endpoint)
+            try:
+                pooled.stub.check_version(pydgraph.Check(), timeout=timeout)
+                self._record_success(endpoint)
+                health[endpoint.address] = True
+            except Exception as e:
+                self.logger.warning(
+                    f"Health check failed for Dgraph alpha {endpoint.address}: {e}"
+                )
+                self._record_failure(pooled, e)
+                health[endpoint.address] = False
+            finally:
+                self._release(pooled)
+        return health
+
+    def start_health_checks(self, interval: float) -> None:
+        """
+        Runs check_health every interval seconds in a daemon thread, so that
+        ejected alphas are probed even when no request is routed to them
+
+        Args:
+            interval: Seconds between two rounds of probes
+        """
+        if self._health_checker is not None:
+            return
+        self._health_checker = threading.Thread(
+            target=self._health_check_loop,
+            args=(interval,),
+            name="dgraph-health-check",
+            daemon=True,
+        )
+        self._health_checker.start()
+
+    def _health_check_loop(self, interval: float) -> None:
+        while not self._stop_health_checks.wait(interval):
+            try:
+                self.check_health()
+            except Exception as e:
+                self.logger.error(f"Dgraph health check failed: {e}")
+
+    def stats(self) -> list[dict[str, Any]]:
+        """
+        Returns per-alpha routing and health counters
+        """
+        now = time.monotonic()
+        with self._lock:
+            return [
+                {
+                    "address": endpoint.address,
+                    "available": endpoint.is_available(now),
+                    "requests": endpoint.requests,
+                    "failures": endpoint.failures,
+                    "consecutive_failures": endpoint.consecutive_failures,
+                    "outstanding": sum(pooled.outstanding for pooled in endpoint.stubs),
+                }
+                for endpoint in self.endpoints
+            ]
+
+    def close(self) -> None:
+        """
+        Stops the health checks and closes every stub of the pool
+        """
+        self._stop_health_checks.set()
+        for endpoint in self.endpoints:
+            for pooled in endpoint.stubs:
+                self._close_stub(pooled)
+        self.logger.info("Connection pool closed")
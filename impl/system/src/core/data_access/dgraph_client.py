@@ -4,27 +4,105 @@ import hashlib
 from src.utils.logger import logger
 from src.utils.file import write_file
 from contextlib import contextmanager
-from langchain_huggingface import HuggingFaceEmbeddings
-import numpy as np
+from dataclasses import dataclass, field
+from typing import Any, Iterable, Iterator, Optional
+from src.core.data_access.connection_pool import (
+    ConnectionPool,
+    endpoints_from_config,
+    load_dgraph_config,
+)
+from src.core.data_access.filters import FILTER_SCHEMA, SearchFilters
+from src.core.data_access.projections import DEFAULT_PROJECTION
+from src.core.data_processing.embeddings import CachedEmbeddings, get_query_embedder
+from src.core.data_processing.source_dedup import SOURCE_HASH_SCHEMA
+from src.core.data_retrieval.planner import PREFILTER, QueryPlanner, SearchPlan
+from src.core.data_retrieval.result_cache import (
+    SearchResultCache,
+    invalidation_scope,
+    written_uids,
+)
+from src.core.data_access.queries import (
+    contract_by_id_query,
+    contract_by_uid_query,
+    contracts_by_ids_query,
+    contracts_by_uids_query,
+    contracts_count_query,
+    contracts_page_query,
+    CORPUS_STATS_QUERY,
+    enriched_by_source_hash_query,
+    parse_corpus_stats,
+    facet_counts_query,
+    hydrate_results,
+    initial_top_k,
+    parse_facet_counts,
+    prefiltered_search_query,
+    score_results,
+    select_vector_results,
+    source_code_search_query,
+    text_search_query,
+    vector_search_query,
+)
 import time
 
 
+@dataclass
+class BulkMutationResult:
+    """Per-record outcome of a bulk mutation."""
+
+    succeeded: list[str] = field(default_factory=list)
+    failed: dict[str, str] = field(default_factory=dict)
+
+    @property
+    def success_count(self) -> int:
+        return len(self.succeeded)
+
+    @property
+    def failure_count(self) -> int:
+        return len(self.failed)
+
+
 class DgraphClient:
     """
     Interface for interacting with Dgraph database
     """
 
-    def __init__(self, host: str = "localhost", port: int = 9081) -> None:
+    def __init__(
+        self,
+        host: Optional[str] = None,
+        port: Optional[int] = None,
+        config_path: str = "config/dgraph.yaml",
+        pool: Optional[ConnectionPool] = None,
+        result_cache: Optional[SearchResultCache] = None,
+        embedding_model: Optional[Any] = None,
+        planner: Optional[QueryPlanner] = None,
+    ) -> None:
+        """
+        Args:
+          host: Single alpha host, overriding the alphas of the config
+          port: Port of that alpha
+          config_path: Path of the Dgraph connection settings
+          pool: Connection pool to use instead of building one from the config
+          result_cache: Search result cache; a private one is created by default
+          embedding_model: Model used to embed search queries; defaults to the
+            shared, lazily loaded model of the registry
+          planner: Planner of filtered vector searches
+        """
         self.logger = logger.getChild("DgraphClient")
-        self.client_stub = pydgraph.DgraphClientStub(f"{host}:{port}")
-        self.client = pydgraph.DgraphClient(self.client_stub)
+        if pool is None:
+            config = load_dgraph_config(config_path)
+            pool = ConnectionPool.from_config(
+                config, endpoints=endpoints_from_config(config, host, port)
+            )
+        self.pool = pool
+        self.result_cache = result_cache or SearchResultCache()
+        self.planner = planner or QueryPlanner()
 
         # Initialize embedding model for vector search
-        self.embedding_model = HuggingFaceEmbeddings(
-            model_name="BAAI/bge-small-en-v1.5",
-            model_kwargs={"device": "cpu"},
-            encode_kwargs={"normalize_embeddings": True},
-        )
+        if embedding_model is None:
+            embedding_model = get_query_embedder()
+        elif not isinstance(embedding_model, CachedEmbeddings):
+            embedding_model = CachedEmbeddings(embedding_model)
+        self.embedding_model = embedding_model
 
     def generate_contract_id(self, contract_data: dict) -> str:
         """
@@ -104,15 +182,16 @@ class DgraphClient:
         Returns:
           A Dgraph transaction object
         """
-        txn = self.client.txn(read_only=read_only)
-        try:
-            yield txn
-            if not read_only:
-                txn.commit()
-        except Exception as e:
-            raise
-        finally:
-            txn.discard()
+        with self.pool.client() as client:
+            txn = client.txn(read_only=read_only)
+            try:
+                yield txn
+                if not read_only:
+                    txn.commit()
+            except Exception as e:
+                raise
+            finally:
+                txn.discard()
 
     def alter_schema(self, schema: str) -> None:
         """
@@ -123,100 +202,117 @@ class DgraphClient:
         """
         try:
             op = pydgraph.Operation(schema=schema)
-            self.client.alter(op)
+            with self.pool.client() as client:
+                client.alter(op)
             self.logger.info("Schema altered successfully")
         except Exception as e:
             self.logger.exception(f"Failed to alter schema: {str(e)}")
             raise
 
+    def ensure_search_indexes(self) -> None:
+        """
+        Declares the indexes the structured search filters rely on
+        """
+        self.alter_schema(FILTER_SCHEMA)
+
+    def ensure_source_hash_index(self) -> None:
+        """
+        Declares the index the enrichment step looks up source hashes with
+        """
+        self.alter_schema(SOURCE_HASH_SCHEMA)
+
     def get_contracts(
-        self, batch_size: int = 5, offset: int = 0, enriched: bool = False
+        self,
+        batch_size: int = 5,
+        offset: int = 0,
+        enriched: Optional[bool] = False,
+        projection: str = DEFAULT_PROJECTION,
+        after: Optional[str] = None,
     ) -> dict[str, str]:
         """
         Retrieves contracts
 
         Args:
           batch_size: Maximum number of results to return
+          offset: Number of results to skip (prefer after for full scans)
+          enriched: If True, only enriched contracts. If False, only non-enriched. If None, all.
+          projection: Name of the field-projection profile to select
+          after: Only return contracts with a UID greater than this one
 
         Returns:
           The Dgraph query response
         """
-        query = f"""
-    {{
-      allContractDeployments(func: type(ContractDeployment), first:{batch_size}, offset: {offset}) 
-      @filter(eq(ContractDeployment.verified_source, true) AND 
-      {"" if enriched else "NOT"} has(ContractDeployment.description)) 
-      {{
-        uid
-        ContractDeployment.id
-        ContractDeployment.contract
-        ContractDeployment.block
-        ContractDeployment.storage_protocol
-        ContractDeployment.storage_address
-        ContractDeployment.experimental
-        ContractDeployment.solc_version
-        ContractDeployment.verified_source
-        ContractDeployment.verified_source_code
-        ContractDeployment.name
-        ContractDeployment.description
-        ContractDeployment.standards
-        ContractDeployment.patterns
-        ContractDeployment.functionalities
-        ContractDeployment.application_domain
-        ContractDeployment.security_risks_description
-        ContractDeployment.embeddings
-      }}
-    }}
-    """
+        query, variables = contracts_page_query(
+            batch_size, enriched, projection, after, offset
+        )
         with self.dgraph_txn(read_only=True) as txn:
             try:
-                response = txn.query(query).json
+                response = txn.query(query, variables=variables).json
                 response = json.loads(response)["allContractDeployments"]
                 self.logger.info(
-                    f"Retrieved {'' if enriched else 'un'}enriched contracts ({len(response)})"
+                    f"Retrieved {'' if enriched else 'un' if enriched is False else 'all '}enriched contracts ({len(response)})"
                 )
                 return response
             except Exception as e:
                 self.logger.exception("Dgraph query failed")
                 raise
 
-    def get_contract_by_id(self, contract_id: str) -> dict:
+    def iter_contracts(
+        self,
+        enriched: Optional[bool] = None,
+        page_size: int = 100,
+        projection: str = DEFAULT_PROJECTION,
+        after: Optional[str] = None,
+    ) -> Iterator[list[dict]]:
+        """
+        Lazily streams contracts in pages using a UID cursor.
+
+        Each page is fetched with `after: <last uid>` instead of an offset, so
+        a full scan costs O(n) and is not affected by rows that are mutated
+        (for example enriched) while the scan is running.
+
+        Args:
+          enriched: If True, only enriched contracts. If False, only non-enriched. If None, all.
+          page_size: Number of contracts per page
+          projection: Name of the field-projection profile to select
+          after: Start after this UID, to resume an interrupted scan
+
+        Yields:
+          Lists of at most page_size contracts, in ascending UID order
+        """
+        while True:
+            page = self.get_contracts(
+                batch_size=page_size,
+                enriched=enriched,
+                projection=projection,
+                after=after,
+            )
+            if not page:
+                return
+
+            yield page
+
+            if len(page) < page_size:
+                return
+            after = page[-1]["uid"]
+
+    def get_contract_by_id(
+        self, contract_id: str, projection: str = DEFAULT_PROJECTION
+    ) -> dict:
         """
         Retrieves a contract by its reproducible ID.
 
         Args:
             contract_id: The reproducible ID of the contract to retrieve.
+            projection: Name of the field-projection profile to select.
 
         Returns:
             The Dgraph query response as a dict.
         """
-        query = f"""
-        {{
-          contract(func: eq(ContractDeployment.id, "{contract_id}")) {{
-            uid
-            ContractDeployment.id
-            ContractDeployment.contract
-            ContractDeployment.block
-            ContractDeployment.storage_protocol
-            ContractDeployment.storage_address
-            ContractDeployment.experimental
-            ContractDeployment.solc_version
-            ContractDeployment.verified_source
-            ContractDeployment.verified_source_code
-            ContractDeployment.name
-            ContractDeployment.description
-            ContractDeployment.standards
-            ContractDeployment.patterns
-            ContractDeployment.functionalities
-            ContractDeployment.application_domain
-            ContractDeployment.security_risks_description
-            ContractDeployment.embeddings
-          }}
-        }}
-        """
+        query, variables = contract_by_id_query(contract_id, projection)
         with self.dgraph_txn(read_only=True) as txn:
             try:
-                response = txn.query(query).json
+                response = txn.query(query, variables=variables).json
                 response = json.loads(response)["contract"]
                 if response:
                     self.logger.info(f"Retrieved contract with ID {contract_id}")
@@ -230,43 +326,23 @@ class DgraphClient:
                 )
                 raise
 
-    def get_contract_by_uid(self, uid: str) -> dict:
+    def get_contract_by_uid(
+        self, uid: str, projection: str = DEFAULT_PROJECTION
+    ) -> dict:
         """
         Retrieves a contract by its UID.
 
         Args:
           uid: The UID of the contract to retrieve.
+          projection: Name of the field-projection profile to select.
 
         Returns:
           The Dgraph query response as a dict.
         """
-        query = f"""
-    {{
-      contract(func: uid("{uid}")) {{
-      uid
-      ContractDeployment.id
-      ContractDeployment.contract
-      ContractDeployment.block
-      ContractDeployment.storage_protocol
-      ContractDeployment.storage_address
-      ContractDeployment.experimental
-      ContractDeployment.solc_version
-      ContractDeployment.verified_source
-      ContractDeployment.verified_source_code
-      ContractDeployment.name
-      ContractDeployment.description
-      ContractDeployment.standards
-      ContractDeployment.patterns
-      ContractDeployment.functionalities
-      ContractDeployment.application_domain
-      ContractDeployment.security_risks_description
-      ContractDeployment.embeddings
-      }}
-    }}
-    """
+        query, variables = contract_by_uid_query(uid, projection)
         with self.dgraph_txn(read_only=True) as txn:
             try:
-                response = txn.query(query).json
+                response = txn.query(query, variables=variables).json
                 response = json.loads(response)["contract"]
                 self.logger.info(f"Retrieved contract with UID {uid}")
                 return response
@@ -276,6 +352,122 @@ class DgraphClient:
                 )
                 raise
 
+    def get_contracts_by_ids(
+        self,
+        contract_ids: Iterable[str],
+        projection: str = DEFAULT_PROJECTION,
+        chunk_size: int = 200,
+    ) -> dict[str, dict]:
+        """
+        Retrieves many contracts by their reproducible IDs, one query per chunk
+
+        Args:
+            contract_ids: The reproducible IDs of the contracts to retrieve
+            projection: Name of the field-projection profile to select
+            chunk_size: Maximum number of IDs per query
+
+        Returns:
+            The contracts keyed by ID; IDs that were not found are absent
+        """
+        return self._get_contracts_in_chunks(
+            contract_ids,
+            contracts_by_ids_query,
+            "ContractDeployment.id",
+            projection,
+            chunk_size,
+        )
+
+    def get_contracts_by_uids(
+        self,
+        uids: Iterable[str],
+        projection: str = DEFAULT_PROJECTION,
+        chunk_size: int = 200,
+    ) -> dict[str, dict]:
+        """
+        Retrieves many contracts by their UIDs, one query per chunk
+
+        Args:
+            uids: The UIDs of the contracts to retrieve
+            projection: Name of the field-projection profile to select
+            chunk_size: Maximum number of UIDs per query
+
+        Returns:
+            The contracts keyed by UID; UIDs that were not found are absent
+        """
+        return self._get_contracts_in_chunks(
+            uids, contracts_by_uids_query, "uid", projection, chunk_size
+        )
+
+    def get_enriched_by_source_hash(
+        self,
+        hashes: Iterable[str],
+        projection: str = "source_enrichment",
+        chunk_size: int = 200,
+    ) -> dict[str, dict]:
+        """
+        Retrieves one enriched contract per source hash, one query per chunk
+
+        Args:
+            hashes: Normalized source hashes, from source_dedup.source_hash
+            projection: Name of the field-projection profile to select
+            chunk_size: Maximum number of hashes per query
+
+        Returns:
+            An enriched contract keyed by source hash; hashes whose source
+            was never enriched are absent
+        """
+        return self._get_contracts_in_chunks(
+            hashes,
+            enriched_by_source_hash_query,
+            "ContractDeployment.source_hash",
+            projection,
+            chunk_size,
+        )
+
+    def _get_contracts_in_chunks(
+        self,
+        keys: Iterable[str],
+        build_query,
+        key_field: str,
+        projection: str,
+        chunk_size: int,
+    ) -> dict[str, dict]:
+        """
+        Runs a multi-contract lookup query per chunk of keys
+
+        Args:
+            keys: The IDs or UIDs to look up
+            build_query: Builds the (query, variables) pair for a chunk
+            key_field: The field the results are keyed by
+            projection: Name of the field-projection profile to select
+            chunk_size: Maximum number of keys per query
+
+        Returns:
+            The contracts keyed by key_field
+        """
+        # Deduplicate while keeping the caller's order
+        keys = list(dict.fromkeys(key for key in keys if key))
+        contracts = {}
+        for start in range(0, len(keys), chunk_size):
+            chunk = keys[start : start + chunk_size]
+            query, variables = build_query(chunk, projection)
+            with self.dgraph_txn(read_only=True) as txn:
+                try:
+                    response = txn.query(query, variables=variables).json
+                    response = json.loads(response)["contracts"]
+                except Exception as e:
+                    self.logger.exception(
+                        f"Failed to retrieve {len(chunk)} contracts by {key_field}: {e}"
+                    )
+                    raise
+            for contract in response:
+                contracts.setdefault(contract.get(key_field), contract)
+
+        self.logger.info(
+            f"Retrieved {len(contracts)} of {len(keys)} contracts by {key_field}"
+        )
+        return contracts
+
     def mutate(self, mutation_data: dict[str, str]) -> dict:
         """
         Performs a mutation (insert/update) in the database
@@ -291,10 +483,105 @@ class DgraphClient:
                 mutation = txn.create_mutation(set_obj=mutation_data)
                 response = txn.mutate(mutation=mutation, commit_now=False)
                 self.logger.info("Mutation successful")
-                return response
             except Exception as e:
                 self.logger.exception("Mutation failed")
                 raise
+        records = mutation_data if isinstance(mutation_data, list) else [mutation_data]
+        self.invalidate_search_cache(
+            invalidation_scope(records), changed=written_uids(records)
+        )
+        return response
+
+    def mutate_many(
+        self, records: list[dict], chunk_size: int = 500
+    ) -> BulkMutationResult:
+        """
+        Performs many set mutations, packing each chunk of records into a
+        single mutation committed in one transaction.
+
+        If a chunk fails, its records are retried one by one so that a single
+        bad record only fails itself and the failure is reported per record.
+
+        Args:
+          records: Dictionaries to be converted to JSON for the mutation, usually keyed by uid
+          chunk_size: Maximum number of records per transaction
+
+        Returns:
+          The per-record outcome, keyed by uid (or "#<index>" for records without one)
+        """
+        result = BulkMutationResult()
+        keyed_records = []
+        for index, record in enumerate(records):
+            key = record.get("uid") if record else None
+            key = key or f"#{index}"
+            if not record:
+                result.failed[key] = "Empty record"
+                continue
+            keyed_records.append((key, record))
+
+        for start in range(0, len(keyed_records), chunk_size):
+            chunk = keyed_records[start : start + chunk_size]
+            try:
+                self._set_objects([record for _, record in chunk])
+                result.succeeded.extend(key for key, _ in chunk)
+                continue
+            except Exception as e:
+                if len(chunk) == 1:
+                    result.failed[chunk[0][0]] = str(e)
+                    continue
+                self.logger.warning(
+                    f"Bulk mutation of {len(chunk)} records failed, retrying one by one: {e}"
+                )
+
+            for key, record in chunk:
+                try:
+                    self._set_objects([record])
+                    result.succeeded.append(key)
+                except Exception as e:
+                    result.failed[key] = str(e)
+
+        self.logger.info(
+            f"Bulk mutation finished: {result.success_count} succeeded, {result.failure_count} failed"
+        )
+        return result
+
+    def _set_objects(self, objects: list[dict]) -> None:
+        """
+        Sets a list of objects in a single mutation and transaction
+
+        Args:
+          objects: Dictionaries to be converted to JSON for the mutation
+        """
+        with self.dgraph_txn() as txn:
+            mutation = txn.create_mutation(set_obj=objects)
+            txn.mutate(mutation=mutation, commit_now=False)
+        self.invalidate_search_cache(
+            invalidation_scope(objects), changed=written_uids(objects)
+        )
+
+    def insert_embeddings_bulk(
+        self, pairs: Iterable[tuple[str, list[float]]], chunk_size: int = 500
+    ) -> BulkMutationResult:
+        """
+        Inserts embeddings for many contracts, one transaction per chunk
+
+        Args:
+            pairs: (uid, embeddings) tuples
+            chunk_size: Maximum number of contracts per transaction
+
+        Returns:
+            The per-contract outcome, keyed by uid
+        """
+        records = [
+            {
+                "uid": uid,
+                "ContractDeployment.embeddings": json.dumps(
+                    [float(e) for e in embeddings]
+                ),
+            }
+            for uid, embeddings in pairs
+        ]
+        return self.mutate_many(records, chunk_size=chunk_size)
 
     def insert_embeddings(self, uid: str, embeddings: list[float]) -> None:
         """
@@ -322,13 +609,30 @@ class DgraphClient:
                 self.logger.info(
                     f"Successfully inserted embeddings for contract {uid}"
                 )
-                return response
+            # New embeddings can change the results of any vector search
+            self.invalidate_search_cache(changed=[uid])
+            return response
         except Exception as e:
             self.logger.exception(
                 f"Failed to insert embeddings for contract {uid}: {str(e)}"
             )
             raise
 
+    def invalidate_search_cache(
+        self,
+        uids: Optional[Iterable[str]] = None,
+        changed: Optional[Iterable[str]] = None,
+    ) -> None:
+        """
+        Invalidates cached search results after a write, in every process
+
+        Args:
+            uids: The written contracts when only results containing them can
+                change, or None to invalidate every cached result
+            changed: With uids=None, the contracts known to have changed
+        """
+        self.result_cache.invalidate(uids, changed)
+
     def get_contracts_count(self, enriched: bool = None) -> int:
         """
         Gets the total count of contracts in the database
@@ -339,27 +643,11 @@ class DgraphClient:
         Returns:
           The total number of contracts
         """
-        if enriched is None:
-            # Count all contracts
-            filter_clause = "eq(ContractDeployment.verified_source, true)"
-        elif enriched:
-            # Count only enriched contracts
-            filter_clause = "eq(ContractDeployment.verified_source, true) AND has(ContractDeployment.description)"
-        else:
-            # Count only non-enriched contracts
-            filter_clause = "eq(ContractDeployment.verified_source, true) AND NOT has(ContractDeployment.description)"
-
-        query = f"""
-        {{
-          contractCount(func: type(ContractDeployment)) @filter({filter_clause}) {{
-            count(uid)
-          }}
-        }}
-        """
+        query, variables = contracts_count_query(enriched)
 
         with self.dgraph_txn(read_only=True) as txn:
             try:
-                response = txn.query(query).json
+                response = txn.query(query, variables=variables).json
                 response = json.loads(response)
                 count = (
                     response["contractCount"][0]["count"]
@@ -374,18 +662,74 @@ class DgraphClient:
                 self.logger.exception("Failed to get contracts count")
                 raise
 
-    def vector_search(self, query: str, limit: int = 5) -> list[dict]:
+    def get_corpus_stats(self) -> dict[str, int]:
+        """
+        Counts verified contracts by processing state in a single query
+
+        Returns:
+            The total, enriched, unenriched, with_embeddings, without_ids and
+            stale (enriched but missing embeddings) counts
+        """
+        with self.dgraph_txn(read_only=True) as txn:
+            try:
+                start_time = time.time()
+                response = json.loads(txn.query(CORPUS_STATS_QUERY).json)
+                stats = parse_corpus_stats(response)
+                latency_ms = (time.time() - start_time) * 1000
+                self.logger.info(
+                    f"Corpus stats retrieved - Latency: {latency_ms:.2f}ms - {stats}"
+                )
+                return stats
+            except Exception as e:
+                self.logger.exception("Failed to get corpus stats")
+                raise
+
+    def vector_search(
+        self,
+        query: str,
+        limit: int = 5,
+        projection: str = DEFAULT_PROJECTION,
+        include_embeddings: Optional[bool] = None,
+        threshold: Optional[float] = None,
+        filters: Optional[SearchFilters] = None,
+    ) -> list[dict]:
         """
         Performs vector similarity search on contracts using natural language query
 
+        similar_to is asked for a growing top-K until `limit` candidates pass
+        the threshold and the filters, the scores drop below the threshold,
+        or MAX_VECTOR_TOP_K is reached.
+
         Args:
             query: Natural language search query
             limit: Maximum number of results to return
+            projection: Name of the field-projection profile to return
+            include_embeddings: Whether to return the embeddings; defaults to
+                whether the projection selects them
+            threshold: Minimum cosine similarity of the results, or None to
+                keep every candidate
+            filters: Structured filters, applied inside the similar_to query
 
         Returns:
-            List of similar contracts with metadata, each including cosine similarity
+            List of similar contracts with metadata, each including cosine
+            similarity, highest similarity first
         """
         try:
+            cache_key = self.result_cache.make_key(
+                "vector_search",
+                query,
+                limit=limit,
+                projection=projection,
+                include_embeddings=include_embeddings,
+                threshold=threshold,
+                filters=filters.active() if filters else None,
+            )
+            cached = self.result_cache.get(cache_key)
+            if cached is not None:
+                self.logger.info(f"Vector search served from cache: '{query[:50]}...'")
+                return cached
+            cache_epoch = self.result_cache.epoch()
+
             # Convert query to embedding vector
             embedding_start_time = time.time()
             query_embedding = self.embedding_model.embed_query(query)
@@ -395,140 +739,172 @@ class DgraphClient:
                 f"Query embedding length: {len(query_embedding)} - Processing time: {embedding_latency_ms:.2f}ms"
             )
 
-            # Format the vector for Dgraph query as a properly quoted JSON string
-            vector_str = json.dumps(query_embedding)
-
-            # Construct Dgraph vector similarity query using correct similar_to syntax
-            # Syntax: similar_to(predicate, topK, "vector") - vector must be quoted
-            dgraph_query = f"""
-            {{
-                similar_contracts(func: similar_to(ContractDeployment.embeddings, {limit}, \"{vector_str}\")) @filter(has(ContractDeployment.embeddings) AND has(ContractDeployment.description)) {{
-                    uid
-                    ContractDeployment.id
-                    ContractDeployment.contract
-                    ContractDeployment.block
-                    ContractDeployment.storage_protocol
-                    ContractDeployment.storage_address
-                    ContractDeployment.experimental
-                    ContractDeployment.solc_version
-                    ContractDeployment.verified_source
-                    ContractDeployment.verified_source_code
-                    ContractDeployment.name
-                    ContractDeployment.description
-                    ContractDeployment.standards
-                    ContractDeployment.patterns
-                    ContractDeployment.functionalities
-                    ContractDeployment.application_domain
-                    ContractDeployment.security_risks_description
-                    ContractDeployment.embeddings
-                }}
-            }}
-            """
-
-            with self.dgraph_txn(read_only=True) as txn:
-                # Log query start and measure latency
-                start_time = time.time()
-                self.logger.info(f"Vector search query started for: '{query[:50]}...'")
-
-                response = txn.query(dgraph_query).json
-
-                # Calculate and log query latency
-                end_time = time.time()
-                latency_ms = (end_time - start_time) * 1000
-                self.logger.info(
-                    f"Vector search query completed - Latency: {latency_ms:.2f}ms - Query: '{query[:50]}...'"
+            plan = self._plan_search(filters)
+            results = None
+            if plan.strategy == PREFILTER:
+                results = self._prefiltered_search(
+                    query_embedding,
+                    limit,
+                    projection,
+                    include_embeddings,
+                    threshold,
+                    filters,
+                    plan.root,
                 )
 
-                response = json.loads(response)
-                results = response.get("similar_contracts", [])
-
-                # Calculate cosine similarity for each result
-                for result in results:
-                    emb = result.get("ContractDeployment.embeddings")
-                    if emb is not None:
-                        try:
-                            # Handle both string and list types
-                            if isinstance(emb, str):
-                                emb_vec = np.array(json.loads(emb), dtype=np.float32)
-                            elif isinstance(emb, list):
-                                emb_vec = np.array(emb, dtype=np.float32)
-                            else:
-                                raise ValueError(
-                                    f"Unexpected type for embeddings: {type(emb)}"
-                                )
-                            query_vec = np.array(query_embedding, dtype=np.float32)
-                            # Compute cosine similarity
-                            if (
-                                np.linalg.norm(emb_vec) > 0
-                                and np.linalg.norm(query_vec) > 0
-                            ):
-                                cosine_sim = float(
-                                    np.dot(emb_vec, query_vec)
-                                    / (
-                                        np.linalg.norm(emb_vec)
-                                        * np.linalg.norm(query_vec)
-                                    )
-                                )
-                            else:
-                                cosine_sim = 0.0
-                        except Exception as e:
-                            self.logger.warning(
-                                f"Failed to parse or compute cosine similarity: {e}"
-                            )
-                            cosine_sim = None
-                    else:
-                        cosine_sim = None
-                    result["cosine_similarity"] = cosine_sim
+            if results is None:
+                top_k = initial_top_k(limit, threshold)
+                previous_count = None
+                rounds = 0
+                with self.dgraph_txn(read_only=True) as txn:
+                    # Log query start and measure latency
+                    start_time = time.time()
+                    self.logger.info(
+                        f"Vector search query started for: '{query[:50]}...'"
+                    )
 
-                self.logger.info(
-                    f"Vector search found {len(results)} similar contracts for query: {query}"
-                )
-                return results
+                    while top_k is not None:
+                        rounds += 1
+                        dgraph_query, variables = vector_search_query(
+                            query_embedding, top_k, projection, filters
+                        )
+                        response = json.loads(
+                            txn.query(dgraph_query, variables=variables).json
+                        )
+                        candidates = response.get("similar_contracts", [])
+
+                        # Score every candidate at once
+                        score_results(
+                            candidates, query_embedding, projection, include_embeddings
+                        )
+                        results, top_k = select_vector_results(
+                            candidates,
+                            limit,
+                            threshold,
+                            top_k,
+                            filtered=filters is not None and not filters.is_empty(),
+                            previous_count=previous_count,
+                            searchable=self.planner.searchable_count(),
+                        )
+                        previous_count = len(candidates)
+
+                    # Calculate and log query latency
+                    end_time = time.time()
+                    latency_ms = (end_time - start_time) * 1000
+                    self.logger.info(
+                        f"Vector search query completed - Latency: {latency_ms:.2f}ms - Rounds: {rounds} - Query: '{query[:50]}...'"
+                    )
+
+            self.logger.info(
+                f"Vector search found {len(results)} similar contracts for query: {query}"
+            )
+            self.result_cache.put(cache_key, results, cache_epoch)
+            return results
 
         except Exception as e:
             self.logger.error(f"Vector search failed for query '{query}': {e}")
             raise
 
-    def search_by_text_source_code(self, query: str, limit: int = 5) -> list[dict]:
+    def _plan_search(self, filters: Optional[SearchFilters]) -> SearchPlan:
+        """
+        Plans a vector search, first counting the facets of the filters that
+        the planner has no counts for
+        """
+        if filters is None or filters.is_empty():
+            return self.planner.plan(filters)
+
+        facets, count_searchable = self.planner.missing_facets(filters)
+        if facets or count_searchable:
+            try:
+                dgraph_query, variables = facet_counts_query(facets, count_searchable)
+                with self.dgraph_txn(read_only=True) as txn:
+                    response = json.loads(
+                        txn.query(dgraph_query, variables=variables).json
+                    )
+                self.planner.record_counts(*parse_facet_counts(response, facets))
+            except Exception as e:
+                # Without counts the planner falls back to the ANN search
+                self.logger.warning(f"Failed to count filter facets: {e}")
+        return self.planner.plan(filters)
+
+    def _prefiltered_search(
+        self,
+        query_embedding: list[float],
+        limit: int,
+        projection: str,
+        include_embeddings: Optional[bool],
+        threshold: Optional[float],
+        filters: SearchFilters,
+        root: str,
+    ) -> Optional[list[dict]]:
+        """
+        Scores every contract matching the filters exactly, then retrieves
+        the best ones with the requested projection
+
+        Returns:
+            The results, or None when more contracts matched than the planner
+            estimated and the ANN search should be used instead
+        """
+        start_time = time.time()
+        max_candidates = self.planner.max_root_candidates
+        dgraph_query, variables = prefiltered_search_query(
+            filters, root, max_candidates
+        )
+        with self.dgraph_txn(read_only=True) as txn:
+            response = json.loads(txn.query(dgraph_query, variables=variables).json)
+        candidates = response.get("candidates", [])
+        if len(candidates) >= max_candidates:
+            self.logger.warning(
+                f"Prefiltered search hit the {max_candidates} candidate cap, falling back to ANN search"
+            )
+            return None
+
+        score_results(candidates, query_embedding, "id_only", include_embeddings)
+        selected, _ = select_vector_results(
+            candidates, limit, threshold, max_candidates, searchable=len(candidates)
+        )
+        results = hydrate_results(
+            selected,
+            self.get_contracts_by_uids(
+                [candidate["uid"] for candidate in selected], projection
+            ),
+        )
+
+        latency_ms = (time.time() - start_time) * 1000
+        self.logger.info(
+            f"Prefiltered search scored {len(candidates)} candidates - Latency: {latency_ms:.2f}ms"
+        )
+        return results
+
+    def search_by_text_source_code(
+        self, query: str, limit: int = 5, projection: str = DEFAULT_PROJECTION
+    ) -> list[dict]:
         """
         Performs text search on contracts using literal text search
 
         Args:
             query: Text string to search for in contract fields
             limit: Maximum number of results to return
+            projection: Name of the field-projection profile to return
 
         Returns:
             List of contracts that match the text query
         """
         try:
-            # Construct Dgraph query with text search
-            # Use match for name (trigram index) and anyofterms for source code (term index)
-            dgraph_query = f"""
-            {{
-                text_search(func: type(ContractDeployment), first: {limit}) 
-                @filter(eq(ContractDeployment.verified_source, true) AND 
-                (anyofterms(ContractDeployment.verified_source_code, "{query}"))) {{
-                    uid
-                    ContractDeployment.id
-                    ContractDeployment.contract
-                    ContractDeployment.block
-                    ContractDeployment.storage_protocol
-                    ContractDeployment.storage_address
-                    ContractDeployment.experimental
-                    ContractDeployment.solc_version
-                    ContractDeployment.verified_source
-                    ContractDeployment.verified_source_code
-                    ContractDeployment.name
-                    ContractDeployment.description
-                    ContractDeployment.standards
-                    ContractDeployment.patterns
-                    ContractDeployment.functionalities
-                    ContractDeployment.application_domain
-                    ContractDeployment.security_risks_description
-                    ContractDeployment.embeddings
-                }}
-            }}
-            """
+            cache_key = self.result_cache.make_key(
+                "search_by_text_source_code", query, limit=limit, projection=projection
+            )
+            cached = self.result_cache.get(cache_key)
+            if cached is not None:
+                self.logger.info(
+                    f"Text source code search served from cache: '{query[:50]}...'"
+                )
+                return cached
+            cache_epoch = self.result_cache.epoch()
+
+            dgraph_query, variables = source_code_search_query(
+                query, limit, projection
+            )
 
             with self.dgraph_txn(read_only=True) as txn:
                 # Log query start and measure latency
@@ -537,7 +913,7 @@ class DgraphClient:
                     f"Text source code search query started for: '{query[:50]}...'"
                 )
 
-                response = txn.query(dgraph_query).json
+                response = txn.query(dgraph_query, variables=variables).json
 
                 # Calculate and log query latency
                 end_time = time.time()
@@ -552,6 +928,7 @@ class DgraphClient:
                 self.logger.info(
                     f"Text source code search found {len(results)} contracts for query: '{query}'"
                 )
+                self.result_cache.put(cache_key, results, cache_epoch)
                 return results
 
         except Exception as e:
@@ -560,59 +937,38 @@ class DgraphClient:
             )
             raise
 
-    def search_by_text(self, query: str, limit: int = 5) -> list[dict]:
+    def search_by_text(
+        self, query: str, limit: int = 5, projection: str = DEFAULT_PROJECTION
+    ) -> list[dict]:
         """
         Performs text search on contracts using literal text search
 
         Args:
             query: Text string to search for in contract fields
             limit: Maximum number of results to return
+            projection: Name of the field-projection profile to return
 
         Returns:
             List of contracts that match the text query
         """
         try:
-            # Construct Dgraph query with text search
-            # Use anyofterms for name and source code (more flexible matching)
-            # Use allofterms for other fields (more precise matching)
-            dgraph_query = f"""
-            {{
-                text_search(func: type(ContractDeployment), first: {limit}) 
-                @filter(eq(ContractDeployment.verified_source, true) AND 
-                (anyoftext(ContractDeployment.description, "{query}") OR
-                 anyofterms(ContractDeployment.standards, "{query}") OR
-                 anyofterms(ContractDeployment.patterns, "{query}") OR
-                 anyofterms(ContractDeployment.functionalities, "{query}") OR
-                 anyoftext(ContractDeployment.application_domain, "{query}") OR
-                 anyoftext(ContractDeployment.security_risks_description, "{query}"))) {{
-                    uid
-                    ContractDeployment.id
-                    ContractDeployment.contract
-                    ContractDeployment.block
-                    ContractDeployment.storage_protocol
-                    ContractDeployment.storage_address
-                    ContractDeployment.experimental
-                    ContractDeployment.solc_version
-                    ContractDeployment.verified_source
-                    ContractDeployment.verified_source_code
-                    ContractDeployment.name
-                    ContractDeployment.description
-                    ContractDeployment.standards
-                    ContractDeployment.patterns
-                    ContractDeployment.functionalities
-                    ContractDeployment.application_domain
-                    ContractDeployment.security_risks_description
-                    ContractDeployment.embeddings
-                }}
-            }}
-            """
+            cache_key = self.result_cache.make_key(
+                "search_by_text", query, limit=limit, projection=projection
+            )
+            cached = self.result_cache.get(cache_key)
+            if cached is not None:
+                self.logger.info(f"Text search served from cache: '{query[:50]}...'")
+                return cached
+            cache_epoch = self.result_cache.epoch()
+
+            dgraph_query, variables = text_search_query(query, limit, projection)
 
             with self.dgraph_txn(read_only=True) as txn:
                 # Log query start and measure latency
                 start_time = time.time()
                 self.logger.info(f"Text search query started for: '{query[:50]}...'")
 
-                response = txn.query(dgraph_query).json
+                response = txn.query(dgraph_query, variables=variables).json
 
                 # Calculate and log query latency
                 end_time = time.time()
@@ -627,6 +983,7 @@ class DgraphClient:
                 self.logger.info(
                     f"Text search found {len(results)} contracts for query: '{query}'"
                 )
+                self.result_cache.put(cache_key, results, cache_epoch)
                 return results
 
         except Exception as e:
@@ -635,9 +992,9 @@ class DgraphClient:
 
     def close(self) -> None:
         """
-        Closes the client stub
+        Closes the connection pool
         """
-        self.client_stub.close()
+        self.pool.close()
         self.logger.info("Client stub closed")
 
 
@@ -646,33 +1003,15 @@ def main() -> None:
     try:
         client = DgraphClient()
         all_unenriched = []
-        batch_size = 50
-        offset = 0
-
-        while True:
-            batch = client.get_contracts(
-                batch_size=batch_size, offset=offset, enriched=False
-            )
-            if not batch:
-                break
+        for batch in client.iter_contracts(enriched=False, page_size=50):
             all_unenriched.extend(batch)
-            offset += batch_size
 
         write_file(all_unenriched, "unenriched_contracts.json")
 
-        # Retrieve all enriched contracts in pages until empty
+        # Retrieve all enriched contracts page by page
         all_enriched = []
-        batch_size = 50
-        offset = 0
-
-        while True:
-            batch = client.get_contracts(
-                batch_size=batch_size, offset=offset, enriched=True
-            )
-            if not batch:
-                break
+        for batch in client.iter_contracts(enriched=True, page_size=50):
             all_enriched.extend(batch)
-            offset += batch_size
 
         result = all_enriched
 
@@ -0,0 +1,280 @@
+"""
+Structured filters on contract searches, compiled into DQL.
+
+The set of active filters only decides the shape of the query, i.e. which
+clauses and variables it has; the filter values themselves are always passed
+as DQL variables, so a compiled query is reused for every value.
+"""
+
+import json
+from dataclasses import asdict, dataclass, fields
+from typing import Any, Optional
+
+# Indexes the filters need: eq() on the tag lists and scalars needs an exact
+# index (the term index splits "erc-4626" into "erc" and "4626"), the block
+# range is resolved through the reverse block edge. Applying the schema again
+# is a no-op for indexes that already exist.
+FILTER_SCHEMA = """
+<ContractDeployment.standards>: [string] @index(exact, term) .
+<ContractDeployment.patterns>: [string] @index(exact, term) .
+<ContractDeployment.functionalities>: [string] @index(exact, term) .
+<ContractDeployment.application_domain>: string @index(exact, fulltext) .
+<ContractDeployment.solc_version>: string @index(exact) .
+<ContractDeployment.experimental>: bool @index(bool) .
+<ContractDeployment.block>: uid @reverse .
+<Block.number>: int @index(int) .
+"""
+
+# Filters that match a contract having any of the given values
+VALUE_FILTERS = {
+    "standards": "ContractDeployment.standards",
+    "patterns": "ContractDeployment.patterns",
+    "functionalities": "ContractDeployment.functionalities",
+    "application_domain": "ContractDeployment.application_domain",
+    "solc_version": "ContractDeployment.solc_version",
+}
+
+BLOCK_RANGE_VAR = "in_block_range"
+# block_from and block_to form a single filter group
+BLOCK_RANGE_GROUP = "block_range"
+
+
+@dataclass
+class SearchFilters:
+    """
+    Restricts a search to contracts matching every given filter
+
+    List filters match when the contract has any of the listed values; unset
+    filters (None or empty) do not restrict the search.
+    """
+
+    standards: Optional[list[str]] = None
+    patterns: Optional[list[str]] = None
+    functionalities: Optional[list[str]] = None
+    application_domain: Optional[list[str]] = None
+    solc_version: Optional[list[str]] = None
+    block_from: Optional[int] = None
+    block_to: Optional[int] = None
+    experimental: Optional[bool] = None
+
+    @classmethod
+    def from_dict(cls, data: Optional[dict[str, Any]]) -> "SearchFilters":
+        """
+        Builds filters from request arguments
+
+        Single values are accepted for the list filters.
+
+        Args:
+            data: Filter values keyed by filter name
+
+        Returns:
+            The filters
+        """
+        data = dict(data or {})
+        unknown = set(data) - {field.name for field in fields(cls)}
+        if unknown:
+            raise ValueError(
+                f"Unknown search filter(s): {', '.join(sorted(unknown))}. Expected any of: {', '.join(field.name for field in fields(cls))}"
+            )
+        for name in VALUE_FILTERS:
+            if isinstance(data.get(name), str):
+                data[name] = [data[name]]
+        return cls(**data)
+
+    def __post_init__(self) -> None:
+        if (
+            self.block_from is not None
+            and self.block_to is not None
+            and self.block_from > self.block_to
+        ):
+            raise ValueError(
+                f"block_from ({self.block_from}) must not be greater than block_to ({self.block_to})"
+            )
+
+    def active(self) -> dict[str, Any]:
+        """Returns the filters that restrict the search, keyed by name."""
+        return {
+            name: value
+            for name, value in asdict(self).items()
+            if value is not None and value != []
+        }
+
+    def is_empty(self) -> bool:
+        return not self.active()
+
+    def shape(self) -> tuple[str, ...]:
+        """Returns the names of the active filters, which determine the query text."""
+        return tuple(sorted(self.active()))
+
+    def groups(self) -> dict[str, list[tuple[str, Any]]]:
+        """
+        Returns the facets of every active filter group
+
+        A facet is a (group, value) pair whose contract count can be cached:
+        one per value of a list filter, the experimental flag, and the block
+        range as a whole. A group matches the union of its facets.
+
+        Returns:
+            Facets keyed by filter group
+        """
+        groups = {}
+        for name, value in self.active().items():
+            if name in VALUE_FILTERS:
+                groups[name] = [(name, item) for item in dict.fromkeys(value)]
+            elif name == "experimental":
+                groups[name] = [(name, value)]
+        if self.block_from is not None or self.block_to is not None:
+            groups[BLOCK_RANGE_GROUP] = [
+                (BLOCK_RANGE_GROUP, (self.block_from, self.block_to))
+            ]
+        return groups
+
+    def variables(self) -> dict[str, str]:
+        """
+        Returns the DQL variables of the active filters
+
+        List values are JSON-encoded, as eq() accepts a JSON list.
+        """
+        variables = {}
+        for name, value in self.active().items():
+            if name in VALUE_FILTERS:
+                variables[f"${name}"] = json.dumps(value)
+            elif isinstance(value, bool):
+                variables[f"${name}"] = "true" if value else "false"
+            else:
+                variables[f"${name}"] = str(value)
+        return variables
+
+
+def _block_range_function(block_from: Optional[str], block_to: Optional[str]) -> str:
+    """Returns the Block.number function for the given bound variables."""
+    if block_from and block_to:
+        return f"between(Block.number, {block_from}, {block_to})"
+    if block_from:
+        return f"ge(Block.number, {block_from})"
+    return f"le(Block.number, {block_to})"
+
+
+def _block_range_var_block(function: str, var: str) -> str:
+    # Contracts are reached from the blocks in range through the reverse
+    # edge, since a filter cannot test a predicate of a linked node
+    return (
+        f"  var(func: {function}) {{\n"
+        f"    {var} as ~ContractDeployment.block\n"
+        f"  }}\n"
+    )
+
+
+def render_filters(
+    shape: tuple[str, ...], root: Optional[str] = None
+) -> dict[str, str]:
+    """
+    Renders the DQL fragments of a filter shape
+
+    Args:
+        shape: Names of the active filters, from SearchFilters.shape()
+        root: Filter group (see SearchFilters.groups()) to turn into the root
+            function of the block instead of a @filter clause
+
+    Returns:
+        The fragments to splice into a query template: "declarations" (the
+        variable declarations, with a leading comma), "var_blocks" (blocks
+        to place before the search block), "filters" (the clauses to AND
+        into its @filter, with a leading AND) and "root" (the root function,
+        empty without a root)
+    """
+    declarations = []
+    clauses = {}
+    for name in shape:
+        if name in VALUE_FILTERS:
+            declarations.append(f"${name}: string")
+            clauses[name] = f"eq({VALUE_FILTERS[name]}, ${name})"
+        elif name == "experimental":
+            declarations.append("$experimental: bool")
+            clauses[name] = "eq(ContractDeployment.experimental, $experimental)"
+
+    var_blocks = ""
+    has_from, has_to = "block_from" in shape, "block_to" in shape
+    if has_from or has_to:
+        declarations += [
+            f"${name}: int" for name in ("block_from", "block_to") if name in shape
+        ]
+        var_blocks = _block_range_var_block(
+            _block_range_function(
+                "$block_from" if has_from else None, "$block_to" if has_to else None
+            ),
+            BLOCK_RANGE_VAR,
+        )
+        clauses[BLOCK_RANGE_GROUP] = f"uid({BLOCK_RANGE_VAR})"
+
+    if root is not None and root not in clauses:
+        raise ValueError(f"Root filter '{root}' is not part of the filters {shape}")
+    root_function = clauses.pop(root) if root is not None else ""
+
+    return {
+        "declarations": "".join(f", {declaration}" for declaration in declarations),
+        "var_blocks": var_blocks,
+        "filters": "".join(f" AND {clause}" for clause in clauses.values()),
+        "root": root_function,
+    }
+
+
+def render_facet_counts(
+    facets: list[tuple[str, Any]],
+) -> tuple[str, dict[str, str]]:
+    """
+    Renders one query counting the contracts of every facet
+
+    Args:
+        facets: Facets as returned by SearchFilters.groups()
+
+    Returns:
+        The query, with one block per facet named f<index>, and its variables
+    """
+    declarations = []
+    var_blocks = []
+    blocks = []
+    variables = {}
+    for index, (group, value) in enumerate(facets):
+        var = f"$f{index}"
+        if group == BLOCK_RANGE_GROUP:
+            block_from, block_to = value
+            bounds = {}
+            if block_from is not None:
+                bounds["from"] = block_from
+            if block_to is not None:
+                bounds["to"] = block_to
+            for bound, number in bounds.items():
+                declarations.append(f"{var}_{bound}: int")
+                variables[f"{var}_{bound}"] = str(number)
+            range_var = f"range{index}"
+            var_blocks.append(
+                _block_range_var_block(
+                    _block_range_function(
+                        f"{var}_from" if "from" in bounds else None,
+                        f"{var}_to" if "to" in bounds else None,
+                    ),
+                    range_var,
+                )
+            )
+            function = f"uid({range_var})"
+        elif group == "experimental":
+            declarations.append(f"{var}: bool")
+            variables[var] = "true" if value else "false"
+            function = f"eq(ContractDeployment.experimental, {var})"
+        else:
+            declarations.append(f"{var}: string")
+            variables[var] = value
+            function = f"eq({VALUE_FILTERS[group]}, {var})"
+        blocks.append(f"  f{index}(func: {function}) {{\n    count(uid)\n  }}\n")
+
+    # DQL rejects an empty parameter list, e.g. when only the searchable
+    # contracts are counted
+    signature = f"({', '.join(declarations)})" if declarations else ""
+    query = (
+        f"query facet_counts{signature} {{\n"
+        + "".join(var_blocks)
+        + "".join(blocks)
+        + "}\n"
+    )
+    return query, variables
@@ -0,0 +1,128 @@
+"""
+Named field-projection profiles for ContractDeployment reads.
+
+Every DgraphClient read method accepts one of these profile names and uses
+build_selection() to generate its DQL selection set, so callers only pull the
+predicates they actually need (source code and embeddings are by far the
+heaviest ones).
+"""
+
+CONTRACT_FIELDS = (
+    "ContractDeployment.id",
+    "ContractDeployment.contract",
+    "ContractDeployment.block",
+    "ContractDeployment.storage_protocol",
+    "ContractDeployment.storage_address",
+    "ContractDeployment.experimental",
+    "ContractDeployment.solc_version",
+    "ContractDeployment.verified_source",
+    "ContractDeployment.verified_source_code",
+    "ContractDeployment.name",
+    "ContractDeployment.description",
+    "ContractDeployment.standards",
+    "ContractDeployment.patterns",
+    "ContractDeployment.functionalities",
+    "ContractDeployment.application_domain",
+    "ContractDeployment.security_risks_description",
+    "ContractDeployment.embeddings",
+)
+
+EMBEDDINGS_FIELD = "ContractDeployment.embeddings"
+SOURCE_CODE_FIELD = "ContractDeployment.verified_source_code"
+# SHA-256 of the normalized verified source, set by the enrichment step
+SOURCE_HASH_FIELD = "ContractDeployment.source_hash"
+
+# Fields produced by the semantic enrichment step
+ENRICHMENT_FIELDS = (
+    "ContractDeployment.description",
+    "ContractDeployment.standards",
+    "ContractDeployment.patterns",
+    "ContractDeployment.functionalities",
+    "ContractDeployment.application_domain",
+    "ContractDeployment.security_risks_description",
+)
+
+PROJECTIONS: dict[str, tuple[str, ...]] = {
+    # Just enough to address a contract
+    "id_only": ("ContractDeployment.id",),
+    # What a search card renders: no source code, no vectors
+    "summary": tuple(
+        field
+        for field in CONTRACT_FIELDS
+        if field not in (SOURCE_CODE_FIELD, EMBEDDINGS_FIELD)
+    ),
+    # Everything a contract detail view needs
+    "detail": tuple(field for field in CONTRACT_FIELDS if field != EMBEDDINGS_FIELD),
+    # Input of the LLM enrichment step
+    "enrichment_input": (
+        "ContractDeployment.id",
+        "ContractDeployment.storage_protocol",
+        "ContractDeployment.storage_address",
+        "ContractDeployment.experimental",
+        "ContractDeployment.solc_version",
+        "ContractDeployment.verified_source",
+        "ContractDeployment.verified_source_code",
+        "ContractDeployment.name",
+    ),
+    # Input of the embedding step
+    "embedding_input": ("ContractDeployment.id",) + ENRICHMENT_FIELDS,
+    # What a deployment with the same source can copy instead of being
+    # enriched and embedded again
+    "source_enrichment": ENRICHMENT_FIELDS + (EMBEDDINGS_FIELD,),
+    # What the in-process BM25 index is built from
+    "text_index": ("ContractDeployment.verified_source",) + ENRICHMENT_FIELDS,
+    # What the in-memory vector index re-reads for a changed contract
+    "vector_index": (EMBEDDINGS_FIELD, "ContractDeployment.description"),
+    # Every predicate, vectors included
+    "full": CONTRACT_FIELDS,
+}
+
+DEFAULT_PROJECTION = "full"
+
+
+def get_projection_fields(projection: str = DEFAULT_PROJECTION) -> tuple[str, ...]:
+    """
+    Resolves a projection profile name to its predicates.
+
+    Args:
+        projection: Name of a profile in PROJECTIONS
+
+    Returns:
+        The predicates selected by the profile, excluding uid
+    """
+    try:
+        return PROJECTIONS[projection]
+    except KeyError:
+        raise ValueError(
+            f"Unknown projection '{projection}'. Expected one of: {', '.join(PROJECTIONS)}"
+        ) from None
+
+
+def build_selection(
+    projection: str = DEFAULT_PROJECTION,
+    extra_fields: tuple[str, ...] = (),
+    indent: int = 8,
+) -> str:
+    """
+    Builds the DQL selection set (the body between braces) for a projection.
+
+    Args:
+        projection: Name of a profile in PROJECTIONS
+        extra_fields: Additional predicates the caller needs internally
+        indent: Number of spaces to prefix every line with
+
+    Returns:
+        The newline-separated selection set, always starting with uid
+    """
+    fields = ["uid"]
+    for field in get_projection_fields(projection) + tuple(extra_fields):
+        if field not in fields:
+            fields.append(field)
+
+    prefix = " " * indent
+    return "\n".join(f"{prefix}{field}" for field in fields)
+
+
+def includes_field(projection: str, field: str) -> bool:
+    """Returns whether a projection profile selects the given predicate."""
+    return field in get_projection_fields(projection)
@@ -0,0 +1,758 @@
+"""
+Parameterized DQL queries and result post-processing shared by DgraphClient
+and AsyncDgraphClient, so both clients send exactly the same queries.
+
+Every builder returns a (query, variables) pair for
+`txn.query(query, variables=variables)`.
+"""
+
+import json
+import re
+import numpy as np
+from functools import lru_cache
+from typing import Any, Optional
+from src.core.data_access.filters import (
+    SearchFilters,
+    render_facet_counts,
+    render_filters,
+)
+from src.core.data_access.projections import (
+    DEFAULT_PROJECTION,
+    EMBEDDINGS_FIELD,
+    PROJECTIONS,
+    SOURCE_HASH_FIELD,
+    build_selection,
+    get_projection_fields,
+    includes_field,
+)
+from src.utils.logger import logger
+
+# Query templates, rendered once per projection profile at import. User input
+# and query vectors are only ever passed as DQL variables, so the query text
+# is constant for a given projection.
+
+CONTRACT_BY_ID_TEMPLATE = """
+query contract_by_id($id: string) {{
+  contract(func: eq(ContractDeployment.id, $id)) {{
+{selection}
+  }}
+}}
+"""
+
+CONTRACT_BY_UID_TEMPLATE = """
+query contract_by_uid($uid: string) {{
+  contract(func: uid($uid)) {{
+{selection}
+  }}
+}}
+"""
+
+# Page of the verified contracts, restricted to the enriched or unenriched
+# ones by {filter}; $after is the last UID of the previous page ("0x0" for the
+# first one), $offset skips contracts after it
+CONTRACTS_PAGE_TEMPLATE = """
+query contracts_page($first: int, $offset: int, $after: string) {{
+  allContractDeployments(func: type(ContractDeployment), first: $first, offset: $offset, after: $after)
+  @filter({filter}) {{
+{selection}
+  }}
+}}
+"""
+
+CONTRACTS_COUNT_TEMPLATE = """
+{{
+  contractCount(func: type(ContractDeployment)) @filter({filter}) {{
+    count(uid)
+  }}
+}}
+"""
+
+# Filter of the contract scans and counts, by enrichment state: True for the
+# enriched contracts, False for the unenriched ones, None for all of them
+ENRICHMENT_FILTERS = {
+    None: "eq(ContractDeployment.verified_source, true)",
+    True: "eq(ContractDeployment.verified_source, true) AND has(ContractDeployment.description)",
+    False: "eq(ContractDeployment.verified_source, true) AND NOT has(ContractDeployment.description)",
+}
+
+# $ids is a JSON list of reproducible IDs
+CONTRACTS_BY_IDS_TEMPLATE = """
+query contracts_by_ids($ids: string) {{
+  contracts(func: eq(ContractDeployment.id, $ids)) {{
+{selection}
+  }}
+}}
+"""
+
+# $uids is a list of UIDs such as "[0x1, 0x2]"; the type filter drops UIDs
+# that are not contracts (uid() returns any UID it is given)
+CONTRACTS_BY_UIDS_TEMPLATE = """
+query contracts_by_uids($uids: string) {{
+  contracts(func: uid($uids)) @filter(type(ContractDeployment)) {{
+{selection}
+  }}
+}}
+"""
+
+# Syntax: similar_to(predicate, topK, "vector"); the vector variable is the
+# JSON-encoded embedding. Structured filters are spliced in by render_filters
+VECTOR_SEARCH_TEMPLATE = """
+query vector_search($k: int, $vec: string{declarations}) {{
+{var_blocks}  similar_contracts(func: similar_to(ContractDeployment.embeddings, $k, $vec))
+  @filter(has(ContractDeployment.embeddings) AND has(ContractDeployment.description){filters}) {{
+{selection}
+  }}
+}}
+"""
+
+# Use anyoftext for free text fields and anyofterms for tag lists. Every
+# field is matched by its own index and the root takes the union, so the
+# search never scans type(ContractDeployment)
+TEXT_SEARCH_TEMPLATE = """
+query text_search($q: string, $k: int) {{
+  by_description as var(func: anyoftext(ContractDeployment.description, $q))
+  by_standards as var(func: anyofterms(ContractDeployment.standards, $q))
+  by_patterns as var(func: anyofterms(ContractDeployment.patterns, $q))
+  by_functionalities as var(func: anyofterms(ContractDeployment.functionalities, $q))
+  by_domain as var(func: anyoftext(ContractDeployment.application_domain, $q))
+  by_risks as var(func: anyoftext(ContractDeployment.security_risks_description, $q))
+
+  text_search(func: uid(by_description, by_standards, by_patterns,
+                        by_functionalities, by_domain, by_risks), first: $k)
+  @filter(eq(ContractDeployment.verified_source, true)) {{
+{selection}
+  }}
+}}
+"""
+
+# Use anyofterms for source code (term index)
+SOURCE_CODE_SEARCH_TEMPLATE = """
+query source_code_search($q: string, $k: int) {{
+  text_search(func: anyofterms(ContractDeployment.verified_source_code, $q), first: $k)
+  @filter(eq(ContractDeployment.verified_source, true)) {{
+{selection}
+  }}
+}}
+"""
+
+# Streaming scan of the enriched contracts in UID order; $after is the last
+# UID of the previous page ("0x0" for the first one)
+ENRICHED_CONTRACTS_PAGE_TEMPLATE = """
+query enriched_contracts_page($first: int, $after: string) {{
+  contracts(func: has(ContractDeployment.description), first: $first, after: $after)
+  @filter(eq(ContractDeployment.verified_source, true)) {{
+{selection}
+  }}
+}}
+"""
+
+# Enriched contracts with any of the given source hashes ($hashes is a JSON
+# list); each of them carries the enrichment of its source
+ENRICHED_BY_SOURCE_HASH_TEMPLATE = """
+query enriched_by_source_hash($hashes: string) {{
+  contracts(func: eq(ContractDeployment.source_hash, $hashes))
+  @filter(has(ContractDeployment.description)) {{
+{selection}
+  }}
+}}
+"""
+
+# Streaming scan of the contracts a vector search can return, as matched by
+# VECTOR_SEARCH_TEMPLATE, for the in-memory vector index. Only the embeddings
+# are fetched, so the query does not depend on a projection
+SEARCHABLE_EMBEDDINGS_PAGE_QUERY = """
+query searchable_embeddings_page($first: int, $after: string) {
+  contracts(func: has(ContractDeployment.embeddings), first: $first, after: $after)
+  @filter(has(ContractDeployment.description)) {
+    uid
+    ContractDeployment.embeddings
+  }
+}
+"""
+
+# Exact search over a small filtered candidate set: the most selective filter
+# is the root, the other filters are ANDed in, and only the embeddings are
+# fetched for scoring. $k caps the candidates in case the estimate was off
+PREFILTERED_SEARCH_TEMPLATE = """
+query prefiltered_search($k: int{declarations}) {{
+{var_blocks}  candidates(func: {root}, first: $k)
+  @filter(has(ContractDeployment.embeddings) AND has(ContractDeployment.description){filters}) {{
+    uid
+    ContractDeployment.embeddings
+  }}
+}}
+"""
+
+# Number of contracts that can be searched by vector, the denominator of the
+# filter selectivity estimates
+SEARCHABLE_COUNT_BLOCK = """  searchable(func: has(ContractDeployment.embeddings)) {
+    count(uid)
+  }
+"""
+
+
+# Counts are computed by Dgraph; the verified contract set is evaluated once
+# and every block counts a subset of it
+CORPUS_STATS_QUERY = """
+{
+  verified as var(func: eq(ContractDeployment.verified_source, true))
+  @filter(type(ContractDeployment))
+
+  total(func: uid(verified)) {
+    count(uid)
+  }
+  enriched(func: uid(verified)) @filter(has(ContractDeployment.description)) {
+    count(uid)
+  }
+  unenriched(func: uid(verified)) @filter(NOT has(ContractDeployment.description)) {
+    count(uid)
+  }
+  with_embeddings(func: uid(verified)) @filter(has(ContractDeployment.embeddings)) {
+    count(uid)
+  }
+  without_ids(func: uid(verified)) @filter(NOT has(ContractDeployment.id)) {
+    count(uid)
+  }
+  stale(func: uid(verified))
+  @filter(has(ContractDeployment.description) AND NOT has(ContractDeployment.embeddings)) {
+    count(uid)
+  }
+}
+"""
+
+CORPUS_STATS_BLOCKS = (
+    "total",
+    "enriched",
+    "unenriched",
+    "with_embeddings",
+    "without_ids",
+    "stale",
+)
+
+
+def parse_corpus_stats(response: dict) -> dict[str, int]:
+    """
+    Reads the counts out of a CORPUS_STATS_QUERY response
+
+    Returns:
+        Counts keyed by block name; "stale" counts enriched contracts whose
+        embeddings are missing and need to be (re)computed
+    """
+    return {
+        block: response[block][0]["count"] if response.get(block) else 0
+        for block in CORPUS_STATS_BLOCKS
+    }
+
+
+def _compile(
+    template: str, extra_fields: tuple[str, ...] = (), **fragments: str
+) -> dict[str, str]:
+    """Renders a template for every projection profile."""
+    return {
+        projection: template.format(
+            selection=build_selection(projection, extra_fields=extra_fields, indent=4),
+            **fragments,
+        )
+        for projection in PROJECTIONS
+    }
+
+
+CONTRACT_BY_ID_QUERIES = _compile(CONTRACT_BY_ID_TEMPLATE)
+CONTRACT_BY_UID_QUERIES = _compile(CONTRACT_BY_UID_TEMPLATE)
+# Results are keyed by ID, so the ID is always selected
+CONTRACTS_BY_IDS_QUERIES = _compile(
+    CONTRACTS_BY_IDS_TEMPLATE, ("ContractDeployment.id",)
+)
+CONTRACTS_BY_UIDS_QUERIES = _compile(CONTRACTS_BY_UIDS_TEMPLATE)
+CONTRACTS_PAGE_QUERIES = {
+    enriched: _compile(CONTRACTS_PAGE_TEMPLATE, filter=contracts_filter)
+    for enriched, contracts_filter in ENRICHMENT_FILTERS.items()
+}
+CONTRACTS_COUNT_QUERIES = {
+    enriched: CONTRACTS_COUNT_TEMPLATE.format(filter=contracts_filter)
+    for enriched, contracts_filter in ENRICHMENT_FILTERS.items()
+}
+# Embeddings are always selected because scoring needs them, whatever the
+# projection; score_results() drops them afterwards
+VECTOR_SEARCH_QUERIES = _compile(
+    VECTOR_SEARCH_TEMPLATE, (EMBEDDINGS_FIELD,), **render_filters(())
+)
+TEXT_SEARCH_QUERIES = _compile(TEXT_SEARCH_TEMPLATE)
+SOURCE_CODE_SEARCH_QUERIES = _compile(SOURCE_CODE_SEARCH_TEMPLATE)
+ENRICHED_CONTRACTS_PAGE_QUERIES = _compile(ENRICHED_CONTRACTS_PAGE_TEMPLATE)
+# Results are keyed by source hash, so the hash is always selected
+ENRICHED_BY_SOURCE_HASH_QUERIES = _compile(
+    ENRICHED_BY_SOURCE_HASH_TEMPLATE, (SOURCE_HASH_FIELD,)
+)
+
+
+def _compiled(queries: dict[str, str], projection: str) -> str:
+    try:
+        return queries[projection]
+    except KeyError:
+        # Raises the descriptive error for unknown profiles
+        get_projection_fields(projection)
+        raise
+
+
+# Dgraph UIDs, as returned in the uid field of every node
+_UID_PATTERN = re.compile(r"^0x[0-9a-f]+$")
+
+
+def validate_uids(uids: list[str]) -> list[str]:
+    """
+    Checks that every UID is a Dgraph UID before it is put in a uid() list
+
+    Raises:
+        ValueError: If any UID is malformed
+    """
+    invalid = [uid for uid in uids if not _UID_PATTERN.match(str(uid))]
+    if invalid:
+        raise ValueError(
+            f"Invalid UID(s): {', '.join(repr(uid) for uid in invalid[:5])}"
+        )
+    return uids
+
+
+def contracts_page_query(
+    page_size: int,
+    enriched: Optional[bool] = None,
+    projection: str = DEFAULT_PROJECTION,
+    after: Optional[str] = None,
+    offset: int = 0,
+) -> tuple[str, dict[str, str]]:
+    """Returns the query and variables of one page of the verified contracts."""
+    return _compiled(CONTRACTS_PAGE_QUERIES[enriched], projection), {
+        "$first": str(page_size),
+        "$offset": str(offset),
+        "$after": validate_uids([after])[0] if after else "0x0",
+    }
+
+
+def contracts_count_query(
+    enriched: Optional[bool] = None,
+) -> tuple[str, dict[str, str]]:
+    """Returns the query counting the verified contracts by enrichment state."""
+    return CONTRACTS_COUNT_QUERIES[enriched], {}
+
+
+def contract_by_id_query(
+    contract_id: str, projection: str = DEFAULT_PROJECTION
+) -> tuple[str, dict[str, str]]:
+    """Returns the query and variables for a single contract by its reproducible ID."""
+    return _compiled(CONTRACT_BY_ID_QUERIES, projection), {"$id": contract_id}
+
+
+def contract_by_uid_query(
+    uid: str, projection: str = DEFAULT_PROJECTION
+) -> tuple[str, dict[str, str]]:
+    """Returns the query and variables for a single contract by its UID."""
+    validate_uids([uid])
+    return _compiled(CONTRACT_BY_UID_QUERIES, projection), {"$uid": uid}
+
+
+def contracts_by_ids_query(
+    contract_ids: list[str], projection: str = DEFAULT_PROJECTION
+) -> tuple[str, dict[str, str]]:
+    """Returns the query and variables for many contracts by their reproducible IDs."""
+    return _compiled(CONTRACTS_BY_IDS_QUERIES, projection), {
+        "$ids": json.dumps(contract_ids)
+    }
+
+
+def contracts_by_uids_query(
+    uids: list[str], projection: str = DEFAULT_PROJECTION
+) -> tuple[str, dict[str, str]]:
+    """Returns the query and variables for many contracts by their UIDs."""
+    return _compiled(CONTRACTS_BY_UIDS_QUERIES, projection), {
+        "$uids": f"[{', '.join(validate_uids(uids))}]"
+    }
+
+
+# Adaptive over-fetch of vector search: similar_to is asked for a growing
+# top-K until enough candidates pass the threshold and the filters, or the cap
+# is reached
+VECTOR_OVERFETCH_FACTOR = 2
+MAX_VECTOR_TOP_K = 256
+
+
+@lru_cache(maxsize=256)
+def _filtered_vector_search(projection: str, shape: tuple[str, ...]) -> str:
+    """Renders the vector search for a filter shape, once per shape."""
+    return VECTOR_SEARCH_TEMPLATE.format(
+        selection=build_selection(
+            projection, extra_fields=(EMBEDDINGS_FIELD,), indent=4
+        ),
+        **render_filters(shape),
+    )
+
+
+def vector_search_query(
+    query_embedding: list[float],
+    limit: int,
+    projection: str = DEFAULT_PROJECTION,
+    filters: Optional[SearchFilters] = None,
+) -> tuple[str, dict[str, str]]:
+    """
+    Returns the similar_to query and variables for a query embedding,
+    restricted to the contracts matching the filters
+    """
+    variables = {"$k": str(limit), "$vec": json.dumps(query_embedding)}
+    if filters is None or filters.is_empty():
+        return _compiled(VECTOR_SEARCH_QUERIES, projection), variables
+
+    get_projection_fields(projection)
+    query = _filtered_vector_search(projection, filters.shape())
+    return query, {**variables, **filters.variables()}
+
+
+@lru_cache(maxsize=256)
+def _prefiltered_search(shape: tuple[str, ...], root: str) -> str:
+    """Renders the prefiltered search for a filter shape and root, once each."""
+    return PREFILTERED_SEARCH_TEMPLATE.format(**render_filters(shape, root))
+
+
+def prefiltered_search_query(
+    filters: SearchFilters, root: str, max_candidates: int
+) -> tuple[str, dict[str, str]]:
+    """
+    Returns the query and variables fetching the embeddings of every contract
+    matching the filters, rooted on one filter group
+
+    Args:
+        filters: The (non-empty) filters
+        root: Filter group to root the query on, from SearchFilters.groups()
+        max_candidates: Maximum number of candidates returned
+    """
+    return _prefiltered_search(filters.shape(), root), {
+        "$k": str(max_candidates),
+        **filters.variables(),
+    }
+
+
+def facet_counts_query(
+    facets: list[tuple[str, Any]], include_searchable: bool = False
+) -> tuple[str, dict[str, str]]:
+    """
+    Returns a query counting the contracts of each facet in one round trip
+
+    The count of facets[i] is in block f<i>, read by parse_facet_counts.
+
+    Args:
+        facets: Facets as returned by SearchFilters.groups()
+        include_searchable: Whether to also count the contracts with embeddings
+    """
+    query, variables = render_facet_counts(facets)
+    if include_searchable:
+        query = query[: query.rindex("}")] + SEARCHABLE_COUNT_BLOCK + "}\n"
+    return query, variables
+
+
+def parse_facet_counts(
+    response: dict, facets: list[tuple[str, Any]]
+) -> tuple[dict[tuple[str, Any], int], Optional[int]]:
+    """
+    Reads the counts out of a facet_counts_query response
+
+    Returns:
+        The count of every facet, and the number of searchable contracts
+        when the query counted them
+    """
+
+    def count(block: str) -> int:
+        return response[block][0]["count"] if response.get(block) else 0
+
+    counts = {facet: count(f"f{index}") for index, facet in enumerate(facets)}
+    searchable = count("searchable") if "searchable" in response else None
+    return counts, searchable
+
+
+def enriched_contracts_page_query(
+    page_size: int, after: Optional[str] = None, projection: str = DEFAULT_PROJECTION
+) -> tuple[str, dict[str, str]]:
+    """Returns the query and variables of one page of the enriched contracts scan."""
+    return _compiled(ENRICHED_CONTRACTS_PAGE_QUERIES, projection), {
+        "$first": str(page_size),
+        "$after": after or "0x0",
+    }
+
+
+def enriched_by_source_hash_query(
+    hashes: list[str], projection: str = "source_enrichment"
+) -> tuple[str, dict[str, str]]:
+    """Returns the query and variables of the enriched contracts with the given source hashes."""
+    return _compiled(ENRICHED_BY_SOURCE_HASH_QUERIES, projection), {
+        "$hashes": json.dumps(hashes)
+    }
+
+
+def searchable_embeddings_page_query(
+    page_size: int, after: Optional[str] = None
+) -> tuple[str, dict[str, str]]:
+    """Returns the query and variables of one page of the searchable embeddings scan."""
+    return SEARCHABLE_EMBEDDINGS_PAGE_QUERY, {
+        "$first": str(page_size),
+        "$after": after or "0x0",
+    }
+
+
+def text_search_query(
+    query: str, limit: int, projection: str = DEFAULT_PROJECTION
+) -> tuple[str, dict[str, str]]:
+    """Returns the full-text query and variables over the enriched metadata fields."""
+    return _compiled(TEXT_SEARCH_QUERIES, projection), {
+        "$q": query,
+        "$k": str(limit),
+    }
+
+
+def source_code_search_query(
+    query: str, limit: int, projection: str = DEFAULT_PROJECTION
+) -> tuple[str, dict[str, str]]:
+    """Returns the term query and variables over the verified source code."""
+    return _compiled(SOURCE_CODE_SEARCH_QUERIES, projection), {
+        "$q": query,
+        "$k": str(limit),
+    }
+
+
+def _embedding_matrix(
+    results: list[dict], dimension: int
+) -> tuple[list[int], np.ndarray]:
+    """
+    Stacks the embeddings of the results into a single float32 matrix.
+
+    Dgraph returns float32vector values either as JSON lists or as JSON
+    strings; all string values are decoded with a single json.loads call.
+
+    Returns:
+        The indices of the results that have a usable embedding, and their
+        embeddings as a (len(rows), dimension) matrix
+    """
+    rows: list[int] = []
+    vectors: list = []
+    encoded_rows: list[int] = []
+    encoded: list[str] = []
+
+    for row, result in enumerate(results):
+        emb = result.get(EMBEDDINGS_FIELD)
+        if isinstance(emb, str):
+            encoded_rows.append(row)
+            encoded.append(emb)
+        elif isinstance(emb, list):
+            rows.append(row)
+            vectors.append(emb)
+        elif emb is not None:
+            logger.warning(f"Unexpected type for embeddings: {type(emb)}")
+
+    if encoded:
+        try:
+            decoded = json.loads("[" + ",".join(encoded) + "]")
+        except json.JSONDecodeError:
+            # Fall back to decoding row by row to isolate the malformed ones
+            decoded = []
+            for emb in encoded:
+                try:
+                    decoded.append(json.loads(emb))
+                except json.JSONDecodeError as e:
+                    logger.warning(f"Failed to parse embeddings: {e}")
+                    decoded.append(None)
+        for row, vector in zip(encoded_rows, decoded):
+            if isinstance(vector, list):
+                rows.append(row)
+                vectors.append(vector)
+
+    usable = [
+        (row, vector) for row, vector in zip(rows, vectors) if len(vector) == dimension
+    ]
+    if len(usable) < len(rows):
+        logger.warning(
+            f"Skipped {len(rows) - len(usable)} embeddings with a dimension other than {dimension}"
+        )
+    if not usable:
+        return [], np.empty((0, dimension), dtype=np.float32)
+
+    return [row for row, _ in usable], np.asarray(
+        [vector for _, vector in usable], dtype=np.float32
+    )
+
+
+def embedding_rows(
+    results: list[dict], dimension: Optional[int] = None
+) -> tuple[list[str], np.ndarray]:
+    """
+    Decodes the embeddings of contracts for the in-memory vector index
+
+    Args:
+        results: Contracts with a uid and their embeddings
+        dimension: Size of the embeddings; defaults to the size of the first
+            embedding
+
+    Returns:
+        The UIDs of the contracts that have a usable embedding, and their
+        embeddings as a float32 matrix
+    """
+    if dimension is None:
+        for result in results:
+            emb = result.get(EMBEDDINGS_FIELD)
+            try:
+                emb = json.loads(emb) if isinstance(emb, str) else emb
+            except json.JSONDecodeError:
+                continue
+            if isinstance(emb, list) and emb:
+                dimension = len(emb)
+                break
+        else:
+            return [], np.empty((0, 0), dtype=np.float32)
+
+    rows, matrix = _embedding_matrix(results, dimension)
+    return [results[row]["uid"] for row in rows], matrix
+
+
+def score_results(
+    results: list[dict],
+    query_embedding: list[float],
+    projection: str = DEFAULT_PROJECTION,
+    include_embeddings: Optional[bool] = None,
+) -> list[dict]:
+    """
+    Adds the cosine similarity to the query embedding to every result, then
+    drops the embeddings unless the caller asked for them.
+
+    All candidates are scored with one matrix-vector product; results without
+    a usable embedding get a cosine_similarity of None.
+
+    Args:
+        results: Contracts returned by a vector_search_query
+        query_embedding: The embedding the search was made with
+        projection: The projection the caller asked for
+        include_embeddings: Whether to keep the embeddings in the results;
+            defaults to whether the projection selects them
+
+    Returns:
+        The same results, annotated in place with cosine_similarity
+    """
+    if include_embeddings is None:
+        include_embeddings = includes_field(projection, EMBEDDINGS_FIELD)
+
+    query_vec = np.asarray(query_embedding, dtype=np.float32)
+    query_norm = float(np.linalg.norm(query_vec))
+    rows, vectors = _embedding_matrix(results, query_vec.shape[0])
+
+    for result in results:
+        result["cosine_similarity"] = None
+
+    if rows:
+        norms = np.linalg.norm(vectors, axis=1) * query_norm
+        dots = vectors @ query_vec
+        scores = np.divide(dots, norms, out=np.zeros_like(dots), where=norms > 0)
+        for row, score in zip(rows, scores.tolist()):
+            results[row]["cosine_similarity"] = score
+
+    if not include_embeddings:
+        for result in results:
+            result.pop(EMBEDDINGS_FIELD, None)
+
+    return results
+
+
+def initial_top_k(limit: int, threshold: Optional[float] = None) -> int:
+    """
+    Returns the top-K of the first similar_to round of a vector search
+
+    Without a threshold most candidates are kept, so the first round asks for
+    exactly `limit`; with one it over-fetches right away.
+    """
+    top_k = limit if threshold is None else limit * VECTOR_OVERFETCH_FACTOR
+    return min(max(top_k, 1), max(MAX_VECTOR_TOP_K, limit))
+
+
+def select_vector_results(
+    results: list[dict],
+    limit: int,
+    threshold: Optional[float],
+    top_k: int,
+    filtered: bool = False,
+    previous_count: Optional[int] = None,
+    searchable: Optional[int] = None,
+) -> tuple[list[dict], Optional[int]]:
+    """
+    Keeps the scored candidates of a similar_to round that pass the threshold
+    and decides whether another, larger round is needed
+
+    similar_to returns the nearest neighbours first, so once the weakest
+    candidate of a round scores below the threshold, a larger top-K can only
+    add candidates that fail it too and the search stops early.
+
+    A round returning fewer than top-K candidates does not mean the corpus is
+    exhausted: the query filters the top-K after similar_to, so neighbours
+    without a description (or outside the filters) are dropped, and a larger
+    top-K can make up for them. The search only stops as exhausted once
+    top-K covers every contract with embeddings, or when an unfiltered round
+    brings no candidate beyond those of the previous round.
+
+    Args:
+        results: Candidates annotated by score_results
+        limit: Number of results the caller asked for
+        threshold: Minimum cosine similarity, or None to keep every candidate
+        top_k: The top-K the candidates were fetched with
+        filtered: Whether the round applied structured filters
+        previous_count: Number of candidates the previous round returned,
+            None for the first round
+        searchable: Most candidates the search can return, e.g. the cached
+            number of contracts with embeddings, if known
+
+    Returns:
+        The best `limit` candidates, highest similarity first, and the top-K
+        of the next round, or None when the search is done
+    """
+    scored = [
+        result for result in results if result.get("cosine_similarity") is not None
+    ]
+    if threshold is None:
+        selected = list(results)
+    else:
+        selected = [
+            result for result in scored if result["cosine_similarity"] >= threshold
+        ]
+    selected.sort(
+        key=lambda result: (
+            result.get("cosine_similarity") is None,
+            -(result.get("cosine_similarity") or 0.0),
+        )
+    )
+
+    cap = max(MAX_VECTOR_TOP_K, limit)
+    below_threshold = threshold is not None and any(
+        result["cosine_similarity"] < threshold for result in scored
+    )
+    exhausted = (searchable is not None and top_k >= searchable) or (
+        not filtered and previous_count is not None and len(results) <= previous_count
+    )
+    if len(selected) >= limit or below_threshold or exhausted or top_k >= cap:
+        return selected[:limit], None
+    return selected, min(top_k * VECTOR_OVERFETCH_FACTOR, cap)
+
+
+def hydrate_results(selected: list[dict], contracts: dict[str, dict]) -> list[dict]:
+    """
+    Replaces scored candidates by the full contracts, keeping their order,
+    similarity and (if still present) embeddings
+
+    Args:
+        selected: Candidates returned by select_vector_results
+        contracts: The contracts, keyed by UID
+
+    Returns:
+        The hydrated results; candidates that were not found are dropped
+    """
+    results = []
+    for candidate in selected:
+        contract = contracts.get(candidate.get("uid"))
+        if contract is None:
+            continue
+        result = {**contract, "cosine_similarity": candidate["cosine_similarity"]}
+        if EMBEDDINGS_FIELD in candidate:
+            result[EMBEDDINGS_FIELD] = candidate[EMBEDDINGS_FIELD]
+        results.append(result)
+    return results
@@ -0,0 +1,234 @@
+"""
+Embedding models and the query-embedding cache in front of them.
+
+Models are loaded through a process-wide registry: get_embedding_model()
+returns one shared instance per model name and device, and the model itself
+is only loaded on the first embedding, so code paths that never embed never
+pay for it.
+
+Search queries are embedded on CPU for every request, although the same
+queries come back over and over (the web UI's example chips, retries, the MCP
+tools). CachedEmbeddings normalizes each query and keeps its embedding in an
+LRU cache, so a repeated query skips the model entirely.
+"""
+
+import re
+import threading
+from typing import Any, Optional
+
+import numpy as np
+
+from src.utils.cache import LRUCache
+from src.utils.logger import logger
+
+DEFAULT_EMBEDDING_MODEL = "BAAI/bge-small-en-v1.5"
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normalizes a search query into its cache key
+
+    Lowercases the query and collapses whitespace, so "ERC20  Token" and
+    " erc20 token" share one entry. Punctuation is kept: "c++" and "c", or
+    "erc-20" and "erc 20", are different queries to the model. The
+    normalized query is also the text that is embedded, so the cache key is
+    exactly the model input.
+
+    Args:
+        query: The raw search query
+
+    Returns:
+        The normalized query
+    """
+    return _WHITESPACE.sub(" ", query.lower()).strip()
+
+
+class LazyEmbeddings:
+    """
+    Embedding model that is only loaded on first use.
+    """
+
+    def __init__(
+        self,
+        model_name: str = DEFAULT_EMBEDDING_MODEL,
+        device: str = "cpu",
+        normalize_embeddings: bool = True,
+    ) -> None:
+        self.model_name = model_name
+        self.device = device
+        self.normalize_embeddings = normalize_embeddings
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    @property
+    def model(self) -> Any:
+        """The underlying HuggingFaceEmbeddings, loaded on first access."""
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    # Imported here so that processes that never embed do not
+                    # import the model stack either
+                    from langchain_huggingface import HuggingFaceEmbeddings
+
+                    logger.info(
+                        f"Loading embedding model {self.model_name} on {self.device}"
+                    )
+                    self._model = HuggingFaceEmbeddings(
+                        model_name=self.model_name,
+                        model_kwargs={"device": self.device},
+                        encode_kwargs={
+                            "normalize_embeddings": self.normalize_embeddings
+                        },
+                    )
+        return self._model
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.model.embed_query(text)
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.model.embed_documents(texts)
+
+
+_models: dict[tuple[str, str, bool], LazyEmbeddings] = {}
+_query_embedders: dict[tuple[str, str, bool], "CachedEmbeddings"] = {}
+_registry_lock = threading.Lock()
+
+
+def get_embedding_model(
+    model_name: str = DEFAULT_EMBEDDING_MODEL,
+    device: str = "cpu",
+    normalize_embeddings: bool = True,
+) -> LazyEmbeddings:
+    """
+    Returns the process-wide instance of an embedding model
+
+    Args:
+        model_name: HuggingFace model name
+        device: Device the model runs on
+        normalize_embeddings: Whether embeddings are L2-normalized
+
+    Returns:
+        The shared, lazily loaded model
+    """
+    key = (model_name, device, normalize_embeddings)
+    with _registry_lock:
+        model = _models.get(key)
+        if model is None:
+            model = _models[key] = LazyEmbeddings(*key)
+        return model
+
+
+def get_query_embedder(
+    model_name: str = DEFAULT_EMBEDDING_MODEL,
+    device: str = "cpu",
+    normalize_embeddings: bool = True,
+) -> "CachedEmbeddings":
+    """
+    Returns the process-wide query-embedding cache over an embedding model
+
+    Args:
+        model_name: HuggingFace model name
+        device: Device the model runs on
+        normalize_embeddings: Whether embeddings are L2-normalized
+
+    Returns:
+        The shared CachedEmbeddings wrapping get_embedding_model()
+    """
+    key = (model_name, device, normalize_embeddings)
+    model = get_embedding_model(*key)
+    with _registry_lock:
+        embedder = _query_embedders.get(key)
+        if embedder is None:
+            embedder = _query_embedders[key] = CachedEmbeddings(model)
+        return embedder
+
+
+class CachedEmbeddings:
+    """
+    Wraps an embedding model with a cache of query embeddings.
+
+    embed_query is served from the cache when possible; embed_documents is
+    passed through unchanged, since documents are embedded once by the batch
+    tasks.
+    """
+
+    def __init__(
+        self,
+        model: Any,
+        max_entries: int = 1024,
+        max_bytes: Optional[int] = 16 * 1024 * 1024,
+        ttl_seconds: Optional[float] = 3600.0,
+    ) -> None:
+        """
+        Args:
+            model: The embedding model, e.g. HuggingFaceEmbeddings
+            max_entries: Maximum number of cached queries
+            max_bytes: Maximum memory taken by the cached vectors
+            ttl_seconds: How long a cached embedding stays valid
+        """
+        self.model = model
+        self.logger = logger.getChild("CachedEmbeddings")
+        self.cache = LRUCache(
+            max_entries=max_entries,
+            max_bytes=max_bytes,
+            ttl_seconds=ttl_seconds,
+            sizeof=lambda vector: vector.nbytes,
+        )
+
+    def cached_query(self, query: str) -> Optional[list[float]]:
+        """
+        Returns the cached embedding of a query without running the model
+
+        Args:
+            query: The raw search query
+
+        Returns:
+            The embedding, or None on a cache miss
+        """
+        vector = self.cache.get(normalize_query(query))
+        return vector.tolist() if vector is not None else None
+
+    def embed_query(self, query: str) -> list[float]:
+        """
+        Embeds a search query, using the cache when possible
+
+        Args:
+            query: The raw search query
+
+        Returns:
+            The query embedding
+        """
+        embedding = self.cached_query(query)
+        if embedding is not None:
+            return embedding
+        return self.compute_query(query)
+
+    def compute_query(self, query: str) -> list[float]:
+        """
+        Runs the model on a query and caches the result, skipping the lookup
+
+        Args:
+            query: The raw search query
+
+        Returns:
+            The query embedding
+        """
+        query = normalize_query(query)
+        embedding = self.model.embed_query(query)
+        self.cache.put(query, np.asarray(embedding, dtype=np.float32))
+        return embedding
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.model.embed_documents(texts)
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Returns the hit/miss counters of the query cache
+        """
+        return self.cache.stats()
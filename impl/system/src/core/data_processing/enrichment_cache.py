@@ -0,0 +1,125 @@
+"""
+Persistent cache of LLM enrichment outputs.
+
+An enrichment only depends on the contract source, the prompt and the model,
+so its parsed JSON output is stored in SQLite keyed by (normalized source
+hash, prompt template hash, model). Re-runs, crashed jobs and re-deployments
+of a known source reuse the stored answer; changing the prompt or the model
+changes the key, so only that triggers new LLM calls.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Optional
+
+from src.utils.logger import logger
+
+# Shared by every enrichment run, so resolved against the project root rather
+# than the working directory it was started from
+DEFAULT_ENRICHMENT_CACHE = os.path.normpath(
+    os.path.join(
+        os.path.dirname(__file__),
+        "..",
+        "..",
+        "..",
+        "data",
+        "cache",
+        "enrichments.sqlite3",
+    )
+)
+
+
+def prompt_hash(template: str) -> str:
+    """Returns the hash identifying a prompt template in cache keys."""
+    return hashlib.sha256(template.encode()).hexdigest()[:16]
+
+
+class EnrichmentCache:
+    """
+    SQLite store of parsed enrichment outputs, safe to share between threads
+    and processes
+    """
+
+    def __init__(self, path: str = DEFAULT_ENRICHMENT_CACHE) -> None:
+        """
+        Args:
+            path: Path of the SQLite database, created if missing
+        """
+        self.logger = logger.getChild("EnrichmentCache")
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._connection:
+            # WAL lets concurrent enrichment jobs read while one writes
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS enrichments (
+                    source_hash TEXT NOT NULL,
+                    prompt_hash TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    output TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (source_hash, prompt_hash, model)
+                )
+                """
+            )
+        self.hits = 0
+        self.misses = 0
+
+    def get(
+        self, source_hash: str, prompt_hash: str, model: str
+    ) -> Optional[dict[str, Any]]:
+        """
+        Looks up a stored enrichment
+
+        Returns:
+            The parsed LLM output, or None on a miss
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT output FROM enrichments"
+                " WHERE source_hash = ? AND prompt_hash = ? AND model = ?",
+                (source_hash, prompt_hash, model),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(
+        self, source_hash: str, prompt_hash: str, model: str, output: dict[str, Any]
+    ) -> None:
+        """
+        Stores the parsed LLM output of a source, replacing a previous one
+        """
+        try:
+            with self._lock, self._connection:
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO enrichments VALUES (?, ?, ?, ?, ?)",
+                    (source_hash, prompt_hash, model, json.dumps(output), time.time()),
+                )
+        except sqlite3.Error as e:
+            # The enrichment itself succeeded, only its reuse is lost
+            self.logger.warning(f"Failed to store enrichment of {source_hash}: {e}")
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Returns the hit/miss counters and the number of stored enrichments
+        """
+        with self._lock:
+            (entries,) = self._connection.execute(
+                "SELECT COUNT(*) FROM enrichments"
+            ).fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": entries}
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,283 @@
+"""
+Local journal of enrichment jobs.
+
+Every contract sent to the LLM is recorded in SQLite with its number of
+attempts, its status and its last error. A contract that keeps failing is
+dead-lettered after max_attempts and skipped by later runs, instead of being
+fetched and billed again forever. Every run also checkpoints its UID cursor,
+so a crashed run resumes after the last page that was fully settled.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Iterable, Optional
+
+from src.utils.logger import logger
+
+# Resumed runs must find the journal of the crashed one, so it is resolved
+# against the project root rather than the working directory
+DEFAULT_ENRICHMENT_JOURNAL = os.path.normpath(
+    os.path.join(
+        os.path.dirname(__file__),
+        "..",
+        "..",
+        "..",
+        "data",
+        "cache",
+        "enrichment_journal.sqlite3",
+    )
+)
+
+ATTEMPTED = "attempted"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+DEAD = "dead"
+
+# Stays below the SQLite limit of bound variables
+_CHUNK_SIZE = 500
+
+
+def _chunks(uids: list[str]) -> Iterable[list[str]]:
+    for start in range(0, len(uids), _CHUNK_SIZE):
+        yield uids[start : start + _CHUNK_SIZE]
+
+
+class EnrichmentJournal:
+    """
+    SQLite journal of enrichment attempts and runs, safe to share between
+    threads
+    """
+
+    def __init__(
+        self, path: str = DEFAULT_ENRICHMENT_JOURNAL, max_attempts: int = 3
+    ) -> None:
+        """
+        Args:
+            path: Path of the SQLite database, created if missing
+            max_attempts: Failed attempts after which a contract is
+                dead-lettered
+        """
+        self.logger = logger.getChild("EnrichmentJournal")
+        self.path = path
+        self.max_attempts = max_attempts
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    uid TEXT PRIMARY KEY,
+                    run_id INTEGER NOT NULL,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    last_error TEXT,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status)"
+            )
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS runs (
+                    run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    mode TEXT NOT NULL,
+                    cursor TEXT,
+                    started_at REAL NOT NULL,
+                    finished_at REAL
+                )
+                """
+            )
+
+    def start_run(self, mode: str) -> tuple[int, Optional[str]]:
+        """
+        Resumes the unfinished run of a mode, or starts a new one
+
+        Args:
+            mode: The kind of run, runs of different modes never resume
+                each other
+
+        Returns:
+            The run ID and the UID cursor to resume after, None to start
+            from the beginning
+        """
+        with self._lock, self._connection:
+            row = self._connection.execute(
+                "SELECT run_id, cursor FROM runs WHERE mode = ? AND finished_at IS NULL"
+                " ORDER BY run_id DESC LIMIT 1",
+                (mode,),
+            ).fetchone()
+            if row is not None:
+                self.logger.info(
+                    f"Resuming {mode} run {row[0]} after UID {row[1] or '(start)'}"
+                )
+                return row[0], row[1]
+            run_id = self._connection.execute(
+                "INSERT INTO runs (mode, started_at) VALUES (?, ?)",
+                (mode, time.time()),
+            ).lastrowid
+        self.logger.info(f"Starting {mode} run {run_id}")
+        return run_id, None
+
+    def checkpoint(self, run_id: int, cursor: str) -> None:
+        """Records that every contract up to the cursor UID is settled."""
+        with self._lock, self._connection:
+            self._connection.execute(
+                "UPDATE runs SET cursor = ? WHERE run_id = ?", (cursor, run_id)
+            )
+
+    def finish_run(self, run_id: int) -> None:
+        """Marks a run as complete, so the next one starts over."""
+        with self._lock, self._connection:
+            self._connection.execute(
+                "UPDATE runs SET finished_at = ? WHERE run_id = ?",
+                (time.time(), run_id),
+            )
+
+    def skipped(self, run_id: int, uids: Iterable[str]) -> set[str]:
+        """
+        Selects the contracts a run must not send again
+
+        A contract still marked as attempted was never settled: the process
+        died while the LLM call was in flight. Once that happened
+        max_attempts times it is dead-lettered here, since fail() never runs
+        for it.
+
+        Returns:
+            The dead-lettered UIDs, and the ones that already succeeded in
+            this run
+        """
+        uids = list(uids)
+        skipped = set()
+        crashed = []
+        with self._lock, self._connection:
+            for chunk in _chunks(uids):
+                placeholders = ", ".join("?" * len(chunk))
+                interrupted = [
+                    uid
+                    for (uid,) in self._connection.execute(
+                        f"SELECT uid FROM jobs WHERE uid IN ({placeholders})"
+                        " AND status = ? AND attempts >= ?",
+                        (*chunk, ATTEMPTED, self.max_attempts),
+                    )
+                ]
+                self._connection.executemany(
+                    "UPDATE jobs SET status = ?, last_error = ? WHERE uid = ?",
+                    [
+                        (DEAD, "Interrupted while being enriched", uid)
+                        for uid in interrupted
+                    ],
+                )
+                crashed.extend(interrupted)
+                skipped.update(
+                    uid
+                    for (uid,) in self._connection.execute(
+                        f"SELECT uid FROM jobs WHERE uid IN ({placeholders})"
+                        " AND (status = ? OR (status = ? AND run_id = ?))",
+                        (*chunk, DEAD, SUCCEEDED, run_id),
+                    )
+                )
+        for uid in crashed:
+            self.logger.warning(
+                f"Dead-lettered UID {uid} after {self.max_attempts} interrupted attempts"
+            )
+        return skipped
+
+    def attempt(self, run_id: int, uids: Iterable[str]) -> None:
+        """
+        Counts an attempt before the LLM is called, so that a contract that
+        keeps crashing the process is dead-lettered by skipped() as well
+        """
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT INTO jobs (uid, run_id, status, attempts, updated_at)"
+                " VALUES (?, ?, ?, 1, ?) ON CONFLICT (uid) DO UPDATE SET"
+                " run_id = excluded.run_id, status = excluded.status,"
+                " attempts = attempts + 1, updated_at = excluded.updated_at",
+                [(uid, run_id, ATTEMPTED, now) for uid in uids],
+            )
+
+    def succeed(self, run_id: int, uids: Iterable[str]) -> None:
+        """Records stored contracts, including the ones copied from a source."""
+        now = time.time()
+        with self._lock, self._connection:
+            # A later re-enrichment starts with a new series of attempts
+            self._connection.executemany(
+                "INSERT INTO jobs (uid, run_id, status, updated_at)"
+                " VALUES (?, ?, ?, ?) ON CONFLICT (uid) DO UPDATE SET"
+                " run_id = excluded.run_id, status = excluded.status, attempts = 0,"
+                " last_error = NULL, updated_at = excluded.updated_at",
+                [(uid, run_id, SUCCEEDED, now) for uid in uids],
+            )
+
+    def fail(self, run_id: int, uids: Iterable[str], error: str) -> list[str]:
+        """
+        Records a failure, dead-lettering the contracts out of attempts
+
+        Returns:
+            The UIDs dead-lettered by this failure
+        """
+        uids = list(uids)
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT INTO jobs (uid, run_id, status, attempts, last_error, updated_at)"
+                " VALUES (?, ?, ?, 1, ?, ?) ON CONFLICT (uid) DO UPDATE SET"
+                " run_id = excluded.run_id, status = excluded.status,"
+                " last_error = excluded.last_error, updated_at = excluded.updated_at",
+                [(uid, run_id, FAILED, error, now) for uid in uids],
+            )
+            dead = [
+                uid
+                for chunk in _chunks(uids)
+                for (uid,) in self._connection.execute(
+                    f"SELECT uid FROM jobs WHERE uid IN ({', '.join('?' * len(chunk))})"
+                    " AND attempts >= ?",
+                    (*chunk, self.max_attempts),
+                )
+            ]
+            self._connection.executemany(
+                "UPDATE jobs SET status = ? WHERE uid = ?",
+                [(DEAD, uid) for uid in dead],
+            )
+        for uid in dead:
+            self.logger.warning(
+                f"Dead-lettered UID {uid} after {self.max_attempts} attempts: {error}"
+            )
+        return dead
+
+    def requeue_dead(self) -> int:
+        """
+        Gives every dead-lettered contract a new series of attempts
+
+        Returns:
+            Number of contracts requeued
+        """
+        with self._lock, self._connection:
+            return self._connection.execute(
+                "UPDATE jobs SET status = ?, attempts = 0 WHERE status = ?",
+                (FAILED, DEAD),
+            ).rowcount
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Returns the number of contracts per status
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT status, COUNT(*) FROM jobs GROUP BY status"
+            ).fetchall()
+        counts = {status: 0 for status in (ATTEMPTED, SUCCEEDED, FAILED, DEAD)}
+        counts.update(rows)
+        return counts
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
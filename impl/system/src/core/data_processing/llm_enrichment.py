@@ -4,13 +4,23 @@ import asyncio
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import JsonOutputParser
 from langchain.chat_models import init_chat_model
+from typing import AsyncIterator, Optional
 from src.core.data_access.dgraph_client import DgraphClient
+from src.core.data_access.projections import SOURCE_CODE_FIELD
+from src.core.data_processing.enrichment_cache import EnrichmentCache, prompt_hash
+from src.core.data_processing.pipeline import Pipeline, Stage
+from src.core.data_processing.source_dedup import source_hash
 from src.utils.file import write_file
 from src.utils.logger import logger
+from src.utils.rate_limit import RateLimiter
 from src.utils.tokens import num_tokens_from_string
 
 load_dotenv()
 
+# Rough size of the JSON object an enrichment returns, counted against the
+# tokens-per-minute budget along with the prompt
+EXPECTED_OUTPUT_TOKENS = 400
+
 
 class SemanticEnricher:
     """
@@ -18,9 +28,18 @@ class SemanticEnricher:
     """
 
     def __init__(
-        self, model: str = "gpt-4o-mini", model_provider: str = "openai"
+        self,
+        model: str = "gpt-4o-mini",
+        model_provider: str = "openai",
+        cache: Optional[EnrichmentCache] = None,
+        rate_limiter: Optional[RateLimiter] = None,
     ) -> None:
         self.logger = logger.getChild("SemanticEnricher")
+        self.rate_limiter = rate_limiter
+        self.model_name = f"{model_provider}:{model}"
+        # Outputs are reused for sources already enriched with the same
+        # prompt and model
+        self.cache = cache if cache is not None else EnrichmentCache()
 
         # Initialize LLM and parser
         try:
@@ -184,14 +203,36 @@ class SemanticEnricher:
         Data: {contract_data}
       """
         )
+        self.prompt_hash = prompt_hash(self.prompt.messages[0].prompt.template)
+        self.prompt_tokens = num_tokens_from_string(
+            self.prompt.messages[0].prompt.template, "cl100k_base"
+        )
+
+    def estimate_tokens(self, contract_data: dict) -> int:
+        """
+        Estimates the tokens an enrichment call consumes, for rate limiting
+
+        Args:
+          contract_data (dict): The data the prompt is filled with
+
+        Returns:
+          int: Prompt tokens plus the expected output tokens
+        """
+        return (
+            self.prompt_tokens
+            + num_tokens_from_string(str(contract_data), "cl100k_base")
+            + EXPECTED_OUTPUT_TOKENS
+        )
 
-    async def enrich(self, contract_data: str) -> dict:
+    async def enrich(self, contract_data: dict, raise_errors: bool = False) -> dict:
         """
         Asynchronously sends the contract data through the chain consisting of
         the prompt, language model, and output parser
 
         Args:
-          contract_data (str): Raw data for the smart contract
+          contract_data (dict): Raw data for the smart contract
+          raise_errors (bool): Whether to raise a failure instead of returning
+            an empty dict
 
         Returns:
           dict: Parsed JSON response with enrichment details
@@ -201,12 +242,29 @@ class SemanticEnricher:
         self.logger.info("Starting enrichment process...")
         result = {}
         try:
-            # preprocessed_contract = await self.preprocess_llm(contract_data)
-            # result = await chain.ainvoke({"contract_data": preprocessed_contract})
-            result = await chain.ainvoke({"contract_data": contract_data})
+            hashed_source = source_hash(contract_data.get(SOURCE_CODE_FIELD))
+            output = (
+                self.cache.get(hashed_source, self.prompt_hash, self.model_name)
+                if hashed_source
+                else None
+            )
+            if output is None:
+                # preprocessed_contract = await self.preprocess_llm(contract_data)
+                # result = await chain.ainvoke({"contract_data": preprocessed_contract})
+                if self.rate_limiter is not None:
+                    await self.rate_limiter.acquire(self.estimate_tokens(contract_data))
+                output = await chain.ainvoke({"contract_data": contract_data})
+                if hashed_source:
+                    self.cache.put(
+                        hashed_source, self.prompt_hash, self.model_name, output
+                    )
+            else:
+                self.logger.info(
+                    f"Enrichment served from cache for UID: {contract_data['uid']}"
+                )
 
             result = {
-                f"ContractDeployment.{key}": value for key, value in result.items()
+                f"ContractDeployment.{key}": value for key, value in output.items()
             }
             result["uid"] = contract_data["uid"]
             result["id"] = contract_data["ContractDeployment.id"]
@@ -216,9 +274,9 @@ class SemanticEnricher:
             )
         except Exception as e:
             self.logger.error(f"Error during enrichment: {str(e)}")
-            raise
-        finally:
-            return result
+            if raise_errors:
+                raise
+        return result
 
     def preprocess(self, contract: dict) -> dict:
         """
@@ -339,40 +397,99 @@ class SemanticEnricher:
 
 
 class ParallelSemanticEnricher:
-    def __init__(self):
-        self.enricher = SemanticEnricher()
-
-    async def process_contracts(self, contracts):
-        tasks = []
-        for contract in contracts:
-            filtered_contract = {
-                "uid": contract.get("uid"),
-                "ContractDeployment.id": contract.get("ContractDeployment.id"),
-                "ContractDeployment.storage_protocol": contract.get(
-                    "ContractDeployment.storage_protocol"
-                ),
-                "ContractDeployment.storage_address": contract.get(
-                    "ContractDeployment.storage_address"
-                ),
-                "ContractDeployment.experimental": contract.get(
-                    "ContractDeployment.experimental"
-                ),
-                "ContractDeployment.solc_version": contract.get(
-                    "ContractDeployment.solc_version"
-                ),
-                "ContractDeployment.verified_source": contract.get(
-                    "ContractDeployment.verified_source"
-                ),
-                "ContractDeployment.verified_source_code": contract.get(
-                    "ContractDeployment.verified_source_code"
-                ),
-                "ContractDeployment.name": contract.get("ContractDeployment.name"),
-            }
-            tasks.append(self.enricher.enrich(filtered_contract))
-            logger.info(
-                f"Enriching contract with ID: {contract['ContractDeployment.id']}"
-            )
-        return await asyncio.gather(*tasks)
+    """
+    Enriches many contracts concurrently, within a window of max_concurrency
+    LLM calls and the rate limits
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 8,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+    ) -> None:
+        """
+        Args:
+            max_concurrency: Maximum number of enrichments in flight
+            requests_per_minute: LLM request budget; None for no limit
+            tokens_per_minute: LLM token budget, counted on estimated prompt
+                and output tokens; None for no limit
+        """
+        self.max_concurrency = max_concurrency
+        self.rate_limiter = (
+            RateLimiter(requests_per_minute, tokens_per_minute)
+            if requests_per_minute or tokens_per_minute
+            else None
+        )
+        self.enricher = SemanticEnricher(rate_limiter=self.rate_limiter)
+
+    @staticmethod
+    def _llm_input(contract: dict) -> dict:
+        """Selects the fields of a contract the LLM is given."""
+        return {
+            "uid": contract.get("uid"),
+            "ContractDeployment.id": contract.get("ContractDeployment.id"),
+            "ContractDeployment.storage_protocol": contract.get(
+                "ContractDeployment.storage_protocol"
+            ),
+            "ContractDeployment.storage_address": contract.get(
+                "ContractDeployment.storage_address"
+            ),
+            "ContractDeployment.experimental": contract.get(
+                "ContractDeployment.experimental"
+            ),
+            "ContractDeployment.solc_version": contract.get(
+                "ContractDeployment.solc_version"
+            ),
+            "ContractDeployment.verified_source": contract.get(
+                "ContractDeployment.verified_source"
+            ),
+            "ContractDeployment.verified_source_code": contract.get(
+                "ContractDeployment.verified_source_code"
+            ),
+            "ContractDeployment.name": contract.get("ContractDeployment.name"),
+        }
+
+    async def enrich_one(self, contract: dict, raise_errors: bool = False) -> dict:
+        """
+        Enriches a single contract, within the rate limits
+
+        Args:
+            contract: The contract to enrich
+            raise_errors: Whether to raise a failure instead of returning an
+                empty enrichment
+
+        Returns:
+            The enrichment, empty when it failed
+        """
+        logger.info(
+            f"Enriching contract with ID: {contract.get('ContractDeployment.id')}"
+        )
+        return await self.enricher.enrich(self._llm_input(contract), raise_errors)
+
+    async def process_contracts(self, contracts: list[dict]) -> list[dict]:
+        """
+        Enriches contracts with at most max_concurrency calls in flight,
+        through the same pipeline stage as the batch enrichment task
+
+        Returns:
+            The enrichments, in the order of the contracts; empty for the
+            ones that failed
+        """
+        results: list[dict] = [{} for _ in contracts]
+
+        async def enrich(items: list[tuple[int, dict]]) -> None:
+            for position, contract in items:
+                results[position] = await self.enrich_one(contract)
+
+        async def source() -> AsyncIterator[tuple[int, dict]]:
+            for item in enumerate(contracts):
+                yield item
+
+        await Pipeline([Stage("enrich", enrich, workers=self.max_concurrency)]).run(
+            source()
+        )
+        return results
 
 
 if __name__ == "__main__":
@@ -383,7 +500,9 @@ if __name__ == "__main__":
         # with open("./data/retrieved_enriched_contracts.json", "r") as file:
         #   contracts = json.load(file)["allContractDeployments"]
 
-        contracts = dgraph_client.get_contracts(enriched=True)
+        contracts = dgraph_client.get_contracts(
+            enriched=True, projection="enrichment_input"
+        )
 
         parallel_enricher = ParallelSemanticEnricher()
 
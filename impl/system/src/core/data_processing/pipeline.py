@@ -0,0 +1,223 @@
+"""
+Staged asyncio pipeline with bounded queues.
+
+Every stage runs its own workers, so the stages overlap: while one batch of
+items waits on the LLM, the next one is read from Dgraph and the previous one
+is written. The queue in front of every stage is bounded, so a slow stage
+makes the stages before it wait (backpressure) instead of buffering the whole
+input, and the throughput of the pipeline is that of its slowest stage.
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterable, Optional
+
+from src.utils.logger import logger
+
+# Marks the end of a queue; every worker puts it back for its siblings
+_STOP = object()
+
+
+@dataclass
+class StageCounters:
+    """Throughput counters of a stage."""
+
+    name: str
+    workers: int
+    items_in: int = 0
+    items_out: int = 0
+    failed: int = 0
+    batches: int = 0
+    busy_seconds: float = 0.0
+
+    def summary(self, elapsed: float) -> str:
+        rate = self.items_in / elapsed if elapsed > 0 else 0.0
+        # Share of the run the workers spent handling batches
+        utilization = self.busy_seconds / (elapsed * self.workers) if elapsed else 0.0
+        return (
+            f"{self.name}: {self.items_in} in, {self.items_out} out, {self.failed} failed, "
+            f"{self.batches} batches, {rate:.2f} items/s, {utilization:.0%} busy"
+        )
+
+
+@dataclass
+class Stage:
+    """
+    A step of the pipeline
+
+    The handler receives a batch of items and returns the items to pass to
+    the next stage (ignored for the last stage). A batch is handed over once
+    it has batch_size items, or max_wait seconds after its first item, which
+    coalesces small items into larger writes or model calls.
+    """
+
+    name: str
+    handler: Callable[[list[Any]], Awaitable[Optional[Iterable[Any]]]]
+    workers: int = 1
+    batch_size: int = 1
+    max_wait: float = 0.0
+    # Bound of the queue in front of the stage; defaults to two batches per worker
+    queue_size: Optional[int] = None
+    counters: StageCounters = field(init=False)
+
+    def __post_init__(self) -> None:
+        self.counters = StageCounters(self.name, self.workers)
+
+
+async def _next_batch(
+    queue: asyncio.Queue, batch_size: int, max_wait: float
+) -> tuple[list[Any], bool]:
+    """
+    Takes up to batch_size items, waiting at most max_wait after the first one
+
+    Returns:
+        The items and whether the end of the queue was reached
+    """
+    item = await queue.get()
+    if item is _STOP:
+        return [], True
+
+    items = [item]
+    deadline = time.monotonic() + max_wait
+    while len(items) < batch_size:
+        timeout = deadline - time.monotonic()
+        try:
+            item = (
+                queue.get_nowait()
+                if timeout <= 0
+                else await asyncio.wait_for(queue.get(), timeout)
+            )
+        except (asyncio.QueueEmpty, asyncio.TimeoutError):
+            break
+        if item is _STOP:
+            return items, True
+        items.append(item)
+    return items, False
+
+
+class Pipeline:
+    """
+    Runs items from a source through a sequence of stages
+    """
+
+    def __init__(self, stages: list[Stage], report_interval: float = 30.0) -> None:
+        """
+        Args:
+            stages: The stages, in order
+            report_interval: Seconds between progress reports in the log
+        """
+        self.logger = logger.getChild("Pipeline")
+        self.stages = stages
+        self.report_interval = report_interval
+        self.source_counters = StageCounters("source", 1)
+        self._started_at: Optional[float] = None
+
+    async def _worker(
+        self,
+        stage: Stage,
+        inbox: asyncio.Queue,
+        outbox: Optional[asyncio.Queue],
+    ) -> None:
+        counters = stage.counters
+        while True:
+            items, stopped = await _next_batch(inbox, stage.batch_size, stage.max_wait)
+            if items:
+                counters.items_in += len(items)
+                counters.batches += 1
+                start_time = time.monotonic()
+                try:
+                    outputs = list(await stage.handler(items) or ())
+                except Exception as e:
+                    counters.failed += len(items)
+                    self.logger.error(
+                        f"Stage {stage.name} failed on {len(items)} items: {str(e)}"
+                    )
+                    outputs = []
+                counters.busy_seconds += time.monotonic() - start_time
+                counters.items_out += len(outputs)
+                if outbox is not None:
+                    for output in outputs:
+                        # Waits while the next stage is behind
+                        await outbox.put(output)
+            if stopped:
+                await inbox.put(_STOP)
+                return
+
+    async def _feed(self, source: AsyncIterator[Any], queue: asyncio.Queue) -> None:
+        try:
+            async for item in source:
+                self.source_counters.items_out += 1
+                await queue.put(item)
+        finally:
+            await queue.put(_STOP)
+
+    async def _report(self) -> None:
+        while True:
+            await asyncio.sleep(self.report_interval)
+            self.log_counters()
+
+    def log_counters(self) -> None:
+        elapsed = time.monotonic() - (self._started_at or time.monotonic())
+        self.logger.info(
+            f"Pipeline after {elapsed:.0f}s - source: {self.source_counters.items_out} items - "
+            + " | ".join(stage.counters.summary(elapsed) for stage in self.stages)
+        )
+
+    async def run(self, source: AsyncIterator[Any]) -> None:
+        """
+        Feeds the source through the stages until every item went through
+
+        Args:
+            source: The items of the first stage
+        """
+        self._started_at = time.monotonic()
+        queues = [
+            asyncio.Queue(
+                maxsize=stage.queue_size or 2 * stage.workers * stage.batch_size
+            )
+            for stage in self.stages
+        ]
+        reporter = asyncio.create_task(self._report())
+        feeder = asyncio.create_task(self._feed(source, queues[0]))
+        workers = [
+            [
+                asyncio.create_task(
+                    self._worker(
+                        stage,
+                        queues[index],
+                        queues[index + 1] if index + 1 < len(queues) else None,
+                    )
+                )
+                for _ in range(stage.workers)
+            ]
+            for index, stage in enumerate(self.stages)
+        ]
+        try:
+            # A stage ends once its input ended and all its workers exited
+            for index, stage_workers in enumerate(workers):
+                await asyncio.gather(*stage_workers)
+                if index + 1 < len(queues):
+                    await queues[index + 1].put(_STOP)
+            await feeder
+        finally:
+            reporter.cancel()
+            feeder.cancel()
+            for task in (task for stage_workers in workers for task in stage_workers):
+                task.cancel()
+            self.log_counters()
+
+    def stats(self) -> dict[str, dict[str, Any]]:
+        """
+        Returns the counters of every stage
+        """
+        return {
+            stage.name: {
+                "items_in": stage.counters.items_in,
+                "items_out": stage.counters.items_out,
+                "failed": stage.counters.failed,
+                "batches": stage.counters.batches,
+                "busy_seconds": round(stage.counters.busy_seconds, 3),
+            }
+            for stage in self.stages
+        }
@@ -0,0 +1,60 @@
+"""
+Content-addressed grouping of contract deployments by verified source.
+
+Clones, factory children and common tokens deploy byte-identical flattened
+sources. Their enrichment and embeddings only depend on the source, so they
+are computed once per source hash and copied to every sibling deployment.
+"""
+
+import hashlib
+from typing import Optional
+
+from src.core.data_access.projections import SOURCE_CODE_FIELD, SOURCE_HASH_FIELD
+
+# The hash is stored on every enriched contract, so that later batches find
+# the enrichment of a source that was already processed
+SOURCE_HASH_SCHEMA = f"""
+<{SOURCE_HASH_FIELD}>: string @index(exact) .
+"""
+
+
+def normalize_source(source_code: str) -> str:
+    """
+    Normalizes the formatting differences that do not change a source
+
+    Line endings are unified and trailing whitespace is removed from every
+    line and from both ends of the source.
+    """
+    lines = source_code.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    return "\n".join(line.rstrip() for line in lines).strip()
+
+
+def source_hash(source_code: Optional[str]) -> Optional[str]:
+    """
+    Returns the SHA-256 of the normalized source, or None without a source
+    """
+    if not source_code:
+        return None
+    return hashlib.sha256(normalize_source(source_code).encode()).hexdigest()
+
+
+def group_by_source(contracts: list[dict]) -> list[tuple[Optional[str], list[dict]]]:
+    """
+    Groups contracts by the hash of their verified source
+
+    Args:
+        contracts: Contracts with a uid and their verified source code
+
+    Returns:
+        (source hash, contracts) pairs in the order the sources first
+        appear; every contract without source code is a group of its own,
+        with a hash of None
+    """
+    groups: dict[str, list[dict]] = {}
+    for contract in contracts:
+        key = source_hash(contract.get(SOURCE_CODE_FIELD))
+        groups.setdefault(key or f"uid:{contract.get('uid')}", []).append(contract)
+    return [
+        (None if key.startswith("uid:") else key, members)
+        for key, members in groups.items()
+    ]
@@ -0,0 +1,257 @@
+"""
+In-process BM25 index over the enriched contract metadata.
+
+The index ranks contracts with BM25F: the term frequencies of every field are
+length-normalized per field, weighted by the field's boost and summed before
+the BM25 saturation is applied, so a term in the standards list can count for
+more than the same term deep in a description. Contracts can be added,
+replaced and removed one at a time, so the index follows enrichment writes
+without being rebuilt.
+"""
+
+import heapq
+import math
+import re
+import threading
+import time
+from typing import Any, Iterable, Optional
+
+from src.utils.logger import logger
+
+DEFAULT_FIELD_BOOSTS = {
+    "ContractDeployment.description": 1.0,
+    "ContractDeployment.application_domain": 2.0,
+    "ContractDeployment.security_risks_description": 0.5,
+    "ContractDeployment.standards": 3.0,
+    "ContractDeployment.patterns": 2.0,
+    "ContractDeployment.functionalities": 2.0,
+}
+
+# Tag-like fields (e.g. "erc-4626", "defi_lending") are also indexed with
+# their separators removed, so "ERC4626" finds them as well as "ERC 4626"
+TAG_FIELDS = frozenset(
+    {
+        "ContractDeployment.application_domain",
+        "ContractDeployment.standards",
+        "ContractDeployment.patterns",
+        "ContractDeployment.functionalities",
+    }
+)
+
+# Terms too common in descriptions to be worth a posting list
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the "
+    "this to was which with".split()
+)
+
+_TOKEN_SEPARATOR = re.compile(r"[^a-z0-9]+")
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    Splits text into lowercase alphanumeric terms, without stopwords
+
+    Args:
+        text: Free text, a query or a tag
+
+    Returns:
+        The terms, in order and with repetitions
+    """
+    return [
+        term
+        for term in _TOKEN_SEPARATOR.split(text.lower())
+        if term and term not in STOPWORDS
+    ]
+
+
+def _field_terms(field: str, value: Any) -> list[str]:
+    """Returns the terms of a field value, which may be a string or a list."""
+    values = value if isinstance(value, list) else [value]
+    terms = []
+    for item in values:
+        if not isinstance(item, str):
+            continue
+        item_terms = tokenize(item)
+        terms.extend(item_terms)
+        if field in TAG_FIELDS and len(item_terms) > 1:
+            terms.append("".join(item_terms))
+    return terms
+
+
+class BM25Index:
+    """
+    Thread-safe BM25F inverted index of contracts, keyed by uid
+    """
+
+    def __init__(
+        self,
+        field_boosts: Optional[dict[str, float]] = None,
+        k1: float = 1.2,
+        b: float = 0.75,
+    ) -> None:
+        """
+        Args:
+            field_boosts: Weight of every indexed field; fields without a
+                boost are not indexed
+            k1: Term frequency saturation
+            b: Strength of the field length normalization
+        """
+        self.logger = logger.getChild("BM25Index")
+        self.field_boosts = dict(field_boosts or DEFAULT_FIELD_BOOSTS)
+        self.fields = tuple(self.field_boosts)
+        self.k1 = k1
+        self.b = b
+
+        self._lock = threading.Lock()
+        # term -> {doc: per-field term frequencies}
+        self._postings: dict[str, dict[int, tuple[int, ...]]] = {}
+        self._doc_ids: dict[str, int] = {}
+        self._uids: list[Optional[str]] = []
+        self._doc_lengths: list[Optional[tuple[int, ...]]] = []
+        self._doc_terms: list[Optional[tuple[str, ...]]] = []
+        # Slots of removed contracts, reused by the next upserts so that a
+        # stream of updates does not grow the per-document lists
+        self._free_docs: list[int] = []
+        self._length_totals = [0] * len(self.fields)
+
+        # Set once the index holds the whole corpus
+        self.ready = False
+        self.built_at: Optional[float] = None
+        self.searches = 0
+
+    def __len__(self) -> int:
+        return len(self._doc_ids)
+
+    def __contains__(self, uid: str) -> bool:
+        return uid in self._doc_ids
+
+    def upsert(self, contract: dict) -> None:
+        """
+        Indexes a contract, replacing its previous version
+
+        Args:
+            contract: Contract with a uid and (some of) the indexed fields
+        """
+        uid = contract.get("uid")
+        if not uid:
+            return
+
+        frequencies: dict[str, list[int]] = {}
+        lengths = []
+        for position, field in enumerate(self.fields):
+            terms = _field_terms(field, contract.get(field))
+            lengths.append(len(terms))
+            for term in terms:
+                counts = frequencies.setdefault(term, [0] * len(self.fields))
+                counts[position] += 1
+
+        with self._lock:
+            self._remove(uid)
+            if not frequencies:
+                return
+            if self._free_docs:
+                doc = self._free_docs.pop()
+                self._uids[doc] = uid
+                self._doc_lengths[doc] = tuple(lengths)
+                self._doc_terms[doc] = tuple(frequencies)
+            else:
+                doc = len(self._uids)
+                self._uids.append(uid)
+                self._doc_lengths.append(tuple(lengths))
+                self._doc_terms.append(tuple(frequencies))
+            self._doc_ids[uid] = doc
+            for position, length in enumerate(lengths):
+                self._length_totals[position] += length
+            for term, counts in frequencies.items():
+                self._postings.setdefault(term, {})[doc] = tuple(counts)
+
+    def upsert_many(self, contracts: Iterable[dict]) -> None:
+        for contract in contracts:
+            self.upsert(contract)
+
+    def remove(self, uid: str) -> None:
+        """Drops a contract from the index, if present."""
+        with self._lock:
+            self._remove(uid)
+
+    def _remove(self, uid: str) -> None:
+        doc = self._doc_ids.pop(uid, None)
+        if doc is None:
+            return
+        for term in self._doc_terms[doc]:
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            postings.pop(doc, None)
+            if not postings:
+                del self._postings[term]
+        for position, length in enumerate(self._doc_lengths[doc]):
+            self._length_totals[position] -= length
+        self._uids[doc] = None
+        self._doc_lengths[doc] = None
+        self._doc_terms[doc] = None
+        self._free_docs.append(doc)
+
+    def search(self, query: str, limit: int = 10) -> list[tuple[str, float]]:
+        """
+        Ranks the indexed contracts against a query
+
+        Args:
+            query: Free text query
+            limit: Maximum number of results
+
+        Returns:
+            (uid, score) pairs, best first
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        with self._lock:
+            self.searches += 1
+            documents = len(self._doc_ids)
+            if not terms or not documents:
+                return []
+
+            average_lengths = [
+                total / documents if total else 1.0 for total in self._length_totals
+            ]
+            boosts = [self.field_boosts[field] for field in self.fields]
+            scores: dict[int, float] = {}
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(
+                    1 + (documents - len(postings) + 0.5) / (len(postings) + 0.5)
+                )
+                for doc, counts in postings.items():
+                    lengths = self._doc_lengths[doc]
+                    weighted = 0.0
+                    for position, count in enumerate(counts):
+                        if count:
+                            norm = (
+                                1
+                                - self.b
+                                + self.b
+                                * (lengths[position] / average_lengths[position])
+                            )
+                            weighted += boosts[position] * count / norm
+                    scores[doc] = scores.get(doc, 0.0) + idf * weighted * (
+                        self.k1 + 1
+                    ) / (weighted + self.k1)
+
+            best = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+            return [(self._uids[doc], score) for doc, score in best]
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Returns the size of the index and whether it is ready
+        """
+        with self._lock:
+            return {
+                "ready": self.ready,
+                "documents": len(self._doc_ids),
+                "terms": len(self._postings),
+                "searches": self.searches,
+                "age_seconds": (
+                    time.time() - self.built_at if self.built_at is not None else None
+                ),
+            }
@@ -0,0 +1,195 @@
+"""
+Flat-file snapshot of the searchable embeddings, memory-mapped by the servers.
+
+Every snapshot is written to its own version directory under the snapshot
+directory, holding:
+
+- embeddings.npy: the L2-normalized float32 vectors, one row per contract;
+- uids.npy: the contract UIDs as uint64, in ascending order, row for row;
+- manifest.json: the row count, the dimension, when the snapshot was taken
+  and the size the invalidation log had then.
+
+The CURRENT file names the latest complete version and is replaced atomically
+once its files are written, so a reader never pairs the manifest of one
+snapshot with the arrays of another.
+
+Every process maps the .npy files read-only, so all the API and MCP workers
+of a host share one copy of the vectors in the page cache, and none decodes
+JSON vectors at startup. Writes made after the snapshot are caught up from
+the invalidation log, starting at the recorded offset.
+"""
+
+import json
+import os
+import shutil
+import time
+from typing import Any, Optional
+
+import numpy as np
+
+from src.core.data_retrieval.vector_index import (
+    SnapshotVectorIndex,
+    normalize_vectors,
+)
+from src.utils.logger import logger
+
+# Written by a task and read by the servers, so resolved against the project
+# root rather than the working directory each one was started from
+DEFAULT_SNAPSHOT_DIR = os.path.normpath(
+    os.path.join(
+        os.path.dirname(__file__), "..", "..", "..", "data", "embedding_snapshot"
+    )
+)
+
+VECTORS_FILE = "embeddings.npy"
+UIDS_FILE = "uids.npy"
+MANIFEST_FILE = "manifest.json"
+CURRENT_FILE = "CURRENT"
+VERSIONS_DIR = "versions"
+
+# Versions kept besides the current one, for processes still mapping them
+KEEP_PREVIOUS_VERSIONS = 1
+
+
+async def load_embeddings(
+    client: Any, page_size: int = 1000
+) -> tuple[list[str], np.ndarray]:
+    """
+    Reads every searchable embedding, as the API builds its vector index
+
+    Args:
+        client: The AsyncDgraphClient to scan with
+        page_size: Number of contracts per page of the scan
+
+    Returns:
+        The UIDs and their embeddings, one row per UID
+    """
+    uids: list[str] = []
+    blocks: list[np.ndarray] = []
+    async for page_uids, vectors in client.iter_searchable_embeddings(page_size):
+        uids.extend(page_uids)
+        blocks.append(vectors)
+
+    if not blocks:
+        return [], np.empty((0, 0), dtype=np.float32)
+    return uids, np.concatenate(blocks)
+
+
+def _write(path: str, write) -> None:
+    with open(path, "wb") as file:
+        write(file)
+        file.flush()
+        os.fsync(file.fileno())
+
+
+def current_version(directory: str = DEFAULT_SNAPSHOT_DIR) -> Optional[str]:
+    """Returns the path of the current snapshot version, or None if there is none."""
+    try:
+        with open(os.path.join(directory, CURRENT_FILE), "r") as file:
+            name = file.read().strip()
+    except FileNotFoundError:
+        return None
+    return os.path.join(directory, VERSIONS_DIR, name) if name else None
+
+
+def _prune_versions(directory: str, current: str) -> None:
+    """Deletes the versions older than the current one and the ones kept."""
+    versions_dir = os.path.join(directory, VERSIONS_DIR)
+    # Names are nanosecond timestamps of the same width, so they sort by age
+    older = sorted(name for name in os.listdir(versions_dir) if name < current)
+    for name in older[: max(len(older) - KEEP_PREVIOUS_VERSIONS, 0)]:
+        # Mappings of the deleted files stay valid until they are closed
+        shutil.rmtree(os.path.join(versions_dir, name), ignore_errors=True)
+
+
+def write_snapshot(
+    uids: list[str],
+    vectors: np.ndarray,
+    directory: str = DEFAULT_SNAPSHOT_DIR,
+    invalidation_log_offset: int = 0,
+) -> dict[str, Any]:
+    """
+    Writes a snapshot of the embeddings, replacing the previous one
+
+    The snapshot is written to a new version directory, then CURRENT is
+    renamed into place to point at it; processes that mapped the previous
+    version keep reading it.
+
+    Args:
+        uids: The contract UIDs ("0x..." strings)
+        vectors: Their embeddings, one row per uid
+        directory: The snapshot directory
+        invalidation_log_offset: Size of the invalidation log before the
+            embeddings were read
+
+    Returns:
+        The manifest
+    """
+    values = np.array([int(uid, 16) for uid in uids], dtype=np.uint64)
+    order = np.argsort(values, kind="stable")
+    vectors = normalize_vectors(vectors)[order]
+    values = values[order]
+
+    manifest = {
+        "count": len(values),
+        "dimension": int(vectors.shape[1]) if vectors.ndim == 2 else 0,
+        "created_at": time.time(),
+        "invalidation_log_offset": invalidation_log_offset,
+    }
+
+    version = f"{time.time_ns():020d}"
+    version_dir = os.path.join(directory, VERSIONS_DIR, version)
+    os.makedirs(version_dir)
+    _write(os.path.join(version_dir, VECTORS_FILE), lambda file: np.save(file, vectors))
+    _write(os.path.join(version_dir, UIDS_FILE), lambda file: np.save(file, values))
+    _write(
+        os.path.join(version_dir, MANIFEST_FILE),
+        lambda file: file.write(json.dumps(manifest).encode()),
+    )
+
+    current = os.path.join(directory, CURRENT_FILE)
+    _write(f"{current}.tmp", lambda file: file.write(version.encode()))
+    os.replace(f"{current}.tmp", current)
+    _prune_versions(directory, version)
+    return manifest
+
+
+def load_snapshot(
+    directory: str = DEFAULT_SNAPSHOT_DIR,
+) -> Optional[tuple[SnapshotVectorIndex, dict[str, Any]]]:
+    """
+    Memory-maps a snapshot into a vector index
+
+    Args:
+        directory: The snapshot directory
+
+    Returns:
+        The ready index and the manifest, or None when there is no usable
+        snapshot
+    """
+    try:
+        version_dir = current_version(directory)
+        if version_dir is None:
+            return None
+        with open(os.path.join(version_dir, MANIFEST_FILE), "r") as file:
+            manifest = json.load(file)
+        vectors = np.load(os.path.join(version_dir, VECTORS_FILE), mmap_mode="r")
+        uids = np.load(os.path.join(version_dir, UIDS_FILE), mmap_mode="r")
+    except (OSError, ValueError) as e:
+        logger.warning(f"Failed to map the embedding snapshot: {e}")
+        return None
+
+    if (
+        not manifest.get("count")
+        or vectors.shape != (manifest["count"], manifest.get("dimension"))
+        or uids.shape != (manifest["count"],)
+    ):
+        logger.warning(
+            f"Embedding snapshot in {version_dir} is empty or does not match its manifest, ignoring it"
+        )
+        return None
+
+    index = SnapshotVectorIndex(uids, vectors)
+    index.ready = True
+    index.built_at = manifest["created_at"]
+    return index, manifest
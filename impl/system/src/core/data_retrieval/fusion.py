@@ -0,0 +1,59 @@
+"""
+Rank fusion of the result lists of several retrievers.
+"""
+
+from typing import Optional
+
+# Standard RRF damping constant; larger values flatten the contribution of
+# the top ranks
+DEFAULT_RRF_K = 60
+
+
+def reciprocal_rank_fusion(
+    result_lists: dict[str, list[dict]],
+    k: int = DEFAULT_RRF_K,
+    weights: Optional[dict[str, float]] = None,
+) -> list[dict]:
+    """
+    Merges ranked result lists with (weighted) reciprocal rank fusion
+
+    Every contract scores sum(weight / (k + rank)) over the lists it appears
+    in, so contracts ranked well by several retrievers come first. Results are
+    deduplicated by uid; the first list a contract appears in provides its
+    fields, and fields missing there are filled in from the other lists.
+
+    Args:
+        result_lists: Ranked results keyed by retriever name
+        k: RRF damping constant
+        weights: Per-retriever weights, 1.0 when absent
+
+    Returns:
+        The fused results, best first, each with a fused_score and the
+        1-based rank it had in each retriever (ranks)
+    """
+    weights = weights or {}
+    fused: dict[str, dict] = {}
+
+    for name, results in result_lists.items():
+        weight = weights.get(name, 1.0)
+        for rank, result in enumerate(results, start=1):
+            uid = result.get("uid")
+            if not uid:
+                continue
+
+            entry = fused.get(uid)
+            if entry is None:
+                entry = fused[uid] = {**result, "fused_score": 0.0, "ranks": {}}
+            else:
+                for field, value in result.items():
+                    if entry.get(field) is None:
+                        entry[field] = value
+
+            if name not in entry["ranks"]:
+                entry["ranks"][name] = rank
+                entry["fused_score"] += weight / (k + rank)
+
+    return sorted(
+        fused.values(),
+        key=lambda entry: (-entry["fused_score"], min(entry["ranks"].values())),
+    )
@@ -0,0 +1,167 @@
+"""
+Filter-aware planning of vector searches.
+
+A filtered similar_to query runs the ANN search first and filters the top-K
+afterwards; the rarer the filter, the more rounds of over-fetch it needs
+before enough candidates survive. The planner estimates how many contracts a
+filter set matches from cached per-facet counts and, when that number is
+small, has the search start from the filtered contracts instead and score
+all of them exactly (prefilter). Broad filters keep the ANN search
+(postfilter).
+"""
+
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from src.core.data_access.filters import SearchFilters
+from src.utils.cache import LRUCache
+from src.utils.logger import logger
+
+PREFILTER = "prefilter"
+POSTFILTER = "postfilter"
+
+SEARCHABLE_KEY = ("searchable", None)
+
+# A prefiltered query fetches its whole root group before the other filters
+# apply, so the root may be at most this many times the candidate budget
+ROOT_CANDIDATES_FACTOR = 4
+
+
+@dataclass
+class SearchPlan:
+    """How a filtered vector search is executed."""
+
+    strategy: str
+    # Filter group the prefiltered query is rooted on
+    root: Optional[str] = None
+    estimated_matches: Optional[int] = None
+
+
+class QueryPlanner:
+    """
+    Chooses between prefilter and postfilter execution of filtered searches
+    """
+
+    def __init__(
+        self,
+        max_prefilter_candidates: int = 1000,
+        ttl_seconds: Optional[float] = 600.0,
+        max_entries: int = 4096,
+    ) -> None:
+        """
+        Args:
+            max_prefilter_candidates: Largest estimated number of matching
+                contracts that is still scored exactly
+            ttl_seconds: How long a facet count stays valid; counts only feed
+                estimates, so they are not invalidated on writes
+            max_entries: Maximum number of cached facet counts
+        """
+        self.logger = logger.getChild("QueryPlanner")
+        self.max_prefilter_candidates = max_prefilter_candidates
+        self.counts = LRUCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+        self.plans = {PREFILTER: 0, POSTFILTER: 0}
+
+    @property
+    def max_root_candidates(self) -> int:
+        """Candidate cap of a prefiltered query."""
+        return self.max_prefilter_candidates * ROOT_CANDIDATES_FACTOR
+
+    def missing_facets(self, filters: SearchFilters) -> tuple[list[Any], bool]:
+        """
+        Lists the facets of a filter set whose counts are not cached
+
+        Returns:
+            The facets to count, and whether the number of searchable
+            contracts must be counted too
+        """
+        missing = [
+            facet
+            for facets in filters.groups().values()
+            for facet in facets
+            if self.counts.get(facet) is None
+        ]
+        return missing, self.counts.get(SEARCHABLE_KEY) is None
+
+    def searchable_count(self) -> Optional[int]:
+        """Returns the cached number of contracts with embeddings, if known."""
+        return self.counts.get(SEARCHABLE_KEY)
+
+    def record_counts(
+        self, counts: dict[Any, int], searchable: Optional[int] = None
+    ) -> None:
+        """
+        Caches facet counts read by parse_facet_counts
+        """
+        for facet, count in counts.items():
+            self.counts.put(facet, count)
+        if searchable is not None:
+            self.counts.put(SEARCHABLE_KEY, searchable)
+
+    def estimate(self, filters: SearchFilters) -> tuple[Optional[int], dict[str, int]]:
+        """
+        Estimates how many contracts match a filter set
+
+        A group matches at most the sum of its facets. Groups are assumed to
+        be independent, so the estimate is the searchable contracts times the
+        product of the group selectivities, and never more than the most
+        selective group.
+
+        Returns:
+            The estimate, or None when counts are missing, and the estimated
+            matches of every group
+        """
+        group_counts = {}
+        for group, facets in filters.groups().items():
+            counts = [self.counts.get(facet) for facet in facets]
+            if any(count is None for count in counts):
+                return None, {}
+            group_counts[group] = sum(counts)
+
+        searchable = self.counts.get(SEARCHABLE_KEY)
+        if searchable is None or not group_counts:
+            return None, group_counts
+        if searchable == 0:
+            return 0, group_counts
+
+        estimate = float(searchable)
+        for count in group_counts.values():
+            estimate *= min(count, searchable) / searchable
+        return min(round(estimate), min(group_counts.values())), group_counts
+
+    def plan(self, filters: Optional[SearchFilters]) -> SearchPlan:
+        """
+        Plans a vector search
+
+        Args:
+            filters: The search filters; the facet counts should have been
+                recorded beforehand
+
+        Returns:
+            PREFILTER rooted on the most selective group when few contracts
+            match, POSTFILTER otherwise or when the counts are unknown
+        """
+        if filters is None or filters.is_empty():
+            return SearchPlan(POSTFILTER)
+
+        estimate, group_counts = self.estimate(filters)
+        if estimate is None or estimate > self.max_prefilter_candidates:
+            plan = SearchPlan(POSTFILTER, estimated_matches=estimate)
+        else:
+            # The root fetches its whole group, so it must be small itself
+            root = min(group_counts, key=group_counts.get)
+            if group_counts[root] > self.max_root_candidates:
+                plan = SearchPlan(POSTFILTER, estimated_matches=estimate)
+            else:
+                plan = SearchPlan(PREFILTER, root=root, estimated_matches=estimate)
+
+        self.plans[plan.strategy] += 1
+        self.logger.info(
+            f"Planned {plan.strategy} search: ~{estimate} matching contracts, groups {group_counts}"
+        )
+        return plan
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Returns how often each strategy was chosen and the facet cache counters
+        """
+        return {"plans": dict(self.plans), "facet_counts": self.counts.stats()}
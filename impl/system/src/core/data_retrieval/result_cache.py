@@ -0,0 +1,394 @@
+"""
+Search result cache with write-driven invalidation.
+
+Search results are cached per (endpoint, normalized query, parameters). Writes
+through DgraphClient publish an invalidation to a shared append-only log, so
+the API and MCP processes drop stale results even though the batch tasks run
+in other processes:
+
+- writes that only touch existing contracts without changing what they are
+  searched on invalidate the cached results containing those uids;
+- writes that can change which contracts match a query (new contracts,
+  enrichment fields, embeddings) bump the global generation, which drops
+  every cached result.
+
+Listeners (such as the in-process text index) are told which contracts
+changed, as far as the writer knows them. Every line is tagged with the cache
+that wrote it, which applies its own writes locally and skips them when it
+reads the log back.
+"""
+
+import copy
+import json
+import os
+import secrets
+import threading
+from typing import Any, Callable, Hashable, Iterable, Optional
+
+from src.core.data_access.projections import (
+    EMBEDDINGS_FIELD,
+    ENRICHMENT_FIELDS,
+    SOURCE_CODE_FIELD,
+)
+from src.core.data_processing.embeddings import normalize_query
+from src.utils.cache import LRUCache
+from src.utils.logger import logger
+
+# Shared by every process, so resolved against the project root rather than
+# the working directory each one was started from
+DEFAULT_INVALIDATION_LOG = os.path.normpath(
+    os.path.join(
+        os.path.dirname(__file__),
+        "..",
+        "..",
+        "..",
+        "data",
+        "cache",
+        "search_invalidations.log",
+    )
+)
+
+# Once the log grows past this size a writer truncates it, which readers
+# treat as a global invalidation
+MAX_INVALIDATION_LOG_BYTES = 1024 * 1024
+
+GLOBAL_INVALIDATION = "*"
+# Prefix of the first token of a line, naming the cache that wrote it
+WRITER_PREFIX = "@"
+
+# Predicates the search queries match or filter on
+SEARCHABLE_FIELDS = frozenset(ENRICHMENT_FIELDS) | {
+    EMBEDDINGS_FIELD,
+    SOURCE_CODE_FIELD,
+    "ContractDeployment.verified_source",
+}
+
+
+def invalidation_scope(records: Iterable[dict]) -> Optional[list[str]]:
+    """
+    Works out which cached results a set of written records can affect
+
+    Args:
+        records: The objects of a set mutation
+
+    Returns:
+        The written uids when only results containing them can change, or
+        None when the write can change any result
+    """
+    uids = []
+    for record in records:
+        uid = record.get("uid")
+        if not uid or uid.startswith("_:") or SEARCHABLE_FIELDS.intersection(record):
+            return None
+        uids.append(uid)
+    return uids
+
+
+def written_uids(records: Iterable[dict]) -> list[str]:
+    """
+    Returns the uids of the existing contracts a set mutation writes to
+
+    Args:
+        records: The objects of a set mutation
+
+    Returns:
+        The uids, without the blank nodes of new contracts
+    """
+    return [
+        record["uid"]
+        for record in records
+        if record.get("uid") and not record["uid"].startswith("_:")
+    ]
+
+
+def parse_invalidation(line: str) -> tuple[Optional[str], list[str]]:
+    """
+    Splits a line of the invalidation log
+
+    Returns:
+        The ID of the cache that wrote it (None for untagged lines) and the
+        rest of its tokens
+    """
+    tokens = line.split()
+    if tokens and tokens[0].startswith(WRITER_PREFIX):
+        return tokens[0][len(WRITER_PREFIX) :], tokens[1:]
+    return None, tokens
+
+
+def publish_invalidation(
+    uids: Optional[Iterable[str]] = None,
+    log_path: str = DEFAULT_INVALIDATION_LOG,
+    changed: Optional[Iterable[str]] = None,
+    writer: Optional[str] = None,
+) -> None:
+    """
+    Appends an invalidation to the shared log
+
+    A global invalidation is written as "*", followed by the changed uids
+    when they are known; a scoped one as the list of uids.
+
+    Args:
+        uids: The written contracts, or None to invalidate every cached result
+        log_path: Path of the invalidation log
+        changed: For a global invalidation, the contracts known to have changed
+        writer: ID of the publishing cache, which skips the line when reading
+    """
+    if uids is None:
+        line = " ".join([GLOBAL_INVALIDATION, *(changed or ())])
+    else:
+        line = " ".join(uids)
+    if not line:
+        return
+    if writer:
+        line = f"{WRITER_PREFIX}{writer} {line}"
+
+    try:
+        os.makedirs(os.path.dirname(log_path), exist_ok=True)
+        mode = "a"
+        if (
+            os.path.exists(log_path)
+            and os.path.getsize(log_path) > MAX_INVALIDATION_LOG_BYTES
+        ):
+            # Untagged, so that every reader applies it
+            mode, line = "w", GLOBAL_INVALIDATION
+        with open(log_path, mode) as file:
+            file.write(line + "\n")
+    except OSError as e:
+        logger.warning(f"Failed to publish search cache invalidation: {e}")
+
+
+def invalidation_log_size(log_path: str = DEFAULT_INVALIDATION_LOG) -> int:
+    """Returns the current size of the invalidation log, an offset into it."""
+    try:
+        return os.path.getsize(log_path)
+    except OSError:
+        return 0
+
+
+def changed_since(
+    offset: int, log_path: str = DEFAULT_INVALIDATION_LOG
+) -> Optional[set[str]]:
+    """
+    Collects the contracts changed since a position of the invalidation log
+
+    Args:
+        offset: Size of the log at the earlier point, from invalidation_log_size
+        log_path: Path of the invalidation log
+
+    Returns:
+        The changed uids, or None when some changes are unknown (a global
+        invalidation without uids, or a log truncated in the meantime)
+    """
+    if invalidation_log_size(log_path) < offset:
+        return None
+    try:
+        # The offset counts bytes, which only a binary file can seek to
+        with open(log_path, "rb") as file:
+            file.seek(offset)
+            data = file.read().decode("utf-8", errors="replace")
+    except FileNotFoundError:
+        return set()
+    except OSError as e:
+        logger.warning(f"Failed to read search cache invalidations: {e}")
+        return None
+
+    changed = set()
+    for line in data.splitlines():
+        _, uids = parse_invalidation(line)
+        if uids[:1] == [GLOBAL_INVALIDATION]:
+            if len(uids) == 1:
+                return None
+            uids = uids[1:]
+        changed.update(uids)
+    return changed
+
+
+class SearchResultCache:
+    """
+    LRU cache of search results, kept consistent with the invalidation log
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 512,
+        ttl_seconds: Optional[float] = 300.0,
+        log_path: str = DEFAULT_INVALIDATION_LOG,
+    ) -> None:
+        """
+        Args:
+            max_entries: Maximum number of cached searches
+            ttl_seconds: Upper bound on the age of a cached result
+            log_path: Path of the shared invalidation log
+        """
+        self.logger = logger.getChild("SearchResultCache")
+        self.cache = LRUCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+        self.log_path = log_path
+        # Tags the lines this cache publishes; unique across processes and
+        # across the caches of one process
+        self.writer_id = f"{os.getpid()}-{secrets.token_hex(4)}"
+
+        self._lock = threading.Lock()
+        # Invalidations already published before we started are irrelevant
+        self._log_offset = self._log_size()
+        self.generation = 0
+        # Bumped by every invalidation, global or not, to discard results
+        # of searches that were running while it happened
+        self._epoch = 0
+        self._listeners: list[Callable[[Optional[list[str]]], None]] = []
+
+    @staticmethod
+    def make_key(endpoint: str, query: str, **params: Any) -> Hashable:
+        """
+        Builds the cache key of a search
+
+        Args:
+            endpoint: Name of the search method
+            query: The raw search query
+            params: Every other argument that changes the results
+
+        Returns:
+            A hashable key
+        """
+        return (
+            endpoint,
+            normalize_query(query),
+            json.dumps(params, sort_keys=True, default=str),
+        )
+
+    def epoch(self) -> int:
+        """
+        Returns a token to pass to put(), taken before running the search
+        """
+        self._sync()
+        return self._epoch
+
+    def get(self, key: Hashable) -> Optional[list[dict]]:
+        """
+        Returns a copy of the cached results of a search
+
+        Args:
+            key: Key built by make_key
+
+        Returns:
+            The results, or None on a miss
+        """
+        self._sync()
+        entry = self.cache.get(key)
+        if entry is None:
+            return None
+        results, _ = entry
+        return copy.deepcopy(results)
+
+    def put(self, key: Hashable, results: list[dict], epoch: int) -> None:
+        """
+        Caches the results of a search, unless an invalidation happened
+        while it was running
+
+        Args:
+            key: Key built by make_key
+            results: The search results
+            epoch: Token returned by epoch() before the search started
+        """
+        self._sync()
+        with self._lock:
+            if epoch != self._epoch:
+                return
+            uids = frozenset(result.get("uid") for result in results)
+            self.cache.put(key, (copy.deepcopy(results), uids))
+
+    def add_listener(self, listener: Callable[[Optional[list[str]]], None]) -> None:
+        """
+        Registers a callback run on every invalidation, local or published by
+        another process
+
+        Args:
+            listener: Called with the uids of the changed contracts, or None
+                when they are unknown
+        """
+        self._listeners.append(listener)
+
+    def invalidate(
+        self,
+        uids: Optional[Iterable[str]] = None,
+        changed: Optional[Iterable[str]] = None,
+    ) -> None:
+        """
+        Invalidates cached results locally and in every other process
+
+        Args:
+            uids: The written contracts, or None to drop every cached result
+            changed: For a global invalidation, the contracts known to have
+                changed, passed on to the listeners
+        """
+        uids = list(uids) if uids is not None else None
+        changed = list(changed) if changed is not None else None
+        self._apply(uids, changed)
+        publish_invalidation(uids, self.log_path, changed, self.writer_id)
+
+    def _apply(
+        self, uids: Optional[list[str]], changed: Optional[list[str]] = None
+    ) -> None:
+        with self._lock:
+            self._epoch += 1
+            if uids is None:
+                self.generation += 1
+                self.cache.clear()
+            else:
+                written = set(uids)
+                self.cache.invalidate_where(
+                    lambda entry: not written.isdisjoint(entry[1])
+                )
+
+        changed = uids if uids is not None else changed
+        for listener in self._listeners:
+            try:
+                listener(changed)
+            except Exception as e:
+                self.logger.warning(f"Search cache invalidation listener failed: {e}")
+
+    def _log_size(self) -> int:
+        return invalidation_log_size(self.log_path)
+
+    def _sync(self) -> None:
+        """Applies the invalidations other caches published since the last call."""
+        size = self._log_size()
+        if size == self._log_offset:
+            return
+
+        with self._lock:
+            offset = self._log_offset
+        if size < offset:
+            # The log was truncated, so some invalidations may have been missed
+            self._apply(None)
+            offset = 0
+
+        try:
+            # The offset counts bytes, which only a binary file can seek to
+            with open(self.log_path, "rb") as file:
+                file.seek(offset)
+                data = file.read()
+        except OSError as e:
+            self.logger.warning(f"Failed to read search cache invalidations: {e}")
+            self._apply(None)
+            return
+
+        # Leave a partially written last line for the next call
+        complete = data[: data.rfind(b"\n") + 1]
+        for line in complete.decode("utf-8", errors="replace").splitlines():
+            writer, uids = parse_invalidation(line)
+            if not uids or writer == self.writer_id:
+                # Our own writes were applied when they were published
+                continue
+            if uids[0] == GLOBAL_INVALIDATION:
+                self._apply(None, uids[1:] or None)
+            else:
+                self._apply(uids)
+
+        with self._lock:
+            self._log_offset = offset + len(complete)
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Returns the hit/miss counters and the generation of the cache
+        """
+        return {**self.cache.stats(), "generation": self.generation}
@@ -0,0 +1,521 @@
+"""
+In-memory mirror of the contract embeddings for local nearest-neighbour search.
+
+Interchangeable backends are provided:
+
+- HNSWVectorIndex, an approximate HNSW graph built with hnswlib (installed
+  with chroma-hnswlib), which keeps the float32 vectors in memory along
+  with the graph links;
+- BruteForceVectorIndex, an exact NumPy scan, used when hnswlib is not
+  available and fast enough for corpora of a few hundred thousand
+  contracts; it keeps one float32 matrix of the vectors in memory;
+- SnapshotVectorIndex, an exact scan of a read-only (typically memory-mapped)
+  snapshot of the float32 vectors, paged in by the OS rather than copied;
+  only the vectors changed since the snapshot are held in memory;
+- QuantizedVectorIndex, a scan of int8 codes (with one float32 scale per
+  vector) or of 1-bit codes, whose shortlist is re-ranked with the float32
+  vectors. Only the codes are held in memory, 4 to 32 times less than the
+  float32 vectors; those are kept in a memory-mapped file and only the rows
+  of the shortlist are read.
+
+Every backend scores L2-normalized vectors with the inner product, i.e. the
+cosine similarity, the same score score_results() computes; the quantized
+scan approximates it and its re-ranking computes it exactly.
+"""
+
+import tempfile
+import threading
+import time
+from typing import Any, Optional
+
+import numpy as np
+
+from src.utils.logger import logger
+
+VECTOR_INDEX_BACKENDS = ("auto", "hnsw", "brute_force", "int8", "binary")
+
+# Rows scored per step of a quantized scan, which bounds its temporary arrays
+SCAN_BLOCK_ROWS = 16384
+
+# Number of set bits of every byte value, for Hamming distances on NumPy
+# versions without np.bitwise_count
+_POPCOUNT = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint8)
+_popcount = getattr(np, "bitwise_count", _POPCOUNT.__getitem__)
+
+
+def normalize_vectors(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+
+class BruteForceVectorIndex:
+    """
+    Exact cosine-similarity index over a contiguous float32 matrix
+    """
+
+    backend = "brute_force"
+
+    @property
+    def bytes_per_vector(self) -> int:
+        return self.dimension * 4
+
+    def __init__(self, dimension: int, initial_capacity: int = 1024) -> None:
+        """
+        Args:
+            dimension: Size of the embeddings
+            initial_capacity: Number of rows allocated up front; the matrix
+                doubles when it is full
+        """
+        self.dimension = dimension
+        self._lock = threading.Lock()
+        self._vectors = self._allocate(initial_capacity)
+        self._uids: list[str] = []
+        self._rows: dict[str, int] = {}
+
+        # Set once the index holds the whole corpus
+        self.ready = False
+        self.built_at: Optional[float] = None
+        self.searches = 0
+
+    def __len__(self) -> int:
+        return len(self._uids)
+
+    def __contains__(self, uid: str) -> bool:
+        return uid in self._rows
+
+    def upsert_many(self, uids: list[str], vectors: np.ndarray) -> None:
+        """
+        Adds or replaces the embeddings of contracts
+
+        Args:
+            uids: The contract uids
+            vectors: Their embeddings, one row per uid
+        """
+        vectors = normalize_vectors(vectors).reshape(len(uids), self.dimension)
+        with self._lock:
+            for uid, vector in zip(uids, vectors):
+                row = self._rows.get(uid)
+                if row is None:
+                    row = len(self._uids)
+                    if row == len(self._vectors):
+                        self._grow()
+                    self._uids.append(uid)
+                    self._rows[uid] = row
+                self._store(row, vector)
+
+    def _allocate(self, capacity: int) -> np.ndarray:
+        return np.zeros((capacity, self.dimension), dtype=np.float32)
+
+    def _grow(self) -> None:
+        """Doubles the allocated rows."""
+        self._vectors = np.concatenate([self._vectors, np.zeros_like(self._vectors)])
+
+    def _store(self, row: int, vector: np.ndarray) -> None:
+        self._vectors[row] = vector
+
+    def _move(self, source: int, target: int) -> None:
+        self._vectors[target] = self._vectors[source]
+
+    def remove(self, uid: str) -> None:
+        """Drops a contract, moving the last row into its place."""
+        with self._lock:
+            row = self._rows.pop(uid, None)
+            if row is None:
+                return
+            last = len(self._uids) - 1
+            if row != last:
+                moved = self._uids[last]
+                self._move(last, row)
+                self._uids[row] = moved
+                self._rows[moved] = row
+            self._uids.pop()
+
+    def search(self, query: list[float], k: int) -> list[tuple[str, float]]:
+        """
+        Finds the contracts most similar to a query embedding
+
+        Args:
+            query: The query embedding
+            k: Number of neighbours
+
+        Returns:
+            (uid, cosine similarity) pairs, most similar first
+        """
+        query_vec = normalize_vectors(np.asarray(query, dtype=np.float32))
+        with self._lock:
+            self.searches += 1
+            if k <= 0:
+                return []
+            return self._search(query_vec, k)
+
+    def _search(self, query_vec: np.ndarray, k: int) -> list[tuple[str, float]]:
+        """Exact search of the in-memory rows; the lock must be held."""
+        count = len(self._uids)
+        if not count:
+            return []
+        scores = self._vectors[:count] @ query_vec
+        top = _top_rows(scores, k)
+        return [(self._uids[row], float(scores[row])) for row in top]
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Returns the size of the index and whether it is ready
+        """
+        return {
+            "backend": self.backend,
+            "ready": self.ready,
+            "vectors": len(self),
+            "bytes": len(self) * self.bytes_per_vector,
+            "searches": self.searches,
+            "age_seconds": (
+                time.time() - self.built_at if self.built_at is not None else None
+            ),
+        }
+
+
+class HNSWVectorIndex(BruteForceVectorIndex):
+    """
+    Approximate cosine-similarity index on an hnswlib HNSW graph
+    """
+
+    backend = "hnsw"
+
+    def __init__(
+        self,
+        dimension: int,
+        initial_capacity: int = 1024,
+        m: int = 16,
+        ef_construction: int = 200,
+        ef_search: int = 64,
+    ) -> None:
+        """
+        Args:
+            dimension: Size of the embeddings
+            initial_capacity: Number of elements allocated up front; the graph
+                doubles when it is full
+            m: Number of links per node
+            ef_construction: Candidate list size while inserting
+            ef_search: Minimum candidate list size while searching
+        """
+        import hnswlib
+
+        self.dimension = dimension
+        self.ef_search = ef_search
+        self._lock = threading.Lock()
+        self._graph = hnswlib.Index(space="ip", dim=dimension)
+        self._graph.init_index(
+            max_elements=initial_capacity, M=m, ef_construction=ef_construction
+        )
+        # hnswlib labels are integers; deleted labels are not reused
+        self._labels: dict[str, int] = {}
+        self._uids: dict[int, str] = {}
+        self._next_label = 0
+
+        self.ready = False
+        self.built_at: Optional[float] = None
+        self.searches = 0
+
+    def __len__(self) -> int:
+        return len(self._labels)
+
+    def __contains__(self, uid: str) -> bool:
+        return uid in self._labels
+
+    def upsert_many(self, uids: list[str], vectors: np.ndarray) -> None:
+        vectors = normalize_vectors(vectors).reshape(len(uids), self.dimension)
+        with self._lock:
+            labels = []
+            for uid in uids:
+                label = self._labels.get(uid)
+                if label is None:
+                    label = self._labels[uid] = self._next_label
+                    self._uids[label] = uid
+                    self._next_label += 1
+                labels.append(label)
+
+            capacity = self._graph.get_max_elements()
+            if self._next_label > capacity:
+                self._graph.resize_index(max(self._next_label, capacity * 2))
+            # Existing labels are updated in place
+            self._graph.add_items(vectors, np.asarray(labels, dtype=np.int64))
+
+    def remove(self, uid: str) -> None:
+        with self._lock:
+            label = self._labels.pop(uid, None)
+            if label is None:
+                return
+            del self._uids[label]
+            self._graph.mark_deleted(label)
+
+    def _search(self, query_vec: np.ndarray, k: int) -> list[tuple[str, float]]:
+        k = min(k, len(self._labels))
+        if k <= 0:
+            return []
+        self._graph.set_ef(max(self.ef_search, k))
+        labels, distances = self._graph.knn_query(query_vec, k=k)
+        # The "ip" distance is 1 - inner product
+        return [
+            (self._uids[int(label)], 1.0 - float(distance))
+            for label, distance in zip(labels[0], distances[0])
+        ]
+
+
+class QuantizedVectorIndex(BruteForceVectorIndex):
+    """
+    Cosine-similarity index that scans quantized codes of the vectors and
+    re-ranks a shortlist with the float32 vectors, read from a memory-mapped
+    file
+    """
+
+    def __init__(
+        self,
+        dimension: int,
+        initial_capacity: int = 1024,
+        codes: str = "int8",
+        rerank_factor: Optional[int] = None,
+        vectors_path: Optional[str] = None,
+    ) -> None:
+        """
+        Args:
+            dimension: Size of the embeddings
+            initial_capacity: Number of rows allocated up front; the arrays
+                double when they are full
+            codes: "int8" for a scalar quantization with one scale per
+                vector, scanned with dot products, or "binary" for the sign
+                bits, scanned with Hamming distances
+            rerank_factor: Size of the re-ranked shortlist, in multiples of
+                k; defaults to 4 for int8 and 16 for the coarser binary codes
+            vectors_path: File the float32 vectors are memory-mapped from,
+                overwritten; defaults to an anonymous temporary file
+        """
+        if codes not in ("int8", "binary"):
+            raise ValueError(f"Unknown codes '{codes}'. Expected int8 or binary")
+        # The float32 rows live in the page cache, which the kernel can
+        # evict; only the shortlist rows of a search are read back
+        self._vectors_file = (
+            open(vectors_path, "w+b") if vectors_path else tempfile.TemporaryFile()
+        )
+        super().__init__(dimension, initial_capacity)
+        self.backend = codes
+        self.rerank_factor = rerank_factor or (4 if codes == "int8" else 16)
+        if codes == "int8":
+            self._codes = np.zeros((initial_capacity, dimension), dtype=np.int8)
+            self._scales = np.zeros(initial_capacity, dtype=np.float32)
+        else:
+            self._codes = np.zeros(
+                (initial_capacity, (dimension + 7) // 8), dtype=np.uint8
+            )
+
+    @property
+    def bytes_per_vector(self) -> int:
+        # Only the codes are resident
+        if self.backend == "int8":
+            # The codes and their scale
+            return self.dimension + 4
+        return self._codes.shape[1]
+
+    def _allocate(self, capacity: int) -> np.ndarray:
+        """Extends the vectors file to capacity rows and maps it."""
+        self._vectors_file.truncate(capacity * self.dimension * 4)
+        return np.memmap(
+            self._vectors_file,
+            dtype=np.float32,
+            mode="r+",
+            shape=(capacity, self.dimension),
+        )
+
+    def _grow(self) -> None:
+        # The file keeps the existing rows, so nothing is copied
+        self._vectors = self._allocate(2 * len(self._vectors))
+        self._codes = np.concatenate([self._codes, np.zeros_like(self._codes)])
+        if self.backend == "int8":
+            self._scales = np.concatenate([self._scales, np.zeros_like(self._scales)])
+
+    def _store(self, row: int, vector: np.ndarray) -> None:
+        super()._store(row, vector)
+        if self.backend == "int8":
+            self._codes[row], self._scales[row] = _int8_codes(vector)
+        else:
+            self._codes[row] = np.packbits(vector > 0)
+
+    def _move(self, source: int, target: int) -> None:
+        super()._move(source, target)
+        self._codes[target] = self._codes[source]
+        if self.backend == "int8":
+            self._scales[target] = self._scales[source]
+
+    def _scan(self, query_vec: np.ndarray, count: int) -> np.ndarray:
+        """Returns the approximate scores of the first count rows, higher is closer."""
+        scores = np.empty(count, dtype=np.float32)
+        if self.backend == "int8":
+            # The query is not quantized; a float32 block keeps the BLAS
+            # matrix-vector product, which integer arrays do not have
+            for start in range(0, count, SCAN_BLOCK_ROWS):
+                end = min(start + SCAN_BLOCK_ROWS, count)
+                dots = self._codes[start:end].astype(np.float32) @ query_vec
+                scores[start:end] = dots * self._scales[start:end]
+        else:
+            query_bits = np.packbits(query_vec > 0)
+            for start in range(0, count, SCAN_BLOCK_ROWS):
+                end = min(start + SCAN_BLOCK_ROWS, count)
+                differing = _popcount(self._codes[start:end] ^ query_bits)
+                scores[start:end] = -differing.sum(axis=1, dtype=np.int32)
+        return scores
+
+    def _search(self, query_vec: np.ndarray, k: int) -> list[tuple[str, float]]:
+        count = len(self._uids)
+        if not count:
+            return []
+        shortlist = min(count, k * self.rerank_factor)
+        scores = self._scan(query_vec, count)
+        candidates = np.argpartition(-scores, shortlist - 1)[:shortlist]
+
+        # Exact scores of the shortlist only
+        exact = self._vectors[candidates] @ query_vec
+        return [
+            (self._uids[candidates[position]], float(exact[position]))
+            for position in _top_rows(exact, k)
+        ]
+
+    def stats(self) -> dict[str, Any]:
+        stats = super().stats()
+        stats["rerank_factor"] = self.rerank_factor
+        # Memory-mapped, read only for the shortlists
+        stats["mapped_bytes"] = len(self) * self.dimension * 4
+        return stats
+
+
+class SnapshotVectorIndex(BruteForceVectorIndex):
+    """
+    Exact cosine-similarity index over a read-only snapshot of the vectors
+
+    The snapshot arrays are never written, so a memory-mapped snapshot stays
+    in the page cache shared by every process mapping it. Contracts added or
+    changed afterwards live in the in-memory rows of BruteForceVectorIndex;
+    their snapshot rows, like those of removed contracts, are hidden.
+    """
+
+    backend = "snapshot"
+
+    def __init__(
+        self,
+        uids: np.ndarray,
+        vectors: np.ndarray,
+        initial_capacity: int = 1024,
+    ) -> None:
+        """
+        Args:
+            uids: The UIDs of the snapshot rows as integers, in ascending
+                order
+            vectors: The L2-normalized float32 vectors of the snapshot rows
+            initial_capacity: Number of in-memory rows allocated up front
+        """
+        super().__init__(vectors.shape[1], initial_capacity)
+        self._snapshot_uids = uids
+        self._snapshot_vectors = vectors
+        self._hidden = np.zeros(len(uids), dtype=bool)
+        self._hidden_count = 0
+
+    def _snapshot_row(self, uid: str) -> Optional[int]:
+        value = int(uid, 16)
+        row = int(np.searchsorted(self._snapshot_uids, value))
+        if row < len(self._snapshot_uids) and self._snapshot_uids[row] == value:
+            return row
+        return None
+
+    def _hide(self, uid: str) -> None:
+        row = self._snapshot_row(uid)
+        if row is not None and not self._hidden[row]:
+            self._hidden[row] = True
+            self._hidden_count += 1
+
+    def __len__(self) -> int:
+        return len(self._uids) + len(self._snapshot_uids) - self._hidden_count
+
+    def __contains__(self, uid: str) -> bool:
+        if uid in self._rows:
+            return True
+        row = self._snapshot_row(uid)
+        return row is not None and not self._hidden[row]
+
+    def upsert_many(self, uids: list[str], vectors: np.ndarray) -> None:
+        with self._lock:
+            for uid in uids:
+                self._hide(uid)
+        super().upsert_many(uids, vectors)
+
+    def remove(self, uid: str) -> None:
+        with self._lock:
+            self._hide(uid)
+        super().remove(uid)
+
+    def _search(self, query_vec: np.ndarray, k: int) -> list[tuple[str, float]]:
+        results = super()._search(query_vec, k)
+        if len(self._snapshot_uids):
+            scores = self._snapshot_vectors @ query_vec
+            scores[self._hidden] = -np.inf
+            for row in _top_rows(scores, k):
+                if not self._hidden[row]:
+                    results.append(
+                        (hex(int(self._snapshot_uids[row])), float(scores[row]))
+                    )
+        results.sort(key=lambda result: result[1], reverse=True)
+        return results[:k]
+
+    def stats(self) -> dict[str, Any]:
+        stats = super().stats()
+        stats["snapshot_vectors"] = len(self._snapshot_uids) - self._hidden_count
+        stats["bytes"] = len(self._uids) * self.bytes_per_vector
+        # Mapped from the snapshot files, shared with other processes
+        stats["shared_bytes"] = (
+            self._snapshot_vectors.nbytes + self._snapshot_uids.nbytes
+        )
+        return stats
+
+
+def _top_rows(scores: np.ndarray, k: int) -> np.ndarray:
+    """Returns the rows of the k highest scores, highest first."""
+    k = min(k, len(scores))
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+def _int8_codes(vector: np.ndarray) -> tuple[np.ndarray, float]:
+    """Quantizes a vector to int8 with a scale mapping its largest component to 127."""
+    scale = float(np.abs(vector).max()) / 127
+    if scale == 0:
+        return np.zeros(vector.shape, dtype=np.int8), 0.0
+    return np.round(vector / scale).astype(np.int8), scale
+
+
+def create_vector_index(
+    dimension: int, backend: str = "auto", **kwargs: Any
+) -> BruteForceVectorIndex:
+    """
+    Creates an empty vector index
+
+    Args:
+        dimension: Size of the embeddings
+        backend: "hnsw", "brute_force", "int8" or "binary" (see
+            QuantizedVectorIndex), or "auto" for HNSW when hnswlib is
+            installed and brute force otherwise
+        kwargs: Passed to the index constructor
+
+    Returns:
+        The index
+    """
+    if backend not in VECTOR_INDEX_BACKENDS:
+        raise ValueError(
+            f"Unknown vector index backend '{backend}'. Expected one of: {', '.join(VECTOR_INDEX_BACKENDS)}"
+        )
+    if backend in ("int8", "binary"):
+        return QuantizedVectorIndex(dimension, codes=backend, **kwargs)
+    if backend in ("auto", "hnsw"):
+        try:
+            return HNSWVectorIndex(dimension, **kwargs)
+        except ImportError:
+            if backend == "hnsw":
+                raise
+            logger.info("hnswlib is not installed, using the brute-force vector index")
+    return BruteForceVectorIndex(dimension, **kwargs)
@@ -0,0 +1,92 @@
+import asyncio
+import time
+from typing import Any, Optional
+
+
+class _Bucket:
+    """
+    Token bucket refilled continuously up to a per-minute budget
+
+    The bucket starts empty, so a run starts at the steady rate instead of
+    spending a whole minute of budget in a burst at startup.
+    """
+
+    def __init__(self, per_minute: float) -> None:
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.available = 0.0
+        self.updated_at = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        self.available = min(
+            self.capacity, self.available + (now - self.updated_at) * self.rate
+        )
+        self.updated_at = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until amount is available, after a refill."""
+        return max(0.0, (amount - self.available) / self.rate)
+
+
+class RateLimiter:
+    """
+    Asyncio limiter of requests per minute and tokens per minute, as LLM
+    providers enforce them
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+    ) -> None:
+        """
+        Args:
+            requests_per_minute: Maximum request rate; None for no limit
+            tokens_per_minute: Maximum token rate; None for no limit
+        """
+        self.requests = _Bucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = _Bucket(tokens_per_minute) if tokens_per_minute else None
+        # Callers are served in arrival order
+        self._lock = asyncio.Lock()
+
+        self.acquired = 0
+        self.waited_seconds = 0.0
+
+    async def acquire(self, tokens: int = 0) -> None:
+        """
+        Waits until one request of the given number of tokens fits in both
+        budgets, then consumes it
+
+        Args:
+            tokens: Estimated tokens of the request; a request larger than
+                the whole per-minute budget waits for a full budget
+        """
+        async with self._lock:
+            start_time = time.monotonic()
+            while True:
+                now = time.monotonic()
+                wait = 0.0
+                for bucket, amount in ((self.requests, 1), (self.tokens, tokens)):
+                    if bucket is not None:
+                        bucket.refill(now)
+                        wait = max(
+                            wait, bucket.wait_time(min(amount, bucket.capacity))
+                        )
+                if wait <= 0:
+                    break
+                await asyncio.sleep(wait)
+
+            for bucket, amount in ((self.requests, 1), (self.tokens, tokens)):
+                if bucket is not None:
+                    bucket.available -= min(amount, bucket.capacity)
+            self.acquired += 1
+            self.waited_seconds += time.monotonic() - start_time
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Returns how many requests went through and how long they waited
+        """
+        return {
+            "acquired": self.acquired,
+            "waited_seconds": round(self.waited_seconds, 3),
+        }
@@ -23,23 +23,20 @@ async def assign_ids_to_contracts(batch_size: int = 10) -> int:
     """
     dgraph = DgraphClient()
     total_updated = 0
-    offset = 0
+    scanned = 0
 
     try:
         # Get total count of contracts
         total_contracts = dgraph.get_contracts_count(enriched=False)
         logger.info(f"Found {total_contracts} total contracts to check for IDs")
 
-        while True:
-            # Get batch of contracts
-            contracts = dgraph.get_contracts(
-                batch_size=batch_size, offset=offset, enriched=False
-            )
-
-            if not contracts:
-                logger.info("No more contracts to process")
-                break
-
+        # The UID cursor keeps the scan stable while IDs are being written
+        for batch_number, contracts in enumerate(
+            dgraph.iter_contracts(
+                enriched=False, page_size=batch_size, projection="detail"
+            ),
+            start=1,
+        ):
             # Filter contracts that need IDs assigned (empty string or None)
             contracts_needing_ids = []
             for contract in contracts:
@@ -49,7 +46,7 @@ async def assign_ids_to_contracts(batch_size: int = 10) -> int:
 
             if contracts_needing_ids:
                 logger.info(
-                    f"Processing {len(contracts_needing_ids)} contracts needing IDs in batch {offset // batch_size + 1}"
+                    f"Processing {len(contracts_needing_ids)} contracts needing IDs in batch {batch_number}"
                 )
 
                 # Generate IDs and prepare mutation data
@@ -68,44 +65,34 @@ async def assign_ids_to_contracts(batch_size: int = 10) -> int:
                         f"Generated ID {contract_id} for contract {contract.get('ContractDeployment.contract', 'unknown')} (UID: {contract.get('uid')})"
                     )
 
-                # Mutate contracts in batches
+                # Mutate the whole batch in one transaction
                 if mutation_batches:
                     try:
-                        # Process mutations in smaller sub-batches to avoid overwhelming Dgraph
-                        sub_batch_size = min(10, len(mutation_batches))
-                        for i in range(0, len(mutation_batches), sub_batch_size):
-                            sub_batch = mutation_batches[i : i + sub_batch_size]
-
-                            for mutation_data in sub_batch:
-                                try:
-                                    dgraph.mutate(mutation_data)
-                                    total_updated += 1
-                                except Exception as e:
-                                    logger.error(
-                                        f"Failed to mutate contract UID {mutation_data.get('uid')}: {str(e)}"
-                                    )
-                                    continue
+                        result = dgraph.mutate_many(mutation_batches)
+                        total_updated += result.success_count
+                        for uid, error in result.failed.items():
+                            logger.error(
+                                f"Failed to mutate contract UID {uid}: {error}"
+                            )
 
                         logger.info(
-                            f"Updated {len(mutation_batches)} contracts with IDs in this batch"
+                            f"Updated {result.success_count} contracts with IDs in this batch"
                         )
 
                     except Exception as e:
                         logger.error(
-                            f"Failed to update batch at offset {offset}: {str(e)}"
+                            f"Failed to update batch {batch_number}: {str(e)}"
                         )
                         continue
             else:
-                logger.debug(
-                    f"No contracts needing IDs in batch {offset // batch_size + 1}"
-                )
+                logger.debug(f"No contracts needing IDs in batch {batch_number}")
 
-            offset += batch_size
+            scanned += len(contracts)
 
             # Progress update
-            if offset % (batch_size * 10) == 0:
+            if batch_number % 10 == 0:
                 logger.info(
-                    f"Progress: processed {offset}/{total_contracts} contracts, updated {total_updated} so far"
+                    f"Progress: processed {scanned}/{total_contracts} contracts, updated {total_updated} so far"
                 )
 
         logger.info(
@@ -128,18 +115,11 @@ async def verify_contract_ids() -> Dict[str, int]:
     dgraph = DgraphClient()
     contracts_with_ids = 0
     contracts_without_ids = 0
-    offset = 0
-    batch_size = 10
 
     try:
-        while True:
-            contracts = dgraph.get_contracts(
-                batch_size=batch_size, offset=offset, enriched=False
-            )
-
-            if not contracts:
-                break
-
+        for contracts in dgraph.iter_contracts(
+            enriched=False, page_size=100, projection="summary"
+        ):
             for contract in contracts:
                 contract_id = contract.get("ContractDeployment.id")
                 if contract_id and contract_id != "":
@@ -150,8 +130,6 @@ async def verify_contract_ids() -> Dict[str, int]:
                         f"Contract without ID: {contract.get('ContractDeployment.contract', 'unknown')} (UID: {contract.get('uid', 'unknown')})"
                     )
 
-            offset += batch_size
-
         logger.info("Verification complete:")
         logger.info(f"  Contracts with IDs: {contracts_with_ids}")
         logger.info(f"  Contracts without IDs: {contracts_without_ids}")
@@ -176,7 +154,9 @@ async def test_contract_id_retrieval() -> None:
 
     try:
         # Get a few contracts with IDs
-        contracts = dgraph.get_contracts(batch_size=5, enriched=None)
+        contracts = dgraph.get_contracts(
+            batch_size=5, enriched=None, projection="summary"
+        )
 
         for contract in contracts:
             contract_id = contract.get("ContractDeployment.id")
@@ -184,7 +164,9 @@ async def test_contract_id_retrieval() -> None:
                 logger.info(f"Testing retrieval for contract ID: {contract_id}")
 
                 # Try to retrieve by ID
-                retrieved_contract = dgraph.get_contract_by_id(contract_id)
+                retrieved_contract = dgraph.get_contract_by_id(
+                    contract_id, projection="summary"
+                )
 
                 if retrieved_contract:
                     logger.info(
@@ -212,7 +194,9 @@ async def show_sample_contracts() -> None:
     dgraph = DgraphClient()
 
     try:
-        contracts = dgraph.get_contracts(batch_size=10, enriched=None)
+        contracts = dgraph.get_contracts(
+            batch_size=10, enriched=None, projection="summary"
+        )
 
         logger.info("Sample contracts:")
         for i, contract in enumerate(contracts, 1):
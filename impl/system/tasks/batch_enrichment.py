@@ -1,14 +1,27 @@
 import asyncio
+import json
 import time
-from typing import List, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Iterable, Iterator, AsyncIterator
 from dataclasses import dataclass
+from collections import OrderedDict
 from contextlib import contextmanager
 
-from langchain_huggingface import HuggingFaceEmbeddings
 from src.core.data_access.dgraph_client import DgraphClient
+from src.core.data_access.projections import EMBEDDINGS_FIELD, SOURCE_HASH_FIELD
+from src.core.data_processing.embeddings import get_embedding_model
+from src.core.data_processing.enrichment_journal import (
+    DEFAULT_ENRICHMENT_JOURNAL,
+    EnrichmentJournal,
+)
+from src.core.data_processing.source_dedup import group_by_source
 from src.core.data_processing.llm_enrichment import ParallelSemanticEnricher
+from src.core.data_processing.pipeline import Pipeline, Stage
 from src.utils.logger import logger
 
+# Enrichments kept for the sources of later pages, long after they are stored
+RECENT_SOURCES = 10000
+
 
 @contextmanager
 def timer(operation_name: str):
@@ -30,6 +43,20 @@ class EnrichmentConfig:
     embedding_model_name: str = "BAAI/bge-small-en-v1.5"
     device: str = "cpu"
     normalize_embeddings: bool = True
+    # LLM calls in flight, and provider rate limits (None for no limit)
+    max_concurrency: int = 8
+    requests_per_minute: Optional[float] = None
+    tokens_per_minute: Optional[float] = None
+    # Records per Dgraph write, contracts per embedding call, embedding
+    # threads, and seconds a partial write or embedding batch waits for more
+    write_batch_size: int = 100
+    embedding_batch_size: int = 32
+    embedding_workers: int = 1
+    flush_interval: float = 2.0
+    # Failed LLM attempts before a contract is dead-lettered, and the
+    # journal of attempts and run checkpoints
+    max_attempts: int = 3
+    journal_path: str = DEFAULT_ENRICHMENT_JOURNAL
 
 
 class BatchEnricher:
@@ -38,11 +65,20 @@ class BatchEnricher:
     def __init__(self, config: EnrichmentConfig):
         self.config = config
         self.dgraph = DgraphClient()
-        self.enricher = ParallelSemanticEnricher()
-        self.embedding_model = HuggingFaceEmbeddings(
-            model_name=config.embedding_model_name,
-            model_kwargs={"device": config.device},
-            encode_kwargs={"normalize_embeddings": config.normalize_embeddings},
+        self.journal = EnrichmentJournal(config.journal_path, config.max_attempts)
+        self.enricher = ParallelSemanticEnricher(
+            max_concurrency=config.max_concurrency,
+            requests_per_minute=config.requests_per_minute,
+            tokens_per_minute=config.tokens_per_minute,
+        )
+        self.embedding_model = get_embedding_model(
+            config.embedding_model_name,
+            device=config.device,
+            normalize_embeddings=config.normalize_embeddings,
+        )
+        # The model call blocks, it runs off the event loop
+        self.embedding_executor = ThreadPoolExecutor(
+            max_workers=config.embedding_workers, thread_name_prefix="embeddings"
         )
         self.dictionary = {
             # Standards
@@ -190,124 +226,330 @@ class BatchEnricher:
                 # Measure embedding generation time with detailed metrics
             total_chars = sum(len(text) for text in texts)
 
+            # Deployments sharing a source share their text, embed it once
+            unique_texts = list(dict.fromkeys(texts))
             with timer(
-                f"Embedding generation ({len(texts)} docs, {total_chars} chars)"
+                f"Embedding generation ({len(unique_texts)} docs, {total_chars} chars)"
             ):
-                embeddings = self.embedding_model.embed_documents(texts)
-
-            # Store embeddings in Dgraph
-            for contract, embedding in zip(contracts, embeddings):
-                try:
-                    contract_id = contract.get("uid")
-
-                    if contract_id:
-                        self.dgraph.insert_embeddings(contract_id, embedding)
-                    else:
-                        logger.warning("Contract missing UID")
-                except Exception as e:
-                    logger.error(
-                        f"Failed to insert embedding for contract UID {contract_id}: {str(e)}"
-                    )
-                    # Continue with other contracts even if one fails
-
-        except Exception as e:
-            logger.error(f"Error processing embeddings: {str(e)}")
-
-    async def _process_batch(self, contracts: List[Dict[str, Any]]) -> int:
-        """Process a single batch of contracts."""
-        if not contracts:
-            return 0
-
-        try:
-            # Enrich contracts with semantic analysis
-            enriched_contracts = await self.enricher.process_contracts(contracts)
-
-            if enriched_contracts:
-                # Update contracts in Dgraph
-                self.dgraph.mutate(enriched_contracts)
-                logger.info(f"Enriched and stored {len(enriched_contracts)} contracts")
-
-                # Process embeddings
-                await self._process_embeddings(enriched_contracts)
+                unique_embeddings = await asyncio.get_running_loop().run_in_executor(
+                    self.embedding_executor,
+                    self.embedding_model.embed_documents,
+                    unique_texts,
+                )
+            embeddings_by_text = dict(zip(unique_texts, unique_embeddings))
+            embeddings = [embeddings_by_text[text] for text in texts]
+
+            # Store embeddings in Dgraph, one transaction per chunk
+            pairs = []
+            for contract_id, embedding in zip(ids, embeddings):
+                if contract_id:
+                    pairs.append((contract_id, embedding))
+                else:
+                    logger.warning("Contract missing UID")
 
-                return len(enriched_contracts)
-            else:
-                logger.warning("No contracts were enriched in this batch")
-                return 0
+            result = await asyncio.to_thread(self.dgraph.insert_embeddings_bulk, pairs)
+            for contract_id, error in result.failed.items():
+                logger.error(
+                    f"Failed to insert embedding for contract UID {contract_id}: {error}"
+                )
 
         except Exception as e:
-            logger.error(f"Error processing batch: {str(e)}")
-            return 0
+            logger.error(f"Error processing embeddings: {str(e)}")
 
-    async def enrich_new_contracts(self) -> int:
-        """Enrich all contracts that haven't been enriched yet."""
-        total_processed = 0
+    def _fan_out(
+        self,
+        source: Dict[str, Any],
+        contracts: List[Dict[str, Any]],
+        source_hash: Optional[str],
+    ) -> List[Dict[str, Any]]:
+        """Copies the enrichment of a source to every deployment of it."""
+        fields = {
+            key: value
+            for key, value in source.items()
+            if key.startswith("ContractDeployment.") and key != SOURCE_HASH_FIELD
+        }
+        if isinstance(fields.get(EMBEDDINGS_FIELD), list):
+            fields[EMBEDDINGS_FIELD] = json.dumps(fields[EMBEDDINGS_FIELD])
 
+        records = []
+        for contract in contracts:
+            record = {**fields, "uid": contract.get("uid")}
+            if "id" in source:
+                record["id"] = contract.get("ContractDeployment.id")
+            if source_hash:
+                record[SOURCE_HASH_FIELD] = source_hash
+            records.append(record)
+        return records
+
+    async def _pages(self, pages: Iterator[List[Dict[str, Any]]]) -> AsyncIterator:
+        """Reads the pages of contracts without blocking the event loop."""
         while True:
-            try:
-                contracts = self.dgraph.get_contracts(
-                    self.config.batch_size, enriched=False
+            contracts = await asyncio.to_thread(next, pages, None)
+            if contracts is None:
+                return
+            yield contracts
+
+    async def _run_pipeline(
+        self, mode: str, enriched: bool, reuse_enrichments: bool = True
+    ) -> int:
+        """
+        Streams pages of contracts through the enrichment stages.
+
+        The stages run concurrently with bounded queues between them: pages
+        are read from Dgraph and grouped by source (resolve) while earlier
+        sources are enriched by the LLM (enrich), their records are written
+        in coalesced mutations (write) and embedded in micro-batches (embed).
+
+        Deployments are grouped by normalized source: only the first one of
+        every source is enriched, and its enrichment is copied to the others,
+        including the ones of later pages read while it was being enriched.
+        Sources enriched in an earlier run are copied from Dgraph, with their
+        embeddings, without calling the LLM at all.
+
+        Every attempt and outcome is recorded in the journal: dead-lettered
+        contracts are skipped, and the run checkpoints the UID of the last
+        page whose contracts are all settled (stored or failed), so that an
+        interrupted run resumes after it.
+
+        Args:
+            mode: Name of the run in the journal
+            enriched: Whether to read the enriched or the unenriched contracts
+            reuse_enrichments: Whether to copy the enrichment of sources
+                enriched before; disabled when re-enriching
+
+        Returns:
+            Number of contracts stored
+        """
+        run_id, cursor = self.journal.start_run(mode)
+        # Last UID of every page read -> its contracts not settled yet, in
+        # reading order
+        unsettled: OrderedDict[str, set[str]] = OrderedDict()
+        page_of: Dict[str, str] = {}
+
+        def settle(uids: Iterable[str]) -> None:
+            for uid in uids:
+                page = page_of.pop(uid, None)
+                if page is not None:
+                    unsettled[page].discard(uid)
+            checkpoint = None
+            while unsettled and not next(iter(unsettled.values())):
+                checkpoint, _ = unsettled.popitem(last=False)
+            if checkpoint is not None:
+                self.journal.checkpoint(run_id, checkpoint)
+
+        # Sources being enriched -> deployments of them found meanwhile
+        in_flight: Dict[str, List[Dict[str, Any]]] = {}
+        # Latest sources enriched in this run, their writes may still be queued
+        recent: OrderedDict[str, Dict[str, Any]] = OrderedDict()
+        stored = 0
+
+        async def resolve(pages: List[List[Dict[str, Any]]]) -> list:
+            groups = []
+            for contracts in pages:
+                skipped = self.journal.skipped(
+                    run_id, [contract["uid"] for contract in contracts]
                 )
+                if skipped:
+                    logger.info(
+                        f"Skipping {len(skipped)} dead-lettered or already stored contracts"
+                    )
+                page = contracts[-1]["uid"]
+                contracts = [c for c in contracts if c["uid"] not in skipped]
+                unsettled[page] = {contract["uid"] for contract in contracts}
+                page_of.update((contract["uid"], page) for contract in contracts)
+                groups.extend(group_by_source(contracts))
+            # Pages left without contracts to send are settled already
+            settle(())
+
+            hashes = [
+                source_hash
+                for source_hash, _ in groups
+                if source_hash
+                and source_hash not in in_flight
+                and source_hash not in recent
+            ]
+            known = (
+                await asyncio.to_thread(self.dgraph.get_enriched_by_source_hash, hashes)
+                if reuse_enrichments and hashes
+                else {}
+            )
+
+            outputs = []
+            for source_hash, members in groups:
+                if source_hash in in_flight:
+                    in_flight[source_hash].extend(members)
+                    continue
+                source = recent.get(source_hash) or known.get(source_hash)
+                if source_hash and not source:
+                    in_flight[source_hash] = []
+                outputs.append((source_hash, members, source))
+            logger.info(
+                f"Page of {sum(len(contracts) for contracts in pages)} contracts has {len(groups)} distinct sources: {len(groups) - len(outputs)} being enriched, {sum(1 for *_, source in outputs if source)} copied from earlier enrichments"
+            )
+            return outputs
+
+        async def enrich(groups: list) -> List[Dict[str, Any]]:
+            records = []
+            for source_hash, members, source in groups:
+                if source is None:
+                    self.journal.attempt(run_id, [c["uid"] for c in members])
+                    error = "Empty enrichment"
+                    try:
+                        source = await self.enricher.enrich_one(
+                            members[0], raise_errors=True
+                        )
+                    except Exception as e:
+                        error = str(e) or type(e).__name__
+                    finally:
+                        siblings = in_flight.pop(source_hash, [])
+                    # Deployments found meanwhile shared the attempt
+                    self.journal.attempt(run_id, [c["uid"] for c in siblings])
+                    members = members + siblings
+                    if not source:
+                        uids = [contract["uid"] for contract in members]
+                        logger.warning(
+                            f"No enrichment for {len(members)} contracts of UID {uids[0]}: {error}"
+                        )
+                        self.journal.fail(run_id, uids, error)
+                        settle(uids)
+                        continue
+                    if source_hash:
+                        recent[source_hash] = source
+                        if len(recent) > RECENT_SOURCES:
+                            recent.popitem(last=False)
+                records.extend(self._fan_out(source, members, source_hash))
+            return records
+
+        async def write(records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+            nonlocal stored
+            # Failed records don't sink the rest of the write
+            result = await asyncio.to_thread(self.dgraph.mutate_many, records)
+            for uid, error in result.failed.items():
+                logger.error(f"Failed to store enrichment for UID {uid}: {error}")
+                self.journal.fail(run_id, [uid], str(error))
+            self.journal.succeed(run_id, result.succeeded)
+            settle(record["uid"] for record in records)
+            stored += result.success_count
+            logger.info(f"Stored {result.success_count} contracts, {stored} in total")
+
+            # The stored contracts that did not get embeddings along with
+            # their enrichment are embedded next
+            stored_uids = set(result.succeeded)
+            return [
+                record
+                for record in records
+                if record["uid"] in stored_uids and EMBEDDINGS_FIELD not in record
+            ]
+
+        pipeline = Pipeline(
+            [
+                Stage("resolve", resolve),
+                Stage("enrich", enrich, workers=self.config.max_concurrency),
+                Stage(
+                    "write",
+                    write,
+                    batch_size=self.config.write_batch_size,
+                    max_wait=self.config.flush_interval,
+                ),
+                Stage(
+                    "embed",
+                    self._process_embeddings,
+                    workers=self.config.embedding_workers,
+                    batch_size=self.config.embedding_batch_size,
+                    max_wait=self.config.flush_interval,
+                ),
+            ]
+        )
+        await pipeline.run(
+            self._pages(
+                self.dgraph.iter_contracts(
+                    enriched=enriched,
+                    page_size=self.config.batch_size,
+                    projection="enrichment_input",
+                    after=cursor,
+                )
+            )
+        )
 
-                if not contracts:
-                    logger.info("No more contracts to enrich")
-                    break
-
-                processed_count = await self._process_batch(contracts)
-                total_processed += processed_count
-
-                logger.info(f"Total contracts processed: {total_processed}")
-
-            except Exception as e:
-                logger.error(f"Error in enrich_new_contracts loop: {str(e)}")
-                break
+        if unsettled:
+            # Contracts of failed writes, the next run resumes before them
+            logger.warning(
+                f"Run {run_id} left {sum(map(len, unsettled.values()))} contracts unsettled, the next {mode} run resumes it"
+            )
+        else:
+            self.journal.finish_run(run_id)
+        logger.info(f"Enrichment journal: {self.journal.stats()}")
+        return stored
 
-        return total_processed
+    async def enrich_new_contracts(self) -> int:
+        """Enrich all contracts that haven't been enriched yet."""
+        try:
+            # The UID cursor does not read the contracts being enriched
+            # again, nor the ones whose enrichment failed in this run
+            return await self._run_pipeline("enrich", enriched=False)
+        except Exception as e:
+            logger.error(f"Error in enrich_new_contracts: {str(e)}")
+            return 0
 
     async def update_enriched_contracts(self) -> int:
         """Update contracts that have already been enriched."""
-        total_processed = 0
-
         try:
             contracts_count = self.dgraph.get_contracts_count(enriched=True)
             logger.info(f"Found {contracts_count} enriched contracts to update")
 
-            for i in range(0, contracts_count, self.config.batch_size):
-                try:
-                    contracts = self.dgraph.get_contracts(
-                        self.config.batch_size, offset=i, enriched=True
-                    )
-
-                    processed_count = await self._process_batch(contracts)
-                    total_processed += processed_count
-
-                    logger.info(
-                        f"Updated batch {i // self.config.batch_size + 1}, total processed: {total_processed}"
-                    )
-
-                except Exception as e:
-                    logger.error(f"Error processing batch at offset {i}: {str(e)}")
-                    continue
-
+            return await self._run_pipeline(
+                "update", enriched=True, reuse_enrichments=False
+            )
         except Exception as e:
             logger.error(f"Error in update_enriched_contracts: {str(e)}")
-
-        return total_processed
+            return 0
 
 
-async def batch_enrichment(batch_size: int = 10, update: bool = False) -> int:
+async def batch_enrichment(
+    batch_size: int = 10,
+    update: bool = False,
+    max_concurrency: int = 8,
+    requests_per_minute: Optional[float] = None,
+    tokens_per_minute: Optional[float] = None,
+    write_batch_size: int = 100,
+    embedding_batch_size: int = 32,
+    embedding_workers: int = 1,
+    max_attempts: int = 3,
+    requeue_dead: bool = False,
+) -> int:
     """
     Main function to run batch enrichment.
 
     Args:
         batch_size: Number of contracts to process in each batch
         update: If True, update already enriched contracts; otherwise enrich new contracts
+        max_concurrency: Maximum number of LLM calls in flight
+        requests_per_minute: LLM request rate limit, None for no limit
+        tokens_per_minute: LLM token rate limit, None for no limit
+        write_batch_size: Enriched records per Dgraph write
+        embedding_batch_size: Contracts per embedding model call
+        embedding_workers: Threads running the embedding model
+        max_attempts: Failed LLM attempts before a contract is dead-lettered
+        requeue_dead: If True, give the dead-lettered contracts new attempts
 
     Returns:
         Total number of contracts processed
     """
-    config = EnrichmentConfig(batch_size=batch_size)
+    config = EnrichmentConfig(
+        batch_size=batch_size,
+        max_concurrency=max_concurrency,
+        requests_per_minute=requests_per_minute,
+        tokens_per_minute=tokens_per_minute,
+        write_batch_size=write_batch_size,
+        embedding_batch_size=embedding_batch_size,
+        embedding_workers=embedding_workers,
+        max_attempts=max_attempts,
+    )
     enricher = BatchEnricher(config)
+    if requeue_dead:
+        logger.info(
+            f"Requeued {enricher.journal.requeue_dead()} dead-lettered contracts"
+        )
 
     try:
         if update:
@@ -332,11 +574,54 @@ if __name__ == "__main__":
     parser.add_argument(
         "--batch-size", type=int, default=10, help="Batch size for enrichment"
     )
+    parser.add_argument(
+        "--max-concurrency", type=int, default=8, help="LLM calls in flight"
+    )
+    parser.add_argument(
+        "--rpm", type=float, default=None, help="LLM requests per minute limit"
+    )
+    parser.add_argument(
+        "--tpm", type=float, default=None, help="LLM tokens per minute limit"
+    )
+    parser.add_argument(
+        "--write-batch-size", type=int, default=100, help="Records per Dgraph write"
+    )
+    parser.add_argument(
+        "--embedding-batch-size",
+        type=int,
+        default=32,
+        help="Contracts per embedding call",
+    )
+    parser.add_argument(
+        "--embedding-workers", type=int, default=1, help="Embedding threads"
+    )
+    parser.add_argument(
+        "--max-attempts",
+        type=int,
+        default=3,
+        help="Failed attempts before a contract is dead-lettered",
+    )
+    parser.add_argument(
+        "--requeue-dead",
+        action="store_true",
+        help="Retry the dead-lettered contracts",
+    )
     args = parser.parse_args()
 
     try:
         total_processed = asyncio.run(
-            batch_enrichment(batch_size=args.batch_size, update=args.update)
+            batch_enrichment(
+                batch_size=args.batch_size,
+                update=args.update,
+                max_concurrency=args.max_concurrency,
+                requests_per_minute=args.rpm,
+                tokens_per_minute=args.tpm,
+                write_batch_size=args.write_batch_size,
+                embedding_batch_size=args.embedding_batch_size,
+                embedding_workers=args.embedding_workers,
+                max_attempts=args.max_attempts,
+                requeue_dead=args.requeue_dead,
+            )
         )
         logger.info(
             f"Batch enrichment completed. Total contracts processed: {total_processed}"
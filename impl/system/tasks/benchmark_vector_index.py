@@ -0,0 +1,147 @@
+"""
+Compares the recall, latency and memory of the vector index backends on the
+stored embeddings.
+
+The exact brute-force index is the reference; every other backend is scored
+by its recall@k against it over a sample of the contracts used as queries:
+
+    python -m tasks.benchmark_vector_index --queries 200 --k 10
+"""
+
+import asyncio
+import gc
+import time
+from typing import Optional
+
+import numpy as np
+
+from src.core.data_access.async_dgraph_client import AsyncDgraphClient
+from src.core.data_retrieval.embedding_snapshot import load_embeddings
+from src.core.data_retrieval.vector_index import create_vector_index
+from src.utils.logger import logger
+
+BACKENDS = ("brute_force", "hnsw", "int8", "binary")
+
+
+def resident_anonymous_bytes() -> Optional[int]:
+    """
+    Returns the anonymous resident memory of the process (RssAnon), which
+    leaves out memory-mapped files, or None where /proc is not available
+    """
+    try:
+        with open("/proc/self/status", "r") as file:
+            for line in file:
+                if line.startswith("RssAnon:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def benchmark(
+    uids: list[str],
+    vectors: np.ndarray,
+    queries: int = 200,
+    k: int = 10,
+    backends: tuple[str, ...] = BACKENDS,
+) -> dict[str, dict]:
+    """
+    Builds every backend over the embeddings and searches a sample of them
+
+    Args:
+        uids: The contract UIDs
+        vectors: Their embeddings
+        queries: Number of contracts used as queries
+        k: Number of neighbours per search
+        backends: Backends to compare; brute_force is always the reference
+
+    Returns:
+        Recall@k, latency percentiles, build time and memory per backend:
+        the resident bytes the index reports, the bytes it maps from a file,
+        and the growth of the process' anonymous resident memory while it
+        was built and searched
+    """
+    rng = np.random.default_rng(0)
+    sample = vectors[rng.choice(len(vectors), min(queries, len(vectors)), False)]
+
+    report = {}
+    reference = None
+    for backend in ("brute_force",) + tuple(b for b in backends if b != "brute_force"):
+        # Frees the previous index before measuring this one
+        index = None
+        gc.collect()
+        resident_before = resident_anonymous_bytes()
+        start_time = time.time()
+        try:
+            index = create_vector_index(vectors.shape[1], backend)
+        except ImportError as e:
+            logger.warning(f"Skipping the {backend} index: {str(e)}")
+            continue
+        index.upsert_many(uids, vectors)
+        build_seconds = time.time() - start_time
+
+        latencies = []
+        found = []
+        for query in sample:
+            search_start = time.perf_counter()
+            found.append({uid for uid, _ in index.search(query, k)})
+            latencies.append((time.perf_counter() - search_start) * 1000)
+        if reference is None:
+            reference = found
+
+        stats = index.stats()
+        resident_after = resident_anonymous_bytes()
+        report[backend] = {
+            "recall": float(
+                np.mean([len(f & r) / len(r) for f, r in zip(found, reference) if r])
+            ),
+            "p50_ms": float(np.percentile(latencies, 50)),
+            "p95_ms": float(np.percentile(latencies, 95)),
+            "build_seconds": build_seconds,
+            "bytes": stats["bytes"],
+            "mapped_bytes": stats.get("mapped_bytes", 0),
+            "rss_growth_bytes": (
+                resident_after - resident_before
+                if resident_before is not None and resident_after is not None
+                else None
+            ),
+        }
+    return report
+
+
+async def main(queries: int, k: int) -> int:
+    client = AsyncDgraphClient()
+    try:
+        uids, vectors = await load_embeddings(client)
+    finally:
+        await client.close()
+    if not uids:
+        logger.error("No searchable embeddings to benchmark")
+        return 1
+
+    logger.info(
+        f"Benchmarking {len(uids)} embeddings of dimension {vectors.shape[1]} with {queries} queries, k={k}"
+    )
+    for backend, result in benchmark(uids, vectors, queries, k).items():
+        memory = f"resident {result['bytes'] / 2**20:.1f} MiB"
+        if result["mapped_bytes"]:
+            memory += f" + mapped {result['mapped_bytes'] / 2**20:.1f} MiB"
+        if result["rss_growth_bytes"] is not None:
+            memory += f" (RSS +{result['rss_growth_bytes'] / 2**20:.1f} MiB)"
+        logger.info(
+            f"{backend:>11}: recall@{k} {result['recall']:.3f} - p50 {result['p50_ms']:.2f}ms - p95 {result['p95_ms']:.2f}ms - build {result['build_seconds']:.1f}s - {memory}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark the vector indexes")
+    parser.add_argument(
+        "--queries", type=int, default=200, help="Number of sampled queries"
+    )
+    parser.add_argument("--k", type=int, default=10, help="Neighbours per search")
+    args = parser.parse_args()
+
+    exit(asyncio.run(main(args.queries, args.k)))
@@ -0,0 +1,35 @@
+"""
+Declares the Dgraph indexes used by the structured search filters and by the
+source hash lookups of the enrichment step.
+
+Run once before using filters on /search or running batch_enrichment, and
+again after restoring a database from an export:
+
+    python -m tasks.create_indexes
+"""
+
+from src.core.data_access.dgraph_client import DgraphClient
+from src.core.data_access.filters import FILTER_SCHEMA
+from src.core.data_processing.source_dedup import SOURCE_HASH_SCHEMA
+from src.utils.logger import logger
+
+
+def main() -> int:
+    client = DgraphClient()
+    try:
+        logger.info(f"Applying search filter indexes:{FILTER_SCHEMA}")
+        client.ensure_search_indexes()
+        logger.info("✓ Search filter indexes are in place")
+        logger.info(f"Applying source hash index:{SOURCE_HASH_SCHEMA}")
+        client.ensure_source_hash_index()
+        logger.info("✓ Source hash index is in place")
+    except Exception as e:
+        logger.error(f"Failed to create indexes: {str(e)}")
+        return 1
+    finally:
+        client.close()
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
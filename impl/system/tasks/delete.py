@@ -1,6 +1,6 @@
 import asyncio
 import argparse
-from typing import List, Optional
+from typing import Dict, List, Optional
 from src.core.data_access.dgraph_client import DgraphClient
 from src.utils.logger import logger
 
@@ -56,35 +56,26 @@ class ArrayFieldDeleter:
                 logger.info(
                     f"Deleting array fields from {len(contract_ids)} specific contracts"
                 )
-                for contract_id in contract_ids:
-                    self._delete_fields_from_contract_id(contract_id, array_fields)
+                for contract_id, uid in self._resolve_uids(contract_ids).items():
+                    self._delete_fields_from_uid(uid, array_fields)
                     total_processed += 1
                     if total_processed % 10 == 0:
                         logger.info(f"Processed {total_processed} contracts")
             else:
                 # Delete from all contracts in batches
                 logger.info("Deleting array fields from all contracts")
-                offset = 0
-
-                while True:
-                    contracts = self.dgraph.get_contracts(
-                        batch_size, offset=offset, enriched=True
-                    )
-                    if not contracts:
-                        break
 
+                for contracts in self.dgraph.iter_contracts(
+                    enriched=True, page_size=batch_size, projection="id_only"
+                ):
                     for contract in contracts:
                         uid = contract.get("uid")
                         if uid:
                             self._delete_fields_from_uid(uid, array_fields)
                             total_processed += 1
 
-                    offset += batch_size
                     logger.info(f"Processed {total_processed} contracts so far")
 
-                    if len(contracts) < batch_size:
-                        break
-
             logger.info(
                 f"Successfully deleted array fields from {total_processed} contracts"
             )
@@ -115,11 +106,36 @@ class ArrayFieldDeleter:
                 mutation = txn.create_mutation(del_obj=delete_data)
                 txn.mutate(mutation=mutation, commit_now=False)
 
+            # Removing fields can only drop this contract from search results
+            self.dgraph.invalidate_search_cache([uid])
+
             logger.debug(f"Deleted fields {array_fields} from UID {uid}")
 
         except Exception as e:
             logger.error(f"Failed to delete fields from UID {uid}: {str(e)}")
 
+    def _resolve_uids(self, contract_ids: List[str]) -> Dict[str, str]:
+        """
+        Converts contract IDs to UIDs with batched lookups.
+
+        Args:
+            contract_ids: The contract IDs to resolve.
+
+        Returns:
+            The UIDs keyed by contract ID; unknown IDs are logged and skipped.
+        """
+        contracts = self.dgraph.get_contracts_by_ids(
+            contract_ids, projection="id_only"
+        )
+        uids = {}
+        for contract_id in contract_ids:
+            uid = contracts.get(contract_id, {}).get("uid")
+            if uid:
+                uids[contract_id] = uid
+            else:
+                logger.warning(f"Contract {contract_id} not found")
+        return uids
+
     def _delete_fields_from_contract_id(
         self, contract_id: str, array_fields: List[str]
     ) -> None:
@@ -132,19 +148,9 @@ class ArrayFieldDeleter:
             array_fields: List of field names to delete.
         """
         try:
-            # Get contract by ID to find UID
-            contract = self.dgraph.get_contract_by_id(contract_id)
-            if not contract:
-                logger.warning(f"Contract {contract_id} not found")
-                return
-
-            uid = contract.get("uid")
-            if not uid:
-                logger.warning(f"No UID found for contract {contract_id}")
-                return
-
-            # Delete using UID
-            self._delete_fields_from_uid(uid, array_fields)
+            uid = self._resolve_uids([contract_id]).get(contract_id)
+            if uid:
+                self._delete_fields_from_uid(uid, array_fields)
 
         except Exception as e:
             logger.error(
@@ -161,10 +167,12 @@ class ArrayFieldDeleter:
         """
         try:
             if uid:
-                contract = self.dgraph.get_contract_by_uid(uid)
+                contract = self.dgraph.get_contract_by_uid(uid, projection="summary")
                 identifier = f"UID {uid}"
             elif contract_id:
-                contract = self.dgraph.get_contract_by_id(contract_id)
+                contract = self.dgraph.get_contract_by_id(
+                    contract_id, projection="summary"
+                )
                 identifier = f"contract {contract_id}"
             else:
                 logger.error("Either contract_id or uid must be provided")
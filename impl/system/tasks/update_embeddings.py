@@ -2,8 +2,8 @@ import asyncio
 from typing import List, Dict, Any, Optional
 from dataclasses import dataclass
 
-from langchain_huggingface import HuggingFaceEmbeddings
 from src.core.data_access.dgraph_client import DgraphClient
+from src.core.data_processing.embeddings import get_embedding_model
 from src.utils.logger import logger
 
 
@@ -23,10 +23,10 @@ class EmbeddingUpdater:
     def __init__(self, config: EmbeddingConfig):
         self.config = config
         self.dgraph = DgraphClient()
-        self.embedding_model = HuggingFaceEmbeddings(
-            model_name=config.embedding_model_name,
-            model_kwargs={"device": config.device},
-            encode_kwargs={"normalize_embeddings": config.normalize_embeddings},
+        self.embedding_model = get_embedding_model(
+            config.embedding_model_name,
+            device=config.device,
+            normalize_embeddings=config.normalize_embeddings,
         )
 
     def _create_contract_text(self, contract: Dict[str, Any]) -> str:
@@ -78,29 +78,19 @@ class EmbeddingUpdater:
 
             embeddings = self.embedding_model.embed_documents(texts)
 
-            # Store embeddings in Dgraph using UID but also store contract ID for reference
-            successful_updates = 0
-            for contract, embedding in zip(contracts, embeddings):
-                try:
-                    contract_id = contract.get("ContractDeployment.id")
-
-                    if contract_id:
-                        self.dgraph.insert_embeddings(contract_id, embedding)
-                        logger.debug(
-                            f"Stored embeddings for contract ID {contract_id}"
-                        )
-                        successful_updates += 1
-                    else:
-                        logger.warning(
-                            f"Missing contract ID for contract: {contract.get('ContractDeployment.contract', 'unknown')}"
-                        )
-
-                except Exception as e:
-                    contract_id = contract.get("ContractDeployment.id", "unknown")
-                    logger.error(
-                        f"Failed to insert embedding for contract ID {contract_id}: {str(e)}"
-                    )
-                    # Continue with other contracts even if one fails
+            # Embeddings are stored by UID, in one transaction per chunk.
+            # Contracts without an ID were skipped above, keep the same order.
+            uids = [
+                contract.get("uid")
+                for contract in contracts
+                if contract.get("ContractDeployment.id")
+            ]
+            result = self.dgraph.insert_embeddings_bulk(zip(uids, embeddings))
+            for uid, error in result.failed.items():
+                logger.error(
+                    f"Failed to insert embedding for contract UID {uid}: {error}"
+                )
+            successful_updates = result.success_count
 
             logger.info(
                 f"Successfully updated embeddings for {successful_updates}/{len(contracts)} contracts in batch"
@@ -114,7 +104,6 @@ class EmbeddingUpdater:
     async def update_all_embeddings(self) -> int:
         """Update embeddings for all enriched contracts in the database."""
         total_processed = 0
-        offset = 0
 
         try:
             # Get total count of enriched contracts
@@ -127,29 +116,26 @@ class EmbeddingUpdater:
                 logger.info("No enriched contracts found. Nothing to update.")
                 return 0
 
-            while True:
+            # Stream batches of enriched contracts with a UID cursor
+            for batch_number, contracts in enumerate(
+                self.dgraph.iter_contracts(
+                    enriched=True,
+                    page_size=self.config.batch_size,
+                    projection="embedding_input",
+                ),
+                start=1,
+            ):
                 try:
-                    # Get batch of enriched contracts
-                    contracts = self.dgraph.get_contracts(
-                        self.config.batch_size, offset=offset, enriched=True
-                    )
-
-                    if not contracts:
-                        logger.info("No more contracts to process")
-                        break
-
                     # Process embeddings for this batch
                     batch_processed = await self._process_embeddings_batch(contracts)
                     total_processed += batch_processed
-                    offset += self.config.batch_size
 
                     logger.info(
                         f"Progress: {total_processed}/{total_contracts} contracts processed"
                     )
 
                 except Exception as e:
-                    logger.error(f"Error processing batch at offset {offset}: {str(e)}")
-                    offset += self.config.batch_size
+                    logger.error(f"Error processing batch {batch_number}: {str(e)}")
                     continue
 
             logger.info(
@@ -174,20 +160,20 @@ class EmbeddingUpdater:
             for i in range(0, len(contract_ids), self.config.batch_size):
                 batch_ids = contract_ids[i : i + self.config.batch_size]
 
-                # Get contracts by IDs
-                contracts = []
+                # Get the whole batch of contracts in one lookup
+                try:
+                    found = self.dgraph.get_contracts_by_ids(
+                        batch_ids, projection="embedding_input"
+                    )
+                except Exception as e:
+                    logger.error(
+                        f"Failed to retrieve contracts {batch_ids[0]}..{batch_ids[-1]}: {str(e)}"
+                    )
+                    continue
+                contracts = list(found.values())
                 for contract_id in batch_ids:
-                    try:
-                        contract = self.dgraph.get_contract_by_id(contract_id)
-                        if contract:
-                            contracts.append(contract)
-                        else:
-                            logger.warning(f"Contract with ID {contract_id} not found")
-                    except Exception as e:
-                        logger.error(
-                            f"Failed to retrieve contract with ID {contract_id}: {str(e)}"
-                        )
-                        continue
+                    if contract_id not in found:
+                        logger.warning(f"Contract with ID {contract_id} not found")
 
                 if contracts:
                     batch_processed = await self._process_embeddings_batch(contracts)
@@ -255,35 +241,14 @@ async def get_contracts_stats() -> Dict[str, int]:
     dgraph = DgraphClient()
 
     try:
-        total_contracts = dgraph.get_contracts_count(enriched=None)
-        enriched_contracts = dgraph.get_contracts_count(enriched=True)
-        non_enriched_contracts = dgraph.get_contracts_count(enriched=False)
-
-        # Count contracts with embeddings
-        contracts_with_embeddings = 0
-        offset = 0
-        batch_size = 10
-
-        while True:
-            contracts = dgraph.get_contracts(
-                batch_size=batch_size, offset=offset, enriched=True
-            )
-            if not contracts:
-                break
-
-            for contract in contracts:
-                if contract.get("ContractDeployment.embeddings"):
-                    contracts_with_embeddings += 1
-
-            offset += batch_size
+        corpus_stats = dgraph.get_corpus_stats()
 
         stats = {
-            "total": total_contracts,
-            "enriched": enriched_contracts,
-            "non_enriched": non_enriched_contracts,
-            "with_embeddings": contracts_with_embeddings,
-            "enriched_without_embeddings": enriched_contracts
-            - contracts_with_embeddings,
+            "total": corpus_stats["total"],
+            "enriched": corpus_stats["enriched"],
+            "non_enriched": corpus_stats["unenriched"],
+            "with_embeddings": corpus_stats["with_embeddings"],
+            "enriched_without_embeddings": corpus_stats["stale"],
         }
 
         logger.info("Contract Statistics:")
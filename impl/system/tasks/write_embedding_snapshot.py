@@ -0,0 +1,51 @@
+"""
+Writes the memory-mapped embedding snapshot the API and MCP servers load at
+startup instead of reading every embedding from Dgraph.
+
+Run after update_embeddings, or periodically; servers started afterwards
+catch up on the writes made since the snapshot from the invalidation log:
+
+    python -m tasks.write_embedding_snapshot
+"""
+
+import asyncio
+
+from src.core.data_access.async_dgraph_client import AsyncDgraphClient
+from src.core.data_retrieval.embedding_snapshot import (
+    DEFAULT_SNAPSHOT_DIR,
+    load_embeddings,
+    write_snapshot,
+)
+from src.core.data_retrieval.result_cache import invalidation_log_size
+from src.utils.logger import logger
+
+
+async def main(directory: str) -> int:
+    # Taken before the scan, so writes made during it are replayed as well
+    offset = invalidation_log_size()
+    client = AsyncDgraphClient()
+    try:
+        uids, vectors = await load_embeddings(client)
+    finally:
+        await client.close()
+    if not uids:
+        logger.error("No searchable embeddings, snapshot not written")
+        return 1
+
+    manifest = write_snapshot(uids, vectors, directory, offset)
+    logger.info(
+        f"✓ Embedding snapshot written to {directory}: {manifest['count']} contracts, dimension {manifest['dimension']}, {vectors.nbytes / 2**20:.1f} MiB"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Write the embedding snapshot")
+    parser.add_argument(
+        "--directory", default=DEFAULT_SNAPSHOT_DIR, help="Snapshot directory"
+    )
+    args = parser.parse_args()
+
+    exit(asyncio.run(main(args.directory)))
@@ -0,0 +1,4 @@
+import os
+
+# The shared logger writes to logs/ relative to the working directory
+os.makedirs("logs", exist_ok=True)
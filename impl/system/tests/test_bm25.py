@@ -0,0 +1,28 @@
+from src.core.data_retrieval.bm25 import BM25Index
+
+DESCRIPTION = "ContractDeployment.description"
+STANDARDS = "ContractDeployment.standards"
+
+
+def test_search_ranks_boosted_fields_first():
+    index = BM25Index()
+    index.upsert({"uid": "0x1", DESCRIPTION: "A token vault following erc 4626"})
+    index.upsert({"uid": "0x2", DESCRIPTION: "A vault", STANDARDS: ["ERC-4626"]})
+    index.upsert({"uid": "0x3", DESCRIPTION: "An auction house"})
+
+    assert [uid for uid, _ in index.search("erc4626 vault")] == ["0x2", "0x1"]
+
+
+def test_updates_reuse_freed_slots():
+    index = BM25Index()
+    for uid in ("0x1", "0x2", "0x3"):
+        index.upsert({"uid": uid, DESCRIPTION: "lending pool"})
+    for version in range(100):
+        index.upsert({"uid": "0x2", DESCRIPTION: f"lending pool v{version}"})
+    index.remove("0x3")
+    index.upsert({"uid": "0x4", DESCRIPTION: "staking rewards"})
+
+    assert len(index._uids) == 3
+    assert len(index) == 3
+    assert [uid for uid, _ in index.search("staking")] == ["0x4"]
+    assert {uid for uid, _ in index.search("lending")} == {"0x1", "0x2"}
@@ -0,0 +1,142 @@
+import asyncio
+
+import pytest
+
+from src.core.data_access.async_connection_pool import AsyncConnectionPool
+from src.core.data_access.connection_pool import ConnectionPool
+
+
+class FakeStub:
+    def __init__(self, address):
+        self.address = address
+        self.closed = False
+        self.healthy = True
+
+    def check_version(self, check, timeout=None):
+        if not self.healthy:
+            raise ConnectionError(f"{self.address} is down")
+
+    def close(self):
+        self.closed = True
+
+
+class AsyncFakeStub(FakeStub):
+    async def CheckVersion(self, check, timeout=None):
+        self.check_version(check, timeout)
+
+    async def close(self):
+        self.closed = True
+
+
+def make_pool(endpoints=("a:1", "b:1"), **kwargs):
+    stubs = []
+
+    def factory(address):
+        stubs.append(FakeStub(address))
+        return stubs[-1]
+
+    return ConnectionPool(list(endpoints), stub_factory=factory, **kwargs), stubs
+
+
+def fail(pool):
+    with pytest.raises(ConnectionError):
+        with pool.acquire():
+            raise ConnectionError("unreachable")
+
+
+def test_round_robin_alternates_alphas():
+    pool, _ = make_pool(stubs_per_endpoint=2)
+    addresses = []
+    for _ in range(4):
+        with pool.acquire() as pooled:
+            addresses.append(pooled.endpoint.address)
+    assert addresses == ["a:1", "b:1", "a:1", "b:1"]
+    assert [alpha["requests"] for alpha in pool.stats()] == [2, 2]
+
+
+def test_least_outstanding_avoids_busy_stubs():
+    pool, _ = make_pool(stubs_per_endpoint=1, routing="least_outstanding")
+    with pool.acquire() as busy:
+        for _ in range(3):
+            with pool.acquire() as pooled:
+                assert pooled is not busy
+                assert pooled.endpoint.address != busy.endpoint.address
+    assert [alpha["outstanding"] for alpha in pool.stats()] == [0, 0]
+
+
+def test_alpha_is_ejected_after_consecutive_failures():
+    pool, _ = make_pool(stubs_per_endpoint=1, max_failures=2)
+    fail(pool)  # a:1
+    with pool.acquire():  # b:1
+        pass
+    fail(pool)  # a:1, ejected
+    for _ in range(3):
+        with pool.acquire() as pooled:
+            assert pooled.endpoint.address == "b:1"
+    assert [alpha["available"] for alpha in pool.stats()] == [False, True]
+
+
+def test_health_check_readmits_ejected_alpha():
+    pool, _ = make_pool(stubs_per_endpoint=1, max_failures=1)
+    fail(pool)
+    assert not pool.stats()[0]["available"]
+
+    assert pool.check_health() == {"a:1": True, "b:1": True}
+    assert pool.stats()[0]["available"]
+
+
+def test_health_check_ejects_unreachable_alpha():
+    pool, _ = make_pool(stubs_per_endpoint=1, max_failures=1)
+    pool.endpoints[1].stubs[0].stub.healthy = False
+    assert pool.check_health() == {"a:1": True, "b:1": False}
+    assert [alpha["available"] for alpha in pool.stats()] == [True, False]
+
+
+def test_reconnect_waits_for_requests_on_the_old_stub():
+    pool, stubs = make_pool(endpoints=("a:1",), stubs_per_endpoint=1)
+    old = pool.endpoints[0].stubs[0]
+    with pool.acquire() as running:
+        fail(pool)
+        replacement = pool.endpoints[0].stubs[0]
+        assert replacement is not old and replacement.stub is stubs[-1]
+        # The running request still uses the old stub
+        assert running.stub is old.stub and not old.stub.closed
+    assert old.stub.closed
+    assert not replacement.stub.closed
+    with pool.acquire() as pooled:
+        assert pooled is replacement
+
+
+def test_idle_stub_is_closed_on_reconnect():
+    pool, stubs = make_pool(endpoints=("a:1",), stubs_per_endpoint=1)
+    stubs[0].healthy = False
+    pool.check_health()
+    assert stubs[0].closed
+    assert pool.endpoints[0].stubs[0].stub is stubs[1]
+
+
+def test_async_pool_routes_and_reconnects():
+    async def run():
+        stubs = []
+
+        def factory(address):
+            stubs.append(AsyncFakeStub(address))
+            return stubs[-1]
+
+        pool = AsyncConnectionPool(
+            ["a:1", "b:1"], stubs_per_endpoint=1, max_failures=1, stub_factory=factory
+        )
+        async with pool.acquire() as pooled:
+            assert pooled.endpoint.address == "a:1"
+        with pytest.raises(ConnectionError):
+            async with pool.acquire():
+                raise ConnectionError("unreachable")
+        async with pool.acquire() as pooled:
+            assert pooled.endpoint.address == "a:1"
+
+        assert await pool.check_health() == {"a:1": True, "b:1": True}
+        assert pool.stats()[1]["available"]
+        await pool.close()
+        assert stubs[1].closed and all(stub.closed for stub in stubs)
+
+    asyncio.run(run())
@@ -0,0 +1,48 @@
+import json
+import os
+
+import numpy as np
+
+from src.core.data_retrieval.embedding_snapshot import (
+    MANIFEST_FILE,
+    VERSIONS_DIR,
+    current_version,
+    load_snapshot,
+    write_snapshot,
+)
+
+
+def vectors(count, dimension=4, seed=0):
+    return np.random.default_rng(seed).random((count, dimension), dtype=np.float32)
+
+
+def test_load_maps_the_latest_snapshot(tmp_path):
+    directory = str(tmp_path)
+    write_snapshot(["0x2", "0x1"], vectors(2), directory, 10)
+    write_snapshot(["0x3", "0x1", "0x2"], vectors(3, seed=1), directory, 20)
+
+    index, manifest = load_snapshot(directory)
+    assert manifest["count"] == 3 and manifest["invalidation_log_offset"] == 20
+    assert len(index) == 3
+    query = vectors(3, seed=1)[0]
+    assert index.search(query, 1)[0][0] == "0x3"
+
+
+def test_old_versions_are_pruned(tmp_path):
+    directory = str(tmp_path)
+    for seed in range(4):
+        write_snapshot(["0x1"], vectors(1, seed=seed), directory)
+    versions = sorted(os.listdir(tmp_path / VERSIONS_DIR))
+    assert len(versions) == 2
+    assert current_version(directory).endswith(versions[-1])
+
+
+def test_snapshot_not_matching_its_manifest_is_ignored(tmp_path):
+    directory = str(tmp_path)
+    assert load_snapshot(directory) is None
+
+    manifest = write_snapshot(["0x1", "0x2"], vectors(2), directory)
+    path = os.path.join(current_version(directory), MANIFEST_FILE)
+    with open(path, "w") as file:
+        json.dump({**manifest, "count": 3}, file)
+    assert load_snapshot(directory) is None
@@ -0,0 +1,48 @@
+from src.core.data_processing.enrichment_journal import (
+    ATTEMPTED,
+    DEAD,
+    EnrichmentJournal,
+)
+
+
+def test_failing_contract_is_dead_lettered(tmp_path):
+    journal = EnrichmentJournal(str(tmp_path / "journal.sqlite3"), max_attempts=2)
+    run_id, _ = journal.start_run("new")
+    for attempt in range(2):
+        assert journal.skipped(run_id, ["0x1"]) == set()
+        journal.attempt(run_id, ["0x1"])
+        dead = journal.fail(run_id, ["0x1"], "invalid JSON")
+    assert dead == ["0x1"]
+    assert journal.skipped(run_id, ["0x1"]) == {"0x1"}
+
+
+def test_contract_crashing_the_process_is_dead_lettered(tmp_path):
+    path = str(tmp_path / "journal.sqlite3")
+    for crash in range(3):
+        # Every run dies during the LLM call: attempt() without fail()
+        journal = EnrichmentJournal(path, max_attempts=3)
+        run_id, _ = journal.start_run("new")
+        assert journal.skipped(run_id, ["0x1"]) == set()
+        journal.attempt(run_id, ["0x1"])
+        journal.close()
+
+    journal = EnrichmentJournal(path, max_attempts=3)
+    run_id, _ = journal.start_run("new")
+    assert journal.skipped(run_id, ["0x1", "0x2"]) == {"0x1"}
+    assert journal.stats()[DEAD] == 1
+    assert journal.stats()[ATTEMPTED] == 0
+
+    assert journal.requeue_dead() == 1
+    assert journal.skipped(run_id, ["0x1"]) == set()
+
+
+def test_success_resets_attempts(tmp_path):
+    journal = EnrichmentJournal(str(tmp_path / "journal.sqlite3"), max_attempts=2)
+    run_id, _ = journal.start_run("new")
+    journal.attempt(run_id, ["0x1"])
+    journal.attempt(run_id, ["0x1"])
+    journal.succeed(run_id, ["0x1"])
+    journal.finish_run(run_id)
+
+    run_id, _ = journal.start_run("reenrich")
+    assert journal.skipped(run_id, ["0x1"]) == set()
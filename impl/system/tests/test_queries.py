@@ -0,0 +1,41 @@
+from src.core.data_access.queries import (
+    SEARCHABLE_COUNT_BLOCK,
+    facet_counts_query,
+    select_vector_results,
+)
+
+
+def candidates(count, offset=0):
+    return [
+        {"uid": hex(offset + i), "cosine_similarity": 0.9 - (offset + i) * 0.01}
+        for i in range(count)
+    ]
+
+
+def test_round_shortened_by_description_filter_fetches_more():
+    # top-K 5, but two neighbours had no description and were filtered out
+    results, top_k = select_vector_results(candidates(3), 5, None, 5)
+
+    assert top_k == 10
+    assert len(results) == 3
+
+
+def test_round_without_new_candidates_stops():
+    results, top_k = select_vector_results(candidates(3), 5, None, 10, previous_count=3)
+
+    assert top_k is None
+    assert len(results) == 3
+
+
+def test_top_k_covering_searchable_contracts_stops():
+    results, top_k = select_vector_results(candidates(3), 5, None, 5, searchable=4)
+
+    assert top_k is None
+    assert len(results) == 3
+
+
+def test_searchable_only_facet_counts_query_has_no_parameters():
+    query, variables = facet_counts_query([], include_searchable=True)
+
+    assert query == "query facet_counts {\n" + SEARCHABLE_COUNT_BLOCK + "}\n"
+    assert variables == {}
@@ -0,0 +1,54 @@
+from src.core.data_retrieval.result_cache import SearchResultCache, changed_since
+
+
+def make_cache(log_path):
+    cache = SearchResultCache(log_path=str(log_path))
+    events = []
+    cache.add_listener(events.append)
+    return cache, events
+
+
+def test_own_invalidations_are_applied_once(tmp_path):
+    log_path = tmp_path / "invalidations.log"
+    writer, writer_events = make_cache(log_path)
+    reader, reader_events = make_cache(log_path)
+
+    key = writer.make_key("search_by_text", "erc20")
+    writer.put(key, [{"uid": "0x1"}], writer.epoch())
+    writer.invalidate(None, changed=["0x1"])
+    writer.invalidate(["0x2"])
+
+    assert writer.get(key) is None
+    assert writer.generation == 1
+    assert writer_events == [["0x1"], ["0x2"]]
+
+    reader.get(reader.make_key("search_by_text", "erc20"))
+    assert reader.generation == 1
+    assert reader_events == [["0x1"], ["0x2"]]
+
+
+def test_changed_since_reads_tagged_lines(tmp_path):
+    log_path = tmp_path / "invalidations.log"
+    cache, _ = make_cache(log_path)
+    cache.invalidate(["0x1"])
+    cache.invalidate(None, changed=["0x2"])
+    assert changed_since(0, str(log_path)) == {"0x1", "0x2"}
+
+    cache.invalidate(None)
+    assert changed_since(0, str(log_path)) is None
+
+
+def test_reader_resumes_at_byte_offset_after_partial_line(tmp_path):
+    log_path = tmp_path / "invalidations.log"
+    reader, events = make_cache(log_path)
+    key = reader.make_key("search_by_text", "erc20")
+
+    with open(log_path, "ab") as file:
+        file.write("0x1 0xé\n0x".encode())
+    reader.get(key)
+    with open(log_path, "ab") as file:
+        file.write(b"2\n")
+    reader.get(key)
+
+    assert events == [["0x1", "0xé"], ["0x2"]]
+    assert changed_since(len("0x1 0xé\n".encode()), str(log_path)) == {"0x2"}
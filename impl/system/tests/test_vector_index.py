@@ -0,0 +1,38 @@
+import numpy as np
+
+from src.core.data_retrieval.vector_index import (
+    BruteForceVectorIndex,
+    QuantizedVectorIndex,
+)
+
+
+def corpus(count=3000, dimension=32):
+    vectors = np.random.default_rng(0).standard_normal((count, dimension))
+    return [hex(row + 1) for row in range(count)], vectors.astype(np.float32)
+
+
+def test_quantized_index_keeps_only_codes_in_memory():
+    uids, vectors = corpus()
+    index = QuantizedVectorIndex(vectors.shape[1], initial_capacity=16, codes="int8")
+    index.upsert_many(uids, vectors)
+
+    assert isinstance(index._vectors, np.memmap)
+    stats = index.stats()
+    assert stats["bytes"] == len(uids) * (vectors.shape[1] + 4)
+    assert stats["mapped_bytes"] == vectors.nbytes
+
+
+def test_quantized_search_matches_exact_search():
+    uids, vectors = corpus()
+    exact = BruteForceVectorIndex(vectors.shape[1])
+    exact.upsert_many(uids, vectors)
+    index = QuantizedVectorIndex(vectors.shape[1], initial_capacity=16, codes="int8")
+    index.upsert_many(uids, vectors)
+    index.remove(uids[0])
+    exact.remove(uids[0])
+
+    for query in vectors[1:21]:
+        expected = exact.search(query, 5)
+        found = index.search(query, 5)
+        assert [uid for uid, _ in found] == [uid for uid, _ in expected]
+        assert np.allclose([s for _, s in found], [s for _, s in expected], atol=1e-5)
@@ -11,6 +11,7 @@ import {
   Code,
   FileText,
   Brain,
+  Layers,
 } from "lucide-react";
 import { Button } from "@/components/ui/button";
 import { Input } from "@/components/ui/input";
@@ -53,6 +54,14 @@ const searchTypeConfig = {
     placeholder: "Search function names, variables, code patterns...",
     examples: "Try: 'transfer' or 'mint' or 'approve' or 'balanceOf'",
   },
+  hybrid: {
+    label: "Hybrid Search",
+    description: "Semantic and keyword matches combined",
+    icon: Layers,
+    placeholder: "Find contracts by meaning and keywords...",
+    examples:
+      "Try: 'ERC721 marketplace with royalties' or 'upgradeable proxy governance'",
+  },
 };
 
 export function Search() {
@@ -132,6 +132,13 @@ export async function searchContracts(
         limit: limit,
       };
       break;
+    case "hybrid":
+      endpoint = "/search_hybrid";
+      requestBody = {
+        query: query,
+        limit: limit,
+      };
+      break;
     default:
       endpoint = "/search";
       requestBody = {
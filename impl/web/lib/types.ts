@@ -1,4 +1,4 @@
-export type SearchType = "vector" | "text" | "source_code";
+export type SearchType = "vector" | "text" | "source_code" | "hybrid";
 
 export interface ContractResult {
   id: string;
@@ -23,5 +23,6 @@ export interface ContractResult {
   domain?: string;
   security_risks?: string[];
   similarity_score?: number;
+  fused_score?: number;
   // last_updated?: string
 }